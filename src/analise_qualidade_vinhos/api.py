@@ -2,22 +2,125 @@
 
 from __future__ import annotations
 
-from functools import lru_cache
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List
+from typing import AsyncIterator, List
 
 import pandas as pd
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from starlette.requests import ClientDisconnect
+
+from analise_qualidade_vinhos.config.settings import (
+    API_BATCH_MAX_ROWS,
+    API_BATCH_MAX_WAIT_MS,
+    API_CACHE,
+    API_CACHE_DECIMALS,
+    API_CACHE_MAX_ENTRIES,
+    API_CACHE_MAX_MB,
+    API_CACHE_TTL_SECONDS,
+    API_EXECUTOR,
+    API_MICROBATCH,
+    API_MODEL_FORMAT,
+    API_MODEL_POLL_SECONDS,
+    API_STREAM_CHUNK_ROWS,
+    API_STREAM_MAX_LINE_BYTES,
+    API_WORKERS,
+    MODEL_DIR,
+    QUALITY_LABELS,
+)
+from analise_qualidade_vinhos.pipeline.predict import predict_rows_timed
+from analise_qualidade_vinhos.serving.batching import MicroBatcher
+from analise_qualidade_vinhos.serving import columnar
+from analise_qualidade_vinhos.serving.cache import PredictionCache
+from analise_qualidade_vinhos.serving.executor import InferenceExecutor
+from analise_qualidade_vinhos.serving.metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    STAGE_SECONDS,
+    Gauge,
+    observe_scoring,
+)
+from analise_qualidade_vinhos.serving.model_store import ModelStore
+
+JOBLIB_MODEL_PATH = MODEL_DIR / "wine_quality_model.joblib"
+MODEL_PATH = {
+    "compiled": JOBLIB_MODEL_PATH.with_suffix(".npz"),
+    "student": JOBLIB_MODEL_PATH.with_name("wine_quality_model.student.joblib"),
+}.get(API_MODEL_FORMAT, JOBLIB_MODEL_PATH)
+
+
+def _train_missing_model(model_path: Path) -> None:
+    # Import tardio: no formato compilado o processo da API não carrega sklearn
+    from analise_qualidade_vinhos.pipeline.train import train_model
+
+    train_model(
+        model_path=JOBLIB_MODEL_PATH,
+        compile_model=model_path.suffix == ".npz",
+        # o formato "student" precisa do aluno mesmo com a destilação desligada
+        distill=True if API_MODEL_FORMAT == "student" else None,
+    )
+    if not model_path.exists():
+        raise FileNotFoundError(f"Treinamento não gerou {model_path}.")
+
+
+model_store = ModelStore(MODEL_PATH, trainer=_train_missing_model, poll_seconds=API_MODEL_POLL_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.executor = None
+    app.state.batcher = None
+    app.state.cache = None
+    if API_CACHE:
+        app.state.cache = PredictionCache(
+            max_entries=API_CACHE_MAX_ENTRIES,
+            ttl_seconds=API_CACHE_TTL_SECONDS,
+            max_bytes=int(API_CACHE_MAX_MB * 1024 * 1024),
+            decimals=int(API_CACHE_DECIMALS) if API_CACHE_DECIMALS else None,
+        )
+    # Carrega (ou treina) em segundo plano; /ready responde 503 até o modelo ser publicado
+    await model_store.start()
+    if API_EXECUTOR:
+        app.state.executor = InferenceExecutor(
+            kind=API_EXECUTOR,
+            max_workers=API_WORKERS,
+            model_path=MODEL_PATH,
+            model_loader=get_or_train_model,
+            snapshot_provider=_published_snapshot,
+            # no modo thread o model_store já carrega em segundo plano
+            preload=API_EXECUTOR == "process",
+        )
+        await app.state.executor.start()
+    if API_MICROBATCH:
+        executor = app.state.executor
+        app.state.batcher = MicroBatcher(
+            executor.predict if executor else _predict_batch,
+            max_wait_ms=API_BATCH_MAX_WAIT_MS,
+            max_batch_rows=API_BATCH_MAX_ROWS,
+            max_concurrent_batches=executor.max_workers if executor else 1,
+        )
+        await app.state.batcher.start()
+    yield
+    if app.state.batcher is not None:
+        await app.state.batcher.stop()
+    if app.state.executor is not None:
+        # espera os lotes em andamento sem bloquear o event loop
+        await asyncio.to_thread(app.state.executor.shutdown)
+    await model_store.stop()
 
-from analise_qualidade_vinhos.config.settings import MODEL_DIR
-from analise_qualidade_vinhos.pipeline.predict import load_model, predict_from_dataframe
-from analise_qualidade_vinhos.pipeline.train import train_model
 
 app = FastAPI(
     title="Wine Quality Service",
     description="API simples para pontuar qualidade de vinhos (2 faixas).",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 
@@ -35,12 +138,58 @@ class WineSample(BaseModel):
     alcohol: float = Field(..., ge=0)
 
 
-@lru_cache(maxsize=1)
+_SAMPLES = TypeAdapter(List[WineSample])
+
+
 def get_or_train_model():
-    model_path = MODEL_DIR / "wine_quality_model.joblib"
-    if not model_path.exists():
-        train_model(model_path=model_path)
-    return load_model(model_path)
+    """Currently published model (loads, or trains if missing, on first use)."""
+    return model_store.get().model
+
+
+def _published_snapshot():
+    """(version, path) of the validated artifact copy the process workers load.
+
+    Both are cached in the published `LoadedModel`, so per-request calls on
+    the event loop do no filesystem work; `get()` only runs (off the loop,
+    from `InferenceExecutor.start`) before the first publish.
+    """
+    current = model_store.current or model_store.get()
+    return current.version, current.path
+
+
+def _score_with_model(model, df: pd.DataFrame) -> List[str]:
+    """Score `df` (one prediction per row) and record the stage timings."""
+    preds, timings, unique_rows = predict_rows_timed(model, df)
+    observe_scoring(len(df), timings, unique_rows)
+    return preds
+
+
+def _predict_batch(df: pd.DataFrame) -> List[str]:
+    """Score a batch keeping exactly one prediction per row (duplicates scored once)."""
+    return _score_with_model(get_or_train_model(), df)
+
+
+def _model_gauge(field: str):
+    def samples():
+        status = model_store.status()
+        return [({}, status[field])] if status["ready"] else []
+
+    return samples
+
+
+REGISTRY.register(
+    Gauge("wine_api_model_load_seconds", "Time to load and validate the published model.", _model_gauge("load_seconds"))
+)
+REGISTRY.register(
+    Gauge("wine_api_model_swaps", "Hot swaps since startup.", lambda: [({}, model_store.swaps)])
+)
+REGISTRY.register(
+    Gauge(
+        "wine_api_model_info",
+        "Published model artifact version (value is always 1).",
+        lambda: [({"version": model_store.current.version}, 1)] if model_store.ready else [],
+    )
+)
 
 
 @app.get("/health")
@@ -48,15 +197,238 @@ def health() -> dict:
     return {"status": "ok"}
 
 
-@app.post("/predict")
-def predict(samples: List[WineSample]) -> dict:
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """Readiness: 200 once a validated model is published, 503 while loading."""
+    status = model_store.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+async def _score(df: pd.DataFrame) -> List[str]:
+    """Route scoring through the batcher, the dedicated executor or the threadpool."""
+    snapshot = await model_store.wait_ready()
+    batcher = getattr(app.state, "batcher", None)
+    executor = getattr(app.state, "executor", None)
+    if batcher is not None:
+        return await batcher.submit(df)
+    if executor is not None:
+        return await executor.predict(df)
+    return await run_in_threadpool(_score_with_model, snapshot.model, df)
+
+
+async def _score_cached(df: pd.DataFrame) -> List[str]:
+    """Serve repeated samples from the cache and score only the misses."""
+    cache = getattr(app.state, "cache", None)
+    snapshot = await model_store.wait_ready()
+    if cache is None:
+        return await _score(df)
+    keys, preds, missing = cache.lookup(df, snapshot.version)
+    if missing:
+        misses = df.iloc[missing].reset_index(drop=True)
+        fresh = await _score(misses)
+        cache.update(keys, preds, missing, fresh, version=snapshot.version)
+    return preds
+
+
+@app.post(
+    "/predict",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": WineSample.model_json_schema()}},
+                columnar.ARROW_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+                columnar.MATRIX_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def predict(request: Request) -> Response:
+    """Score a JSON list of samples, or a binary columnar body (see `serving.columnar`).
+
+    Parse and serialization are timed for /metrics.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in columnar.COLUMNAR_CONTENT_TYPES:
+        return await _predict_columnar(body, content_type)
+    start = time.perf_counter()
+    try:
+        samples = _SAMPLES.validate_json(body)
+    except ValidationError as exc:
+        errors = exc.errors(include_url=False)
+        raise RequestValidationError([{**e, "loc": ("body", *e["loc"])} for e in errors], body=body)
     if not samples:
         raise HTTPException(status_code=400, detail="Envie pelo menos uma amostra.")
     df = pd.DataFrame([s.model_dump() for s in samples])
-    model = get_or_train_model()
-    preds = predict_from_dataframe(model, df)
-    return {"predictions": preds}
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="parse")
+
+    preds = await _score_cached(df)
+
+    start = time.perf_counter()
+    content = json.dumps({"predictions": preds}, ensure_ascii=False, separators=(",", ":"))
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="serialize")
+    return Response(content, media_type="application/json")
+
+
+async def _predict_columnar(body: bytes, content_type: str) -> Response:
+    """Binary path: bytes -> float64 matrix -> model -> int8 label codes, no per-row objects."""
+    if content_type == columnar.ARROW_CONTENT_TYPE and not columnar.PYARROW_AVAILABLE:
+        raise HTTPException(status_code=415, detail="Formato Arrow requer pyarrow instalado no servidor.")
+    start = time.perf_counter()
+    try:
+        df = columnar.decode(body, content_type)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if df.empty:
+        raise HTTPException(status_code=400, detail="Envie pelo menos uma amostra.")
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="parse")
+
+    preds = await _score_cached(df)
+
+    start = time.perf_counter()
+    content = columnar.encode(columnar.label_codes(preds, QUALITY_LABELS), QUALITY_LABELS, content_type)
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="serialize")
+    return Response(content, media_type=content_type)
+
+
+class _RequestBodyStreamingResponse(StreamingResponse):
+    """StreamingResponse whose iterator consumes the request body itself.
+
+    Starlette's default `__call__` also reads `receive` to watch for client
+    disconnects (ASGI spec < 2.4), which would steal body chunks from the
+    iterator; here a disconnect surfaces through `request.stream()` (the
+    iterator stops) or as an `OSError` on `send`. The background task still
+    runs afterwards, as in the default `__call__`.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            pass  # cliente desconectou no meio da resposta
+        if self.background is not None:
+            await self.background()
+
+
+async def _iter_ndjson_lines(request: Request, max_line_bytes: int) -> AsyncIterator[bytes | None]:
+    """Yield complete lines from the request body as it arrives.
+
+    A line longer than `max_line_bytes` yields `None` (once) and is discarded
+    up to the next newline, so one huge line cannot grow the buffer.
+    """
+    buffer = bytearray()
+    discarding = False
+    async for chunk in request.stream():
+        scan = len(buffer)  # o que já está no buffer não tem "\n"
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", scan)
+            if end < 0:
+                break
+            if discarding:
+                discarding = False
+            elif end - start > max_line_bytes:
+                yield None
+            else:
+                yield bytes(buffer[start:end])
+            start = scan = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            if not discarding:
+                discarding = True
+                yield None
+            buffer.clear()
+    if buffer and not discarding:
+        yield bytes(buffer)
+
+
+async def _score_ndjson(request: Request, chunk_rows: int, max_line_bytes: int) -> AsyncIterator[str]:
+    rows: List[dict] = []
+    # (número da linha, mensagem de erro ou None para linhas válidas), na ordem de entrada
+    entries: List[tuple] = []
+
+    parse_seconds = 0.0
+
+    async def flush() -> str:
+        nonlocal parse_seconds
+        if not entries:
+            return ""
+        STAGE_SECONDS.observe(parse_seconds, stage="parse")
+        parse_seconds = 0.0
+        preds = iter(await _score_cached(pd.DataFrame(rows)) if rows else [])
+        start = time.perf_counter()
+        out = []
+        for line_no, error in entries:
+            payload = {"line": line_no, "error": error} if error else {"line": line_no, "prediction": next(preds)}
+            out.append(json.dumps(payload, ensure_ascii=False) + "\n")
+        rows.clear()
+        entries.clear()
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="serialize")
+        return "".join(out)
+
+    line_no = 0
+    try:
+        async for raw in _iter_ndjson_lines(request, max_line_bytes):
+            line_no += 1
+            if raw is None:
+                entries.append((line_no, f"Linha maior que {max_line_bytes} bytes."))
+                continue
+            if not raw.strip():
+                continue
+            start = time.perf_counter()
+            try:
+                rows.append(WineSample.model_validate_json(raw).model_dump())
+                entries.append((line_no, None))
+            except ValidationError as exc:
+                entries.append((line_no, exc.errors(include_url=False)[0]["msg"]))
+            parse_seconds += time.perf_counter() - start
+            if len(entries) >= chunk_rows:
+                yield await flush()
+    except ClientDisconnect:
+        return  # ninguém para receber o resto: não pontua mais nada
+    if await request.is_disconnected():
+        return
+    tail = await flush()
+    if tail:
+        yield tail
+
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request) -> StreamingResponse:
+    """Bulk scoring: NDJSON in (one sample per line), NDJSON out.
+
+    The body is read incrementally and scored every `WINE_API_STREAM_CHUNK_ROWS`
+    rows, so server memory depends on the chunk size, not on the upload size.
+    Each output line carries the input line number and either `prediction`
+    or `error`; lines over `WINE_API_STREAM_MAX_LINE_BYTES` get an error.
+    """
+    return _RequestBodyStreamingResponse(
+        _score_ndjson(request, API_STREAM_CHUNK_ROWS, API_STREAM_MAX_LINE_BYTES),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get("/predict/batching")
+def batching_stats() -> dict:
+    """Throughput and p50/p99 batch latency of the micro-batching scheduler."""
+    batcher = getattr(app.state, "batcher", None)
+    if batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **batcher.stats()}
 
 
+@app.get("/predict/cache")
+def cache_stats() -> dict:
+    """Hit/miss counters, size and evictions of the prediction cache."""
+    cache = getattr(app.state, "cache", None)
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
 
 
+@app.get("/metrics")
+def metrics() -> Response:
+    """Prometheus metrics: per-stage latency histograms, batch sizes, throughput and model info."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parents[3]
@@ -13,6 +14,10 @@ LOG_DIR = BASE_DIR / "logs"
 MODEL_DIR = BASE_DIR / "models"
 REPORTS_DIR = BASE_DIR / "reports"
 
+# Cache da matriz de atributos (Feather, chave no hash do CSV e do código de features): opt-in
+FEATURE_CACHE = os.getenv("WINE_FEATURE_CACHE", "0") == "1"
+FEATURE_CACHE_DIR = Path(os.getenv("WINE_FEATURE_CACHE_DIR", str(PROCESSED_DATA_DIR)))
+
 # ml
 RANDOM_STATE = 42
 TEST_SIZE = 0.2
@@ -23,5 +28,46 @@ QUALITY_LABELS = [
     "Alta qualidade",
 ]
 
+# Orçamento de CPUs do treino (-1 = todos os núcleos disponíveis)
+TRAIN_N_JOBS = int(os.getenv("WINE_TRAIN_N_JOBS", "-1"))
+# Seleção do modelo: "exhaustive" (todas as combinações completas, padrão), "halving" (successive
+# halving, opt-in) ou "tune" (busca de hiperparâmetros com validação cruzada e poda, ver TRAIN_TUNE_*)
+TRAIN_SEARCH = os.getenv("WINE_TRAIN_SEARCH", "exhaustive")
+TRAIN_SEARCH_ETA = int(os.getenv("WINE_TRAIN_SEARCH_ETA", "3"))  # fração 1/eta promovida a cada rodada
+TRAIN_SEARCH_MAX_SECONDS = float(os.getenv("WINE_TRAIN_SEARCH_MAX_SECONDS", "0"))  # 0 = sem limite
+# Candidatos ajustados salvos em <pasta do modelo>/candidates: reexecuções e buscas interrompidas retomam.
+# Opt-in: cada candidato ocupa dezenas de MB e o diretório não é limpo automaticamente
+TRAIN_CANDIDATE_CACHE = os.getenv("WINE_TRAIN_CANDIDATE_CACHE", "0") == "1"
+# Busca de hiperparâmetros (search="tune"): trials, orçamento total, folds e espaço (YAML/JSON, "" = padrão)
+TRAIN_TUNE_TRIALS = int(os.getenv("WINE_TRAIN_TUNE_TRIALS", "40"))
+TRAIN_TUNE_MAX_SECONDS = float(os.getenv("WINE_TRAIN_TUNE_MAX_SECONDS", "600"))  # 0 = sem limite
+TRAIN_TUNE_CV = int(os.getenv("WINE_TRAIN_TUNE_CV", "3"))
+TRAIN_TUNE_SPACE = os.getenv("WINE_TRAIN_TUNE_SPACE", "")
+TRAIN_TUNE_SAMPLER = os.getenv("WINE_TRAIN_TUNE_SAMPLER", "auto")  # "auto", "tpe" (optuna) ou "adaptive"
+# Destilação do vencedor em um modelo aluno menor (<modelo>.student.joblib), salvo só se ficar
+# dentro da tolerância de queda de accuracy/F1 em relação ao professor (opt-in)
+TRAIN_DISTILL = os.getenv("WINE_TRAIN_DISTILL", "0") == "1"
+TRAIN_DISTILL_TOLERANCE = float(os.getenv("WINE_TRAIN_DISTILL_TOLERANCE", "0.01"))
+TRAIN_DISTILL_AUGMENT = int(os.getenv("WINE_TRAIN_DISTILL_AUGMENT", "4"))  # amostras sintéticas por linha
+# Além do perfil por etapa (reports/training_profile.json), grava o dump do cProfile (.prof)
+TRAIN_CPROFILE = os.getenv("WINE_TRAIN_CPROFILE", "0") == "1"
+
+# api (opt-in via variáveis de ambiente)
+API_MICROBATCH = os.getenv("WINE_API_MICROBATCH", "0") == "1"
+API_BATCH_MAX_WAIT_MS = float(os.getenv("WINE_API_BATCH_MAX_WAIT_MS", "5"))
+API_BATCH_MAX_ROWS = int(os.getenv("WINE_API_BATCH_MAX_ROWS", "512"))
+API_EXECUTOR = os.getenv("WINE_API_EXECUTOR", "")  # "", "thread" ou "process"
+API_WORKERS = int(os.getenv("WINE_API_WORKERS", "2"))
+API_CACHE = os.getenv("WINE_API_CACHE", "0") == "1"
+API_CACHE_MAX_ENTRIES = int(os.getenv("WINE_API_CACHE_MAX_ENTRIES", "100000"))
+API_CACHE_MAX_MB = float(os.getenv("WINE_API_CACHE_MAX_MB", "64"))
+API_CACHE_TTL_SECONDS = float(os.getenv("WINE_API_CACHE_TTL_SECONDS", "0"))  # 0 = sem expiração
+API_CACHE_DECIMALS = os.getenv("WINE_API_CACHE_DECIMALS", "")  # "" = sem arredondamento
+API_MODEL_POLL_SECONDS = float(os.getenv("WINE_API_MODEL_POLL_SECONDS", "5"))  # 0 = sem hot swap
+API_STREAM_CHUNK_ROWS = int(os.getenv("WINE_API_STREAM_CHUNK_ROWS", "1024"))
+API_STREAM_MAX_LINE_BYTES = int(os.getenv("WINE_API_STREAM_MAX_LINE_BYTES", "65536"))  # linhas maiores viram erro
+# "joblib", "compiled" (.npz) ou "student" (modelo destilado, .student.joblib)
+API_MODEL_FORMAT = os.getenv("WINE_API_MODEL_FORMAT", "joblib")
+
 for path in [DATA_DIR, INTERIM_DATA_DIR, PROCESSED_DATA_DIR, LOG_DIR, MODEL_DIR, REPORTS_DIR]:
     path.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
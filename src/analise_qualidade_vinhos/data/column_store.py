@@ -0,0 +1,128 @@
+"""Typed, memory-mapped columnar copy of the raw CSV.
+
+`convert_csv` parses the CSV once and writes a directory with:
+
+- `schema.json`: row count, column order and, per dtype, the file holding
+  those columns;
+- one `.npy` per dtype (e.g. `float64.npy`, `int64.npy`), a Fortran-ordered
+  matrix where every column is a contiguous run of bytes.
+
+`load_columns` maps these files read-only (`np.load(mmap_mode="r")`) and
+returns per-column views, and `load_frame` wraps them in a DataFrame without
+copying (one pandas block per dtype file). Opening the store only reads the
+headers, so load time barely depends on the row count, and every process
+that maps the same store shares the same page-cache pages.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from analise_qualidade_vinhos.config.settings import INTERIM_DATA_DIR
+
+STORE_SUFFIX = ".columns"
+SCHEMA_FILE = "schema.json"
+STORE_FORMAT_VERSION = 1
+
+
+def is_column_store(path: Union[Path, str]) -> bool:
+    return (Path(path) / SCHEMA_FILE).is_file()
+
+
+def default_store_path(csv_path: Union[Path, str]) -> Path:
+    return INTERIM_DATA_DIR / f"{Path(csv_path).stem}{STORE_SUFFIX}"
+
+
+def convert_csv(
+    csv_path: Union[Path, str], store_path: Union[Path, str, None] = None, sep: str = ";"
+) -> Path:
+    """Parse `csv_path` once and write the memory-mappable store (replaces an existing one)."""
+    csv_path = Path(csv_path)
+    store_path = Path(store_path) if store_path is not None else default_store_path(csv_path)
+    df = pd.read_csv(csv_path, sep=sep)
+
+    groups = {}
+    for name, dtype in df.dtypes.items():
+        if dtype.kind not in "biuf":
+            raise ValueError(f"Coluna {name!r} não é numérica ({dtype}); o formato só guarda números")
+        groups.setdefault(np.dtype(dtype).str, []).append(name)
+
+    tmp_path = store_path.with_name(store_path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    schema = {"version": STORE_FORMAT_VERSION, "rows": len(df), "columns": list(df.columns), "groups": []}
+    for dtype, columns in groups.items():
+        file_name = f"{np.dtype(dtype).name}.npy"
+        np.save(tmp_path / file_name, np.asfortranarray(df[columns].to_numpy(dtype=dtype)))
+        schema["groups"].append({"file": file_name, "dtype": dtype, "columns": columns})
+    (tmp_path / SCHEMA_FILE).write_text(json.dumps(schema, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    shutil.rmtree(store_path, ignore_errors=True)
+    tmp_path.rename(store_path)
+    return store_path
+
+
+def _read_schema(store_path: Path) -> dict:
+    schema = json.loads((store_path / SCHEMA_FILE).read_text(encoding="utf-8"))
+    if schema.get("version") != STORE_FORMAT_VERSION:
+        raise ValueError(f"Versão de formato não suportada em {store_path}: {schema.get('version')}")
+    return schema
+
+
+def _map_groups(store_path: Path, schema: dict):
+    for group in schema["groups"]:
+        matrix = np.load(store_path / group["file"], mmap_mode="r")
+        if matrix.shape != (schema["rows"], len(group["columns"])) or matrix.dtype.str != group["dtype"]:
+            raise ValueError(f"{group['file']} não corresponde a {SCHEMA_FILE}")
+        yield group["columns"], matrix
+
+
+def load_columns(store_path: Union[Path, str]) -> Dict[str, np.ndarray]:
+    """Read-only, zero-copy views of each column, in the original column order."""
+    store_path = Path(store_path)
+    schema = _read_schema(store_path)
+    views = {}
+    for columns, matrix in _map_groups(store_path, schema):
+        for i, name in enumerate(columns):
+            views[name] = matrix[:, i]
+    return {name: views[name] for name in schema["columns"]}
+
+
+def load_frame(store_path: Union[Path, str]) -> pd.DataFrame:
+    """DataFrame backed by the mapped files (no copy; read-only until pandas copies it)."""
+    store_path = Path(store_path)
+    schema = _read_schema(store_path)
+    frames = [
+        pd.DataFrame(matrix, columns=columns, copy=False)
+        for columns, matrix in _map_groups(store_path, schema)
+    ]
+    # um bloco por arquivo; concat sem consolidar (nem copiar) os blocos
+    df = pd.concat(frames, axis=1, copy=False) if len(frames) > 1 else frames[0]
+    if list(df.columns) != schema["columns"]:
+        # só quando colunas de tipos diferentes estão intercaladas no CSV (copia)
+        df = df[schema["columns"]]
+    return df
+
+
+def cli():
+    import argparse
+
+    from analise_qualidade_vinhos.config.settings import RAW_DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Converte o CSV bruto para o formato colunar mapeado em memória.")
+    parser.add_argument("csv_path", type=Path, nargs="?", default=RAW_DATA_PATH)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    store_path = convert_csv(args.csv_path, args.output)
+    print(f"✅ Dados convertidos em: {store_path}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,18 +1,23 @@
 """Data loading and simple validation helpers."""
 
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
 
 from analise_qualidade_vinhos.config.settings import (
+    FEATURE_CACHE,
+    FEATURE_CACHE_DIR,
     RANDOM_STATE,
     TARGET_COLUMN,
     TEST_SIZE,
     RAW_DATA_PATH
 )
+from analise_qualidade_vinhos.data.column_store import is_column_store, load_frame
+from analise_qualidade_vinhos.data.feature_cache import load_or_build
 from analise_qualidade_vinhos.features.engineering import build_feature_matrix
+from analise_qualidade_vinhos.utils.profiling import profile_stage
 
 
 def load_raw_data(path: Union[Path, str, None] = None, sep: str = ';') -> pd.DataFrame:
@@ -22,6 +27,9 @@ def load_raw_data(path: Union[Path, str, None] = None, sep: str = ';') -> pd.Dat
     - path: caminho para o arquivo (`Path` ou `str`). Se `None`, usa `RAW_DATA_PATH`.
     - sep: separador do CSV (padrão '`;`' para o dataset UCI de vinho).
 
+    Se `path` for um diretório gerado por `data.column_store.convert_csv`,
+    os dados são mapeados em memória (sem parse nem cópia).
+
     Retorna:
     - `pd.DataFrame` com os dados carregados.
     """
@@ -39,18 +47,45 @@ def load_raw_data(path: Union[Path, str, None] = None, sep: str = ';') -> pd.Dat
     if not path.exists():
         raise FileNotFoundError(f"Dataset não encontrado em {path}")
 
+    if is_column_store(path):
+        return load_frame(path)
+
     # UCI wine dataset usa ';' como separador
     return pd.read_csv(path, sep=sep)
 
 
-def load_featured_data(path: Union[Path, str, None] = None) -> pd.DataFrame:
+def load_featured_data(
+    path: Union[Path, str, None] = None,
+    engine: str = "numpy",
+    cache: Optional[bool] = None,
+    cache_dir: Union[Path, str, None] = None,
+) -> pd.DataFrame:
     """Carrega os dados brutos e aplica `build_feature_matrix`.
 
     Aceita caminho como `str`, `Path` ou `None` (usa arquivo padrão).
+    `engine` escolhe o kernel de atributos (`"numpy"` ou `"pandas"`).
+    Com `cache=True` (padrão: `WINE_FEATURE_CACHE`, desligado) o resultado fica
+    em `cache_dir` (padrão: `WINE_FEATURE_CACHE_DIR`) como Feather, indexado
+    pelo hash do arquivo bruto e do código de features; a próxima chamada só
+    relê esse arquivo.
+    Um arquivo `.parquet` é tratado como matriz já processada (ex.: saída de
+    `data.streaming.write_featured_dataset`) e lido diretamente.
     """
-    raw = load_raw_data(path)
-    featured = build_feature_matrix(raw)
-    return featured
+    path = Path(path) if path is not None else RAW_DATA_PATH
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+
+    def build() -> pd.DataFrame:
+        with profile_stage("load_raw"):
+            raw = load_raw_data(path)
+        with profile_stage("build_features"):
+            return build_feature_matrix(raw, engine=engine)
+
+    if cache is None:
+        cache = FEATURE_CACHE
+    if cache and path.is_file():
+        return load_or_build(path, build, engine, Path(cache_dir) if cache_dir is not None else FEATURE_CACHE_DIR)
+    return build()
 
 
 def train_test_split_featured(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
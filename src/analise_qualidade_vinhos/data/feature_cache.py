@@ -0,0 +1,92 @@
+"""Content-addressed on-disk cache for the featured training matrix.
+
+The cache key combines the raw file's content hash with a hash of the
+feature engineering source code, so editing either the CSV or
+`features/engineering.py` invalidates it automatically. Entries are Feather
+(Arrow IPC) files in `FEATURE_CACHE_DIR` (`data/processed` by default), named
+after the raw file's stem plus a digest of its full path, so two raw files
+with the same name never evict each other. Reading one back is a columnar copy,
+about twice as fast as Parquet for this matrix (requires pyarrow; without it
+nothing is cached).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (engine Feather do pandas)
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from analise_qualidade_vinhos.config.settings import FEATURE_CACHE_DIR
+from analise_qualidade_vinhos.features import engineering
+
+# Incrementar quando o formato do arquivo de cache mudar
+CACHE_FORMAT_VERSION = "1"
+_SUFFIX = ".feather"
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """blake2b of the file content, read in chunks (constant memory)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with Path(path).open("rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def feature_code_version() -> str:
+    """Hash of the feature engineering source (changes whenever the code does)."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(CACHE_FORMAT_VERSION.encode())
+    digest.update(Path(engineering.__file__).read_bytes())
+    return digest.hexdigest()
+
+
+def _entry_prefix(raw_path: Path, engine: str) -> str:
+    """Name shared by every entry of `raw_path`/`engine`, whatever its content."""
+    raw_path = Path(raw_path)
+    location = hashlib.blake2b(str(raw_path.resolve()).encode(), digest_size=8).hexdigest()
+    return f"{raw_path.stem}-{location}.featured-{engine}-"
+
+
+def cache_path(raw_path: Path, engine: str, cache_dir: Path = FEATURE_CACHE_DIR) -> Path:
+    key = f"{file_digest(raw_path)}-{feature_code_version()}"
+    return Path(cache_dir) / f"{_entry_prefix(raw_path, engine)}{key}{_SUFFIX}"
+
+
+def load_or_build(
+    raw_path: Path,
+    build: Callable[[], pd.DataFrame],
+    engine: str,
+    cache_dir: Path = FEATURE_CACHE_DIR,
+) -> pd.DataFrame:
+    """Return the cached featured matrix for `raw_path`, or `build()` and store it."""
+    if not PYARROW_AVAILABLE:
+        return build()
+    path = cache_path(raw_path, engine, cache_dir)
+    if path.exists():
+        try:
+            return pd.read_feather(path)
+        except Exception as exc:  # arquivo corrompido: reconstrói
+            print(f"⚠️ Cache de features inválido ({path.name}): {exc}")
+
+    df = build()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    df.to_feather(tmp_path)
+    os.replace(tmp_path, path)
+    # Remove entradas antigas do mesmo arquivo bruto/engine (dados ou código mudaram)
+    for stale in path.parent.glob(f"{_entry_prefix(raw_path, engine)}*{_SUFFIX}"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return df
@@ -0,0 +1,207 @@
+"""Out-of-core feature building for CSVs that do not fit in memory.
+
+`write_featured_dataset` reads the raw CSV in chunks of `chunksize` rows,
+engineers the features of each chunk with the NumPy kernel and appends the
+result to a Parquet (requires pyarrow) or CSV file. Duplicate rows are
+removed across the whole file through `RowHashSet`, which keeps one 128-bit
+fingerprint (two independent 64-bit hashes) per distinct row in sorted NumPy
+arrays: 16 bytes per row, versus ~100 for a Python set of tuples. Earlier
+chunks are not kept, so a repeat cannot be re-checked against the row
+values; at 128 bits a collision that would drop a distinct row is
+negligible (about n²/2¹²⁹, ~10⁻²¹ for a billion rows).
+
+Peak memory is a few copies of one chunk plus the hash set. Non-finite
+values are written as NaN instead of the column median (the median of the
+whole file is not known while streaming); the pipeline's `features` step
+fills them with the training medians.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from analise_qualidade_vinhos.features.engineering import build_feature_matrix, rename_columns
+
+DEFAULT_CHUNKSIZE = 100_000
+
+ROW_KEY_DTYPE = np.dtype([("hi", "<u8"), ("lo", "<u8")])
+# Chave (16 bytes) do segundo hash: independente do primeiro, que usa a chave padrão do pandas
+_SECOND_HASH_KEY = "analise-vinhos-2"
+
+
+class RowHashSet:
+    """Set of 128-bit row fingerprints (`ROW_KEY_DTYPE`) stored as sorted runs (log-structured merge).
+
+    A new run is merged with the previous ones while they are not larger,
+    so each hash is copied O(log n) times and lookups touch O(log n) runs.
+    """
+
+    def __init__(self):
+        self._runs: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self._runs)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(run.nbytes for run in self._runs)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self._runs:
+            pos = np.searchsorted(run, hashes)
+            pos[pos == len(run)] = 0
+            found |= run[pos] == hashes
+        return found
+
+    def add_new(self, hashes: np.ndarray) -> np.ndarray:
+        """Add `hashes` and return the mask of first occurrences (not seen before)."""
+        _, first = np.unique(hashes, return_index=True)
+        keep = np.zeros(len(hashes), dtype=bool)
+        keep[first] = True
+        keep &= ~self.contains(hashes)
+        run = np.sort(hashes[keep])
+        if not len(run):
+            return keep
+        while self._runs and len(self._runs[-1]) <= len(run):
+            run = np.concatenate([self._runs.pop(), run])
+            run.sort(kind="mergesort")
+        self._runs.append(run)
+        return keep
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """128-bit fingerprint of each row's values; numeric columns are cast to float64 so `5` and `5.0` match."""
+    numeric = df.select_dtypes("number").columns
+    values = df.astype({c: np.float64 for c in numeric}, copy=False)
+    keys = np.empty(len(values), dtype=ROW_KEY_DTYPE)
+    keys["hi"] = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    keys["lo"] = pd.util.hash_pandas_object(values, index=False, hash_key=_SECOND_HASH_KEY).to_numpy()
+    return keys
+
+
+@dataclass
+class StreamStats:
+    rows_read: int = 0
+    rows_written: int = 0
+    chunks: int = 0
+    hash_bytes: int = 0
+
+    @property
+    def duplicates(self) -> int:
+        return self.rows_read - self.rows_written
+
+
+def iter_featured_chunks(
+    path: Union[Path, str],
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    sep: str = ";",
+    drop_duplicates: bool = True,
+    add_quality_label: bool = True,
+    stats: StreamStats | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield featured chunks of the CSV at `path` (same columns as `build_feature_matrix`).
+
+    The index keeps the row position in the file, as in the in-memory path.
+    """
+    stats = stats if stats is not None else StreamStats()
+    seen = RowHashSet() if drop_duplicates else None
+    start = 0
+    for chunk in pd.read_csv(path, sep=sep, chunksize=chunksize):
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        stats.rows_read += len(chunk)
+        chunk = rename_columns(chunk)
+        if seen is not None:
+            chunk = chunk[seen.add_new(row_hashes(chunk))]
+            stats.hash_bytes = seen.nbytes
+        if chunk.empty:
+            continue
+        featured = build_feature_matrix(
+            chunk, add_quality_label=add_quality_label, drop_duplicates=False, fill_missing=False
+        )
+        stats.rows_written += len(featured)
+        stats.chunks += 1
+        yield featured
+
+
+def write_featured_dataset(
+    path: Union[Path, str],
+    output_path: Union[Path, str],
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    sep: str = ";",
+    drop_duplicates: bool = True,
+) -> StreamStats:
+    """Stream the featured matrix of `path` into `output_path` (`.parquet` or `.csv`).
+
+    The file is written under a temporary name and moved into place at the
+    end, so an interrupted run never leaves a truncated dataset behind.
+    """
+    output_path = Path(output_path)
+    use_parquet = output_path.suffix == ".parquet"
+    if use_parquet and not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow não está instalado; use um arquivo .csv como saída")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    stats = StreamStats()
+    writer = None
+    try:
+        for featured in iter_featured_chunks(path, chunksize, sep, drop_duplicates, stats=stats):
+            if use_parquet:
+                if writer is None:
+                    table = pa.Table.from_pandas(featured, preserve_index=True)
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                else:
+                    # mesmo esquema do primeiro bloco (ex.: `quality` int64 em todos)
+                    table = pa.Table.from_pandas(featured, schema=writer.schema, preserve_index=True)
+                writer.write_table(table)
+            else:
+                featured.to_csv(tmp_path, mode="a" if stats.chunks > 1 else "w", header=stats.chunks == 1)
+        if writer is not None:
+            writer.close()
+            writer = None
+        if stats.chunks == 0:
+            raise ValueError(f"Nenhuma linha lida de {path}")
+        tmp_path.replace(output_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        tmp_path.unlink(missing_ok=True)
+    return stats
+
+
+def cli():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera a matriz de atributos em blocos (arquivos grandes).")
+    parser.add_argument("data_path", type=Path)
+    parser.add_argument("output_path", type=Path, help="Arquivo de saída .parquet ou .csv")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--keep-duplicates", action="store_true")
+    args = parser.parse_args()
+
+    stats = write_featured_dataset(
+        args.data_path, args.output_path, args.chunksize, drop_duplicates=not args.keep_duplicates
+    )
+    print(
+        f"✅ {stats.rows_written} linhas escritas em {args.output_path} "
+        f"({stats.rows_read} lidas, {stats.duplicates} duplicadas, {stats.chunks} blocos, "
+        f"hashes: {stats.hash_bytes / 1e6:.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -5,6 +5,11 @@ The functions here are intentionally simple to match a junior-friendly stack.
 
 from __future__ import annotations
 
+import warnings
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
 
 QUALITY_THRESHOLD = 6  # Limiar usada para separar bandas de qualidade
@@ -15,6 +20,122 @@ TARGET_LABELS = {
     "high": "Alta qualidade",
 }
 
+# Colunas originais (snake_case) na ordem usada pelo kernel vetorizado
+BASE_FEATURES: List[str] = [
+    "fixed_acidity",
+    "volatile_acidity",
+    "citric_acid",
+    "residual_sugar",
+    "chlorides",
+    "free_sulfur_dioxide",
+    "total_sulfur_dioxide",
+    "density",
+    "ph",
+    "sulphates",
+    "alcohol",
+]
+
+# Atributos derivados, na mesma ordem criada por `create_interaction_features`
+DERIVED_FEATURES: List[str] = [
+    "density_alcohol_ratio",
+    "sulphates_alcohol_ratio",
+    "total_free_sulfur_ratio",
+    "acidity_index",
+    "total_acidity",
+    "sugar_sulphates_interaction",
+    "alcohol_sulphates",
+    "ph_acidity_interaction",
+    "alcohol_squared",
+    "volatile_acidity_squared",
+    "sulphates_squared",
+    "sulfur_efficiency",
+    "citric_fixed_ratio",
+    "volatile_fixed_ratio",
+    "density_sugar_interaction",
+]
+
+FEATURE_COLUMNS: List[str] = BASE_FEATURES + DERIVED_FEATURES
+
+_EPS = 1e-6
+
+
+def _ratio(num: np.ndarray, den: np.ndarray, out: np.ndarray, eps) -> None:
+    np.divide(num, den + eps, out=out)
+
+
+def _sum(a: np.ndarray, b: np.ndarray, out: np.ndarray, eps) -> None:
+    np.add(a, b, out=out)
+
+
+def _product(a: np.ndarray, b: np.ndarray, out: np.ndarray, eps) -> None:
+    np.multiply(a, b, out=out)
+
+
+def _square(a: np.ndarray, out: np.ndarray, eps) -> None:
+    np.square(a, out=out)
+
+
+@dataclass(frozen=True)
+class DerivedFeature:
+    """Atributo derivado: nome, colunas de entrada e a operação NumPy que o escreve."""
+
+    name: str
+    inputs: Tuple[str, ...]
+    compute: Callable[..., None]
+
+
+# Registro dos atributos derivados e das suas dependências (a ordem é a de avaliação)
+FEATURE_REGISTRY: Dict[str, DerivedFeature] = {
+    f.name: f
+    for f in (
+        # Ratios importantes para qualidade do vinho
+        DerivedFeature("density_alcohol_ratio", ("density", "alcohol"), _ratio),
+        DerivedFeature("sulphates_alcohol_ratio", ("sulphates", "alcohol"), _ratio),
+        DerivedFeature("total_free_sulfur_ratio", ("total_sulfur_dioxide", "free_sulfur_dioxide"), _ratio),
+        # Índices compostos (acidity_index reaproveita total_acidity)
+        DerivedFeature("total_acidity", ("fixed_acidity", "volatile_acidity"), _sum),
+        DerivedFeature("acidity_index", ("total_acidity", "citric_acid"), _sum),
+        # Interações importantes
+        DerivedFeature("sugar_sulphates_interaction", ("residual_sugar", "sulphates"), _product),
+        DerivedFeature("alcohol_sulphates", ("alcohol", "sulphates"), _product),
+        DerivedFeature("ph_acidity_interaction", ("ph", "acidity_index"), _product),
+        # Features polinomiais (grau 2)
+        DerivedFeature("alcohol_squared", ("alcohol",), _square),
+        DerivedFeature("volatile_acidity_squared", ("volatile_acidity",), _square),
+        DerivedFeature("sulphates_squared", ("sulphates",), _square),
+        # Razões de enxofre e balanço de acidez
+        DerivedFeature("sulfur_efficiency", ("free_sulfur_dioxide", "total_sulfur_dioxide"), _ratio),
+        DerivedFeature("citric_fixed_ratio", ("citric_acid", "fixed_acidity"), _ratio),
+        DerivedFeature("volatile_fixed_ratio", ("volatile_acidity", "fixed_acidity"), _ratio),
+        # Densidade ajustada
+        DerivedFeature("density_sugar_interaction", ("density", "residual_sugar"), _product),
+    )
+}
+
+
+def resolve_features(names: Iterable[str] | None = None) -> List[str]:
+    """Atributos derivados a calcular para obter `names`, dependências incluídas.
+
+    Retorna os nomes em ordem de avaliação (pré-requisitos primeiro); colunas
+    de `BASE_FEATURES` em `names` não geram cálculo. `None` = todos.
+    """
+    if names is None:
+        return list(FEATURE_REGISTRY)
+    needed = set()
+
+    def visit(name: str) -> None:
+        if name in needed or name in BASE_FEATURES:
+            return
+        if name not in FEATURE_REGISTRY:
+            raise ValueError(f"Atributo desconhecido: {name}")
+        for dependency in FEATURE_REGISTRY[name].inputs:
+            visit(dependency)
+        needed.add(name)
+
+    for name in names:
+        visit(name)
+    return [name for name in FEATURE_REGISTRY if name in needed]
+
 
 def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Normalize column names to snake_case for easier maintenance."""
@@ -98,17 +219,196 @@ def create_interaction_features(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def build_feature_matrix(raw_df: pd.DataFrame, add_quality_label: bool = True) -> pd.DataFrame:
+def allocate_feature_array(n_rows: int, dtype=np.float64) -> np.ndarray:
+    """Aloca a matriz contígua (n_rows x len(FEATURE_COLUMNS)) usada pelo kernel.
+
+    As primeiras `len(BASE_FEATURES)` colunas recebem os valores originais;
+    o kernel preenche as colunas derivadas no restante da matriz.
+    """
+    return np.empty((n_rows, len(FEATURE_COLUMNS)), dtype=dtype)
+
+
+def compute_feature_array(
+    base: np.ndarray,
+    out: np.ndarray | None = None,
+    dtype=np.float64,
+    fill_missing: bool = True,
+    features: Iterable[str] | None = None,
+) -> np.ndarray:
+    """Calcula os atributos derivados de `FEATURE_REGISTRY` em uma única passada NumPy.
+
+    Equivalente numérico de `create_interaction_features`, mas sem `Series`
+    intermediárias: cada atributo é escrito direto na sua coluna de `out`.
+
+    Parâmetros:
+    - base: matriz (n, 11) com as colunas de `BASE_FEATURES`, nessa ordem.
+      Pode ser a própria fatia `out[:, :11]` (cálculo in place).
+    - out: matriz pré-alocada (n, 26) C-contígua; se `None`, é alocada.
+    - dtype: `np.float64` (padrão, resultado idêntico ao pandas) ou `np.float32`;
+      ignorado quando `out` é informado.
+    - fill_missing: troca ±inf por NaN e preenche NaN com a mediana da coluna.
+    - features: calcula só esses atributos e seus pré-requisitos
+      (`resolve_features`); as demais colunas derivadas de `out` ficam com
+      conteúdo indefinido. `None` (padrão) calcula todos.
+
+    Retorna:
+    - A matriz `out`, com colunas na ordem de `FEATURE_COLUMNS`.
+    """
+    n_base = len(BASE_FEATURES)
+    if base.ndim != 2 or base.shape[1] != n_base:
+        raise ValueError(f"base deve ter formato (n, {n_base}), recebido {base.shape}")
+
+    if out is None:
+        out = allocate_feature_array(base.shape[0], dtype=dtype)
+    elif out.shape != (base.shape[0], len(FEATURE_COLUMNS)) or not out.flags.c_contiguous:
+        raise ValueError("out deve ser C-contígua com formato (n, len(FEATURE_COLUMNS))")
+
+    target = out[:, :n_base]
+    if not (base.ctypes.data == target.ctypes.data and base.strides == target.strides):
+        target[...] = base
+
+    col = {name: out[:, i] for i, name in enumerate(FEATURE_COLUMNS)}
+    eps = out.dtype.type(_EPS)
+    derived = resolve_features(features)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for name in derived:
+            spec = FEATURE_REGISTRY[name]
+            spec.compute(*(col[c] for c in spec.inputs), out=col[name], eps=eps)
+
+    if fill_missing:
+        if features is None:
+            _fill_non_finite_with_median(out)
+        else:
+            computed = [FEATURE_COLUMNS.index(c) for c in BASE_FEATURES + derived]
+            _fill_non_finite_with_median(out, columns=computed)
+    return out
+
+
+def _fill_non_finite_with_median(arr: np.ndarray, columns: Sequence[int] | None = None) -> None:
+    """Troca ±inf por NaN e preenche NaN com a mediana de cada coluna (in place).
+
+    `columns` restringe o preenchimento a essas colunas (as demais não são lidas).
+    """
+    if columns is not None:
+        for j in columns:
+            column = arr[:, j : j + 1]
+            _fill_non_finite_with_median(column)
+        return
+    missing = ~np.isfinite(arr)
+    if not missing.any():
+        return
+    arr[missing] = np.nan
+    for j in np.flatnonzero(missing.any(axis=0)):
+        with warnings.catch_warnings():
+            # Coluna inteira NaN: a mediana também é NaN, como no pandas
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            median = np.nanmedian(arr[:, j])
+        arr[missing[:, j], j] = median
+
+
+def fit_feature_statistics(
+    arr: np.ndarray, clip_quantiles: Tuple[float, float] = (0.0, 1.0)
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Estatísticas de treino por coluna: (medianas, limite inferior, limite superior).
+
+    Valores não finitos são ignorados. Os limites são os quantis
+    `clip_quantiles` (padrão: mínimo e máximo vistos no treino).
+    """
+    finite = np.where(np.isfinite(arr), arr, np.nan)
+    with warnings.catch_warnings():
+        # Coluna inteira NaN: estatísticas NaN (o SimpleImputer do pipeline descarta a coluna)
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        medians = np.nanmedian(finite, axis=0)
+        lower, upper = np.nanquantile(finite, clip_quantiles, axis=0)
+    return medians, lower, upper
+
+
+def apply_feature_statistics(
+    arr: np.ndarray, medians: np.ndarray, lower: np.ndarray, upper: np.ndarray
+) -> np.ndarray:
+    """Preenche não finitos com as medianas de treino e recorta aos limites (in place).
+
+    Custo constante por linha e independente do restante do lote.
+    """
+    missing = ~np.isfinite(arr)
+    if missing.any():
+        rows, cols = np.nonzero(missing)
+        arr[rows, cols] = medians[cols]
+    np.clip(arr, lower, upper, out=arr)
+    return arr
+
+
+def build_feature_array(
+    df: pd.DataFrame,
+    dtype=np.float64,
+    out: np.ndarray | None = None,
+    fill_missing: bool = True,
+    features: Iterable[str] | None = None,
+) -> Tuple[np.ndarray, List[str]]:
+    """Extrai `BASE_FEATURES` de um DataFrame (snake_case) e roda o kernel.
+
+    Com `fill_missing=False` os ±inf/NaN são mantidos (ex.: para aplicar
+    estatísticas de treino com `apply_feature_statistics`). `features`
+    limita o cálculo como em `compute_feature_array`.
+
+    Retorna a matriz de atributos e a lista de nomes das colunas.
+    """
+    if out is None:
+        out = allocate_feature_array(len(df), dtype=dtype)
+    for i, name in enumerate(BASE_FEATURES):
+        out[:, i] = df[name].to_numpy(dtype=out.dtype, na_value=np.nan)
+    compute_feature_array(
+        out[:, : len(BASE_FEATURES)], out=out, fill_missing=fill_missing, features=features
+    )
+    return out, list(FEATURE_COLUMNS)
+
+
+def _create_interaction_features_numpy(df: pd.DataFrame, fill_missing: bool = True) -> pd.DataFrame:
+    """Versão de `create_interaction_features` apoiada no kernel NumPy.
+
+    Mantém a ordem de colunas do original (colunas de entrada + derivadas);
+    colunas fora de `BASE_FEATURES` (ex.: `quality`) são repassadas sem alteração.
+    """
+    arr, columns = build_feature_array(df, fill_missing=fill_missing)
+    featured = pd.DataFrame(arr, columns=columns, index=df.index)
+    extras = [c for c in df.columns if c not in BASE_FEATURES]
+    if not extras:
+        return featured
+    featured = pd.concat([featured, df[extras]], axis=1)
+    return featured[list(df.columns) + DERIVED_FEATURES]
+
+
+def build_feature_matrix(
+    raw_df: pd.DataFrame,
+    add_quality_label: bool = True,
+    engine: str = "numpy",
+    drop_duplicates: bool = True,
+    fill_missing: bool = True,
+) -> pd.DataFrame:
     """
     Cria o modelo da tabela:
     - clean column names
-    - drop duplicates
-    - engineer new features
+    - drop duplicates (desligável para manter uma linha de saída por entrada)
+    - engineer new features (`engine="numpy"` usa o kernel vetorizado,
+      `engine="pandas"` usa `create_interaction_features`)
     - add categorical quality bucket (target)
+
+    `fill_missing=False` (só com `engine="numpy"`) mantém ±inf/NaN como NaN
+    em vez de preencher com a mediana do próprio lote (usado no modo em
+    blocos, onde a mediana do arquivo inteiro não é conhecida).
     """
     df = rename_columns(raw_df)
-    df = df.drop_duplicates() # Como é para teste estou mantendo o dropduplicate
-    df = create_interaction_features(df)
+    if drop_duplicates:
+        df = df.drop_duplicates() # Como é para teste estou mantendo o dropduplicate
+    if engine == "numpy":
+        df = _create_interaction_features_numpy(df, fill_missing=fill_missing)
+    elif engine == "pandas" and not fill_missing:
+        raise ValueError("fill_missing=False só é suportado com engine='numpy'")
+    elif engine == "pandas":
+        df = create_interaction_features(df)
+    else:
+        raise ValueError("engine deve ser 'numpy' ou 'pandas'")
 
     if add_quality_label:
         if "quality" not in df.columns:
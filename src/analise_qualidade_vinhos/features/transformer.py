@@ -0,0 +1,99 @@
+"""Fitted feature engineering step for the training/inference pipeline."""
+
+from __future__ import annotations
+
+import warnings
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
+
+from analise_qualidade_vinhos.features.engineering import (
+    BASE_FEATURES,
+    FEATURE_COLUMNS,
+    apply_feature_statistics,
+    build_feature_array,
+    fit_feature_statistics,
+    rename_columns,
+    resolve_features,
+)
+
+
+class WineFeatureTransformer(TransformerMixin, BaseEstimator):
+    """Compute the derived features with statistics frozen at fit time.
+
+    `fit` stores, for each column of `FEATURE_COLUMNS`, the training median
+    and the clipping bounds (quantiles `clip_quantiles` of the training
+    data). `transform` only reads the 11 `BASE_FEATURES` (any extra column,
+    including precomputed derived ones, is ignored), recomputes the derived
+    features, fills non-finite values with the training medians and clips to
+    the bounds. Each output row depends only on its input row, so the result
+    is the same whatever batch the row arrives in.
+
+    With the default `(0.0, 1.0)` bounds (training min/max), clipping never
+    changes a tree model's predictions: every split threshold lies inside
+    the training range.
+
+    `fit` (and therefore `fit_transform` during training) always produces the
+    full feature set. `restrict(names)` then limits `transform` to `names`
+    and their prerequisites; the remaining columns are filled with the
+    training medians (constants, no arithmetic) so downstream steps that
+    discard them still receive the full layout.
+    """
+
+    def __init__(self, clip_quantiles: Tuple[float, float] = (0.0, 1.0)):
+        self.clip_quantiles = clip_quantiles
+
+    def fit(self, X: pd.DataFrame, y=None) -> "WineFeatureTransformer":
+        arr, _ = build_feature_array(rename_columns(X), fill_missing=False)
+        self.medians_, self.lower_, self.upper_ = fit_feature_statistics(arr, self.clip_quantiles)
+        self.required_features_: Optional[list] = None
+        self.skipped_columns_: list = []
+        return self
+
+    def partial_fit(self, X: pd.DataFrame, y=None) -> "WineFeatureTransformer":
+        """Update the statistics with new samples (incremental retraining).
+
+        Min/max bounds (quantile 0 or 1) widen to the new extremes, which
+        never changes the predictions of trees fitted before: their
+        thresholds lie inside the old range. Medians and other quantiles
+        cannot be updated without the full history and stay frozen.
+        """
+        if not hasattr(self, "medians_"):
+            return self.fit(X, y)
+        arr, _ = build_feature_array(rename_columns(X), fill_missing=False)
+        finite = np.where(np.isfinite(arr), arr, np.nan)
+        low, high = self.clip_quantiles
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)  # coluna toda NaN no lote novo
+            if low == 0.0:
+                self.lower_ = np.fmin(self.lower_, np.nanmin(finite, axis=0))
+            if high == 1.0:
+                self.upper_ = np.fmax(self.upper_, np.nanmax(finite, axis=0))
+        return self
+
+    def restrict(self, names: Iterable[str] | None) -> "WineFeatureTransformer":
+        """Compute only `names` (plus prerequisites) in `transform`; `None` = all."""
+        check_is_fitted(self, "medians_")
+        if names is None:
+            self.required_features_, self.skipped_columns_ = None, []
+            return self
+        # resolvido uma vez aqui, não a cada transform
+        self.required_features_ = resolve_features(names)
+        computed = set(BASE_FEATURES).union(self.required_features_)
+        self.skipped_columns_ = [i for i, name in enumerate(FEATURE_COLUMNS) if name not in computed]
+        return self
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        check_is_fitted(self, "medians_")
+        required = getattr(self, "required_features_", None)
+        arr, columns = build_feature_array(rename_columns(X), fill_missing=False, features=required)
+        if self.skipped_columns_:
+            arr[:, self.skipped_columns_] = self.medians_[self.skipped_columns_]
+        apply_feature_statistics(arr, self.medians_, self.lower_, self.upper_)
+        return pd.DataFrame(arr, columns=columns, index=X.index)
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return np.asarray(FEATURE_COLUMNS, dtype=object)
@@ -0,0 +1,238 @@
+"""Balancing samplers sharing one nearest-neighbor index per class.
+
+imblearn's SMOTE, ADASYN and SMOTEENN each fit their own
+`NearestNeighbors` over the same training matrix: SMOTE and ADASYN per
+class, ADASYN again over all rows, and the ENN cleaning of SMOTEENN over
+the whole resampled set. `NeighborIndex` keeps one index per class plus
+one over all rows and caches each query at the largest `k` asked for, so
+across the samplers of the model search:
+
+- the within-class neighbors are computed once (SMOTE's `k_neighbors=3`
+  and ADASYN's are slices of the `k_neighbors=5` of SMOTEENN);
+- the all-rows neighbors of the original rows are shared by ADASYN and
+  the ENN pass, which only searches the synthetic rows on top of them
+  (when the index is brute force; with KD-trees a single tree over the
+  resampled rows prunes better);
+- synthetic samples are generated in vectorized batches per class, as in
+  imblearn.
+
+The samplers are drop-in subclasses: same parameters, same random number
+usage and therefore the same class counts and synthetic samples (up to
+the order of equidistant neighbors). `fit_resample(X, y,
+neighbor_index=index)` reuses an index built for `(X, y)` (checked by
+value, `NeighborIndex.matches`); otherwise, or without it, each call builds
+its own.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+import numpy as np
+from imblearn.combine import SMOTEENN
+from imblearn.over_sampling import ADASYN, SMOTE
+from imblearn.utils import check_target_type
+from scipy import sparse
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state, check_X_y
+
+
+class NeighborIndex:
+    """Neighbor indexes over `(X, y)`: one per class plus one over all rows, with cached queries.
+
+    Indexes are `NearestNeighbors(algorithm=algorithm)`; with "auto",
+    scikit-learn picks a KD-tree/ball-tree for low-dimensional data and
+    brute force (BLAS) above 15 features, where trees stop pruning.
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, algorithm: str = "auto"):
+        self.X = np.asarray(X)
+        self.y = np.asarray(y)
+        self.algorithm = algorithm
+        self.classes = np.unique(self.y)
+        self.members = {c: np.flatnonzero(self.y == c) for c in self.classes}
+        self.members[None] = np.arange(len(self.y))
+        self._indexes: Dict = {}
+        self._cache: Dict = {}
+
+    def matches(self, X, y) -> bool:
+        """Whether `(X, y)` is the data this index was built on (same values, not just the same shape).
+
+        The comparison is O(n·d), negligible next to a neighbor search; the
+        samplers receive a validated copy, so identity alone rarely holds.
+        """
+        if X is self.X and y is self.y:
+            return True
+        return (
+            self.X.shape == np.shape(X)
+            and self.y.shape == np.shape(y)
+            and np.array_equal(self.y, y)
+            and np.array_equal(self.X, X)
+        )
+
+    def _fitted(self, c=None) -> NearestNeighbors:
+        if c not in self._indexes:
+            self._indexes[c] = NearestNeighbors(algorithm=self.algorithm).fit(self.X[self.members[c]])
+        return self._indexes[c]
+
+    def uses_tree(self) -> bool:
+        """Whether the all-rows index is a KD-tree/ball-tree (low dimension) rather than brute force."""
+        return self._fitted()._fit_method in ("kd_tree", "ball_tree")
+
+    def query(self, points: np.ndarray, k: int, c=None) -> Tuple[np.ndarray, np.ndarray]:
+        """k-NN of `points` among the class-`c` rows (`None` = all rows): distances, row indices."""
+        dist, ind = self._fitted(c).kneighbors(points, n_neighbors=min(k, len(self.members[c])))
+        return dist, self.members[c][ind]
+
+    def _neighbors_of_class(self, c, k: int, among=None) -> Tuple[np.ndarray, np.ndarray]:
+        """`query` for the class-`c` rows themselves, cached at the largest `k` asked for."""
+        cached = self._cache.get((c, among))
+        if cached is None or cached[0].shape[1] < min(k, len(self.members[among])):
+            cached = self._cache[(c, among)] = self.query(self.X[self.members[c]], k, among)
+        return cached[0][:, :k], cached[1][:, :k]
+
+    def within_class(self, c, k: int) -> np.ndarray:
+        """`k` nearest same-class neighbors of each class-`c` row, as positions within the class (self excluded)."""
+        n_class = len(self.members[c])
+        if k + 1 > n_class:  # mesma validação do NearestNeighbors usado pelo imblearn
+            raise ValueError(
+                f"Expected n_neighbors <= n_samples_fit, but n_neighbors = {k + 1},"
+                f" n_samples_fit = {n_class}, n_samples = {n_class}"
+            )
+        _, ind = self._neighbors_of_class(c, k + 1, among=c)
+        return np.searchsorted(self.members[c], ind[:, 1:])
+
+    def nearest(self, c, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """`k` nearest rows over all classes for each class-`c` row (self included, first)."""
+        return self._neighbors_of_class(c, k, among=None)
+
+
+def merge_neighbors(dists, inds, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the `k` closest of several per-row candidate lists (ties by row index)."""
+    dist, ind = np.hstack(dists), np.hstack(inds)
+    order = np.lexsort((ind, dist), axis=1)[:, :k]
+    return np.take_along_axis(dist, order, axis=1), np.take_along_axis(ind, order, axis=1)
+
+
+def _resolve_index(neighbor_index, X, y) -> NeighborIndex:
+    if neighbor_index is not None and neighbor_index.matches(X, y):
+        return neighbor_index
+    return NeighborIndex(X, y)
+
+
+class IndexedSMOTE(SMOTE):
+    """`SMOTE` whose per-class neighbors come from a shared `NeighborIndex`."""
+
+    def _fit_resample(self, X, y, neighbor_index: NeighborIndex | None = None):
+        if not isinstance(self.k_neighbors, int) or sparse.issparse(X):
+            return super()._fit_resample(X, y)
+        index = _resolve_index(neighbor_index, X, y)
+
+        X_resampled = [X.copy()]
+        y_resampled = [y.copy()]
+        for class_sample, n_samples in self.sampling_strategy_.items():
+            if n_samples == 0:
+                continue
+            X_class = X[index.members[class_sample]]
+            nns = index.within_class(class_sample, self.k_neighbors)
+            X_new, y_new = self._make_samples(X_class, y.dtype, class_sample, X_class, nns, n_samples, 1.0)
+            X_resampled.append(X_new)
+            y_resampled.append(y_new)
+        return np.vstack(X_resampled), np.hstack(y_resampled)
+
+
+class IndexedADASYN(ADASYN):
+    """`ADASYN` whose neighbors (all rows and within class) come from a shared `NeighborIndex`."""
+
+    def _fit_resample(self, X, y, neighbor_index: NeighborIndex | None = None):
+        if not isinstance(self.n_neighbors, int) or sparse.issparse(X):
+            return super()._fit_resample(X, y)
+        index = _resolve_index(neighbor_index, X, y)
+        random_state = check_random_state(self.random_state)
+        n_neighbors = self.n_neighbors
+
+        X_resampled = [X.copy()]
+        y_resampled = [y.copy()]
+        for class_sample, n_samples in self.sampling_strategy_.items():
+            if n_samples == 0:
+                continue
+            # mesma regra e mesmas mensagens de erro do ADASYN do imblearn
+            _, nns = index.nearest(class_sample, n_neighbors + 1)
+            ratio_nn = np.sum(y[nns[:, 1:]] != class_sample, axis=1) / n_neighbors
+            if not np.sum(ratio_nn):
+                raise RuntimeError(
+                    "Not any neigbours belong to the majority"
+                    " class. This case will induce a NaN case"
+                    " with a division by zero. ADASYN is not"
+                    " suited for this specific dataset."
+                    " Use SMOTE instead."
+                )
+            ratio_nn /= np.sum(ratio_nn)
+            n_samples_generate = np.rint(ratio_nn * n_samples).astype(int)
+            n_samples = np.sum(n_samples_generate)
+            if not n_samples:
+                raise ValueError("No samples will be generated with the provided ratio settings.")
+
+            X_class = X[index.members[class_sample]]
+            nns = index.within_class(class_sample, n_neighbors)
+            rows = np.repeat(np.arange(len(X_class)), n_samples_generate)
+            cols = random_state.choice(n_neighbors, size=n_samples)
+            diffs = X_class[nns[rows, cols]] - X_class[rows]
+            steps = random_state.uniform(size=(n_samples, 1))
+            X_resampled.append((X_class[rows] + steps * diffs).astype(X.dtype))
+            y_resampled.append(np.full(n_samples, fill_value=class_sample, dtype=y.dtype))
+        return np.vstack(X_resampled), np.hstack(y_resampled)
+
+
+class IndexedSMOTEENN(SMOTEENN):
+    """`SMOTEENN` with `IndexedSMOTE` and an ENN cleaning pass over the shared index.
+
+    Only the default SMOTE/ENN (`smote=None`, `enn=None`) take this path;
+    custom ones fall back to imblearn.
+    """
+
+    def _validate_estimator(self):
+        super()._validate_estimator()
+        if self.smote is None:
+            self.smote_ = IndexedSMOTE(sampling_strategy=self.sampling_strategy, random_state=self.random_state)
+
+    def _fit_resample(self, X, y, neighbor_index: NeighborIndex | None = None):
+        self._validate_estimator()
+        y = check_target_type(y)
+        X, y = check_X_y(X, y, accept_sparse=["csr", "csc"])
+        enn = self.enn_
+        if self.enn is not None or not isinstance(self.smote_, IndexedSMOTE) or sparse.issparse(X):
+            return super()._fit_resample(X, y)
+        self.sampling_strategy_ = self.sampling_strategy
+
+        index = _resolve_index(neighbor_index, X, y)
+        X_res, y_res = self.smote_.fit_resample(X, y, neighbor_index=index)
+        n_original, k = len(X), enn.n_neighbors + 1
+        keep = np.ones(len(y_res), dtype=bool)
+        if index.uses_tree():
+            # KD-tree/ball-tree: uma árvore sobre as linhas reamostradas poda melhor que duas parciais
+            resampled = NeighborIndex(X_res, y_res, algorithm=index.algorithm)
+            for c in resampled.classes:
+                _, ind = resampled.nearest(c, k)
+                keep[resampled.members[c]] = np.all(y_res[ind[:, 1:]] == c, axis=1)
+        else:
+            # Força bruta: k-NN sobre o conjunto reamostrado = junção dos k-NN entre as originais
+            # (em cache no índice compartilhado, p.ex. já calculados pelo ADASYN) e entre as sintéticas
+            synthetic = NeighborIndex(X_res[n_original:], y_res[n_original:], algorithm=index.algorithm)
+            for c in index.classes:
+                candidates = [index.nearest(c, k)]
+                if len(synthetic.y):
+                    dist, ind = synthetic.query(X[index.members[c]], k)
+                    candidates.append((dist, ind + n_original))
+                _, ind = merge_neighbors(*zip(*candidates), k)
+                keep[index.members[c]] = np.all(y_res[ind[:, 1:]] == c, axis=1)
+            for c in synthetic.classes:
+                dist, ind = synthetic.nearest(c, k)
+                candidates = [(dist, ind + n_original), index.query(synthetic.X[synthetic.members[c]], k)]
+                _, ind = merge_neighbors(*zip(*candidates), k)
+                keep[synthetic.members[c] + n_original] = np.all(y_res[ind[:, 1:]] == c, axis=1)
+
+        # mesma ordem de saída do EditedNearestNeighbours: por classe, índices crescentes
+        sample_indices = np.concatenate([np.flatnonzero(keep & (y_res == c)) for c in np.unique(y_res)])
+        enn.sample_indices_ = sample_indices
+        return X_res[sample_indices], y_res[sample_indices]
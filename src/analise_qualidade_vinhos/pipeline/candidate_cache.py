@@ -0,0 +1,123 @@
+"""On-disk store of the model-search candidate fits, for resumable training.
+
+Each fitted candidate model is saved with its scores under a key derived
+from the train/test data, the feature code version (`feature_code_version`),
+the source of the samplers (`pipeline/balancing.py`) and the full
+configuration of the candidate (model, balancer and preprocessing
+parameters, library versions). A rerun with the same inputs
+loads the stored fits instead of training again, and a search interrupted
+halfway resumes from the candidates that finished: workers write each
+artifact atomically as soon as its fit completes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from joblib import dump, load
+
+from analise_qualidade_vinhos.data.feature_cache import feature_code_version
+from analise_qualidade_vinhos.pipeline import balancing
+
+
+def data_fingerprint(*frames) -> str:
+    """Hash of the values, index and column names of each DataFrame/Series."""
+    digest = hashlib.blake2b(digest_size=16)
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+        names = list(frame.columns) if isinstance(frame, pd.DataFrame) else [frame.name]
+        digest.update(json.dumps([str(name) for name in names]).encode())
+    return digest.hexdigest()
+
+
+def _config_repr(value: Any) -> Any:
+    """JSON-able, process-independent description of an estimator and its parameters."""
+    if hasattr(value, "get_params"):
+        params = value.get_params(deep=False)
+        return {
+            "class": f"{type(value).__module__}.{type(value).__qualname__}",
+            # threads não mudam o resultado (verificado na busca paralela)
+            "params": {k: _config_repr(v) for k, v in sorted(params.items()) if k != "n_jobs"},
+        }
+    if isinstance(value, (list, tuple)):
+        return [_config_repr(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _config_repr(v) for k, v in sorted(value.items())}
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if callable(value):
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', repr(value))}"
+    return repr(value)
+
+
+@lru_cache(maxsize=1)
+def balancing_code_version() -> str:
+    """Hash of the sampler source: a change there invalidates the resampled fits."""
+    return hashlib.blake2b(Path(balancing.__file__).read_bytes(), digest_size=8).hexdigest()
+
+
+def _library_versions() -> Dict[str, str]:
+    import imblearn
+    import sklearn
+
+    versions = {"sklearn": sklearn.__version__, "imblearn": imblearn.__version__}
+    for name in ("xgboost", "lightgbm"):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            pass
+    return versions
+
+
+def candidate_key(data_key: str, name: str, **components) -> str:
+    """`{name}-{hash}` for a candidate; `components` are estimators or plain values."""
+    config = {
+        "data": data_key,
+        "features": feature_code_version(),
+        "balancing": balancing_code_version(),
+        "versions": _library_versions(),
+        "components": _config_repr(components),
+    }
+    digest = hashlib.blake2b(json.dumps(config, sort_keys=True).encode(), digest_size=12)
+    return f"{name}-{digest.hexdigest()}"
+
+
+class CandidateCache:
+    """Directory of `{key}.joblib` artifacts (`None` directory = disabled)."""
+
+    def __init__(self, directory: Optional[Path]):
+        self.directory = Path(directory) if directory is not None else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def path(self, key: str) -> Optional[Path]:
+        return self.directory / f"{key}.joblib" if self.enabled else None
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            return load(path)
+        except Exception as exc:  # artefato corrompido/incompatível: treina de novo
+            print(f"⚠️ Candidato em cache inválido ({path.name}): {exc}")
+            return None
+
+
+def save_candidate(path: Optional[str], result: Dict[str, Any]) -> None:
+    """Atomic write of one finished candidate (called from the worker that fitted it)."""
+    if path is None or "error" in result:
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    dump(result, tmp_path)
+    os.replace(tmp_path, path)
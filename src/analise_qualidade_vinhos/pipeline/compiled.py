@@ -0,0 +1,472 @@
+"""
+Compile a fitted training pipeline into flat NumPy arrays for fast inference.
+
+`compile_pipeline` reads the fitted preprocessing (feature step, imputer,
+scaler, feature selection) and the tree ensemble (RandomForest/ExtraTrees,
+GradientBoosting, XGBoost or LightGBM) into a `CompiledModel`. The compiled model is saved as
+a single `.npz` file and evaluated with vectorized NumPy only: loading it does
+not import scikit-learn, xgboost or lightgbm. The libraries are imported
+lazily, and only by `compile_pipeline`.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from analise_qualidade_vinhos.features.engineering import (
+    FEATURE_COLUMNS,
+    apply_feature_statistics,
+    build_feature_array,
+    compute_feature_array,
+    rename_columns,
+)
+
+# Modos de tratamento de valor ausente por nó (missing_type do LightGBM)
+_MISSING_NONE, _MISSING_ZERO, _MISSING_NAN = 0, 1, 2
+_LGBM_ZERO_THRESHOLD = 1e-35
+
+# Linhas avaliadas por vez: limita a matriz (linhas x árvores) de índices de nó
+_ROWS_PER_CHUNK = 2048
+# Níveis percorridos entre duas remoções de células que já chegaram à folha
+_COMPACT_EVERY = 4
+
+
+class CompiledModel:
+    """Flat-array pipeline: impute -> scale -> select -> tree ensemble.
+
+    `predict` accepts the same input as the sklearn pipeline (the raw
+    measurements when the pipeline has a fitted `features` step, otherwise
+    the engineered columns from `prepare_input`) and returns the same labels.
+    """
+
+    def __init__(self, meta: dict, arrays: Dict[str, np.ndarray]):
+        self.meta = meta
+        self.arrays = arrays
+        self.classes_ = np.asarray(meta["classes"], dtype=object)
+        self.input_columns: List[str] = meta["input_columns"]
+        # Pipeline com etapa `features`: recebe as 11 medidas brutas (ver `uses_fitted_features`)
+        self.fitted_features = bool(meta.get("fitted_features", False))
+        # Só as colunas mantidas pelo imputer e pelo SelectKBest são calculadas;
+        # imputação e escala são por coluna, então aplicá-las depois de selecionar é equivalente
+        selected = arrays["selected_columns"]
+        self._used = arrays["kept_columns"][selected]
+        self._used_names = [self.input_columns[i] for i in self._used]
+        self._impute = arrays["impute_values"][selected]
+        self._mean = arrays["scale_mean"][selected] if "scale_mean" in arrays else None
+        self._scale = arrays["scale_scale"][selected] if "scale_scale" in arrays else None
+        if self.fitted_features:
+            self._feature_idx = arrays["preprocess_columns"][self._used]
+            self._computed = [FEATURE_COLUMNS[i] for i in self._feature_idx]
+            self._feature_stats = tuple(
+                arrays[k][self._feature_idx] for k in ("feature_medians", "feature_lower", "feature_upper")
+            )
+        # Estruturas derivadas usadas na travessia (não são salvas): filhos
+        # intercalados (esq, dir) em int32; uma folha aponta para si mesma
+        self._is_leaf = arrays["left"] < 0
+        leaf_ids = np.flatnonzero(self._is_leaf)
+        children = np.stack([arrays["left"], arrays["right"]], axis=1).astype(np.int32)
+        children[leaf_ids] = leaf_ids[:, None]
+        self._children = children.ravel()
+        self._roots = arrays["roots"].astype(np.int32)
+        self._feature = arrays["feature"].astype(np.int32)
+
+    # ------------------------------------------------------------------ io
+    def save(self, path: Path) -> Path:
+        path = Path(path)
+        meta = np.frombuffer(json.dumps(self.meta).encode("utf-8"), dtype=np.uint8)
+        with path.open("wb") as fp:
+            np.savez(fp, __meta__=meta, **self.arrays)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "CompiledModel":
+        with np.load(Path(path), allow_pickle=False) as data:
+            meta = json.loads(data["__meta__"].tobytes().decode("utf-8"))
+            arrays = {k: data[k] for k in data.files if k != "__meta__"}
+        return cls(meta, arrays)
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.arrays["left"].shape[0])
+
+    # ----------------------------------------------------------- inference
+    def transform(self, X) -> np.ndarray:
+        """Apply the compiled feature step (if any), imputer, scaler and feature selection."""
+        if self.fitted_features:
+            if isinstance(X, pd.DataFrame):
+                arr, _ = build_feature_array(rename_columns(X), fill_missing=False, features=self._computed)
+            else:
+                arr = compute_feature_array(
+                    np.asarray(X, dtype=np.float64), fill_missing=False, features=self._computed
+                )
+            X = arr[:, self._feature_idx]
+            apply_feature_statistics(X, *self._feature_stats)
+        elif isinstance(X, pd.DataFrame):
+            X = X[self._used_names].to_numpy(dtype=np.float64)
+        else:
+            X = np.asarray(X, dtype=np.float64)[:, self._used]
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.take(self._impute, np.nonzero(missing)[1])
+        if self._mean is not None:
+            X -= self._mean
+        if self._scale is not None:
+            X /= self._scale
+        return X
+
+    def decision(self, X) -> np.ndarray:
+        """Aggregated ensemble output: mean class probabilities (forests) or raw scores."""
+        Xt = self.transform(X)
+        if self.meta["x_dtype"] == "float32":
+            Xt = Xt.astype(np.float32)
+        out = [self._evaluate(Xt[i : i + _ROWS_PER_CHUNK]) for i in range(0, len(Xt), _ROWS_PER_CHUNK)]
+        return np.concatenate(out) if out else np.empty((0, len(self.classes_)))
+
+    def predict(self, X) -> np.ndarray:
+        scores = self.decision(X)
+        if self.meta["decision"] == "argmax":
+            return self.classes_.take(np.argmax(scores, axis=1))
+        if self.meta["decision"] == "ge0":
+            return self.classes_.take((scores[:, 0] >= 0).astype(int))
+        return self.classes_.take((scores[:, 0] > 0).astype(int))
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node index reached by every (row, tree) pair, shape (rows, trees).
+
+        All (row, tree) cells descend one level per step; cells that reach a
+        leaf are dropped from the active set, so shallow branches stop early.
+        """
+        a = self.arrays
+        feature, threshold, children = self._feature, a["threshold"], self._children
+        n_rows, n_features = X.shape
+        n_trees = self._roots.shape[0]
+        X_flat = np.ascontiguousarray(X).ravel()
+        strict = self.meta["comparison"] == "lt"
+        missing_modes = a.get("missing_mode")
+        check_missing = missing_modes is not None or bool(np.isnan(X_flat).any())
+
+        # Células em ordem árvore-major (nós de uma mesma árvore ficam no cache).
+        # Folhas apontam para si mesmas, então células já resolvidas podem dar
+        # passos extras; elas só são removidas a cada `_COMPACT_EVERY` níveis.
+        cur = np.repeat(self._roots, n_rows)
+        leaves = np.empty_like(cur)
+        active = np.arange(cur.shape[0], dtype=np.int64)
+        offset = np.tile(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        step = 0
+        while active.size:
+            if step % _COMPACT_EVERY == 0:
+                done = self._is_leaf.take(cur)
+                if done.any():
+                    leaves[active[done]] = cur[done]
+                    keep = ~done
+                    active, cur, offset = active[keep], cur[keep], offset[keep]
+                    if not active.size:
+                        break
+            step += 1
+            x = X_flat.take(offset + feature.take(cur))
+            with np.errstate(invalid="ignore"):
+                go_right = x >= threshold.take(cur) if strict else x > threshold.take(cur)
+            if check_missing:
+                if missing_modes is not None:
+                    mode = missing_modes[cur]
+                    # LightGBM: NaN vira 0 quando o nó não trata NaN como ausente
+                    x = np.where(np.isnan(x) & (mode != _MISSING_NAN), 0.0, x)
+                    is_missing = np.isnan(x) | ((mode == _MISSING_ZERO) & (np.abs(x) <= _LGBM_ZERO_THRESHOLD))
+                    with np.errstate(invalid="ignore"):
+                        go_right = x >= threshold.take(cur) if strict else x > threshold.take(cur)
+                else:
+                    is_missing = np.isnan(x)
+                go_right = np.where(is_missing, ~a["default_left"][cur], go_right)
+            cur = children.take(2 * cur + go_right)
+        return leaves.reshape(n_trees, n_rows).T
+
+    def _evaluate(self, X: np.ndarray) -> np.ndarray:
+        a = self.arrays
+        node = self._leaves(X)
+        if self.meta["aggregation"] == "mean_proba":
+            # cumsum acumula árvore a árvore, na mesma ordem (e arredondamento) do sklearn
+            proba = a["value"][node].cumsum(axis=1)[:, -1]
+            return proba / node.shape[1]
+        acc_dtype = np.float32 if self.meta["acc_dtype"] == "float32" else np.float64
+        raw = np.tile(a["init"].astype(acc_dtype), (X.shape[0], 1))
+        contrib = (a["scale"].astype(acc_dtype) * a["value"][node, 0].astype(acc_dtype))
+        tree_class = a["tree_class"]
+        for t in range(node.shape[1]):
+            raw[:, tree_class[t]] += contrib[:, t]
+        return raw.astype(np.float64)
+
+
+# ---------------------------------------------------------------- export
+def _stack_trees(trees: Sequence[dict]) -> Dict[str, np.ndarray]:
+    """Concatenate per-tree node arrays, shifting child indices to global ids."""
+    offsets = np.cumsum([0] + [len(t["left"]) for t in trees[:-1]])
+    out = {
+        "roots": offsets.astype(np.int64),
+        "left": np.concatenate([np.where(t["left"] >= 0, t["left"] + o, -1) for t, o in zip(trees, offsets)]),
+        "right": np.concatenate([np.where(t["right"] >= 0, t["right"] + o, -1) for t, o in zip(trees, offsets)]),
+        "feature": np.concatenate([np.maximum(t["feature"], 0) for t in trees]),
+        "threshold": np.concatenate([t["threshold"] for t in trees]).astype(np.float64),
+        "default_left": np.concatenate([t["default_left"] for t in trees]).astype(bool),
+        "value": np.concatenate([t["value"] for t in trees]).astype(np.float64),
+    }
+    for key in ("left", "right", "feature"):
+        out[key] = out[key].astype(np.int64)
+    if any("missing_mode" in t for t in trees):
+        out["missing_mode"] = np.concatenate(
+            [t.get("missing_mode", np.zeros(len(t["left"]), dtype=np.int8)) for t in trees]
+        ).astype(np.int8)
+    return out
+
+
+def _sklearn_tree(tree, normalize: bool) -> dict:
+    t = tree.tree_
+    value = t.value[:, 0, :] if not normalize else t.value[:, 0, :].copy()
+    if normalize:
+        # Mesma normalização de DecisionTreeClassifier.predict_proba
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value /= normalizer
+    missing_left = getattr(t, "missing_go_to_left", np.zeros(t.node_count, dtype=np.uint8))
+    return {
+        "left": t.children_left.copy(),
+        "right": t.children_right.copy(),
+        "feature": t.feature.copy(),
+        "threshold": t.threshold.copy(),
+        "default_left": np.asarray(missing_left, dtype=bool),
+        "value": value,
+    }
+
+
+def _compile_forest(model) -> tuple:
+    trees = [_sklearn_tree(est, normalize=True) for est in model.estimators_]
+    meta = {
+        "ensemble": type(model).__name__,
+        "aggregation": "mean_proba",
+        "comparison": "le",
+        "x_dtype": "float32",
+        "decision": "argmax",
+    }
+    return meta, _stack_trees(trees), list(model.classes_)
+
+
+def _compile_gradient_boosting(model) -> tuple:
+    from sklearn.dummy import DummyClassifier
+
+    if not (model.init_ == "zero" or isinstance(model.init_, DummyClassifier)):
+        raise ValueError("GradientBoosting com estimador init customizado não é suportado")
+    n_stages, n_outputs = model.estimators_.shape
+    trees, tree_class = [], []
+    for i in range(n_stages):
+        for k in range(n_outputs):
+            trees.append(_sklearn_tree(model.estimators_[i, k], normalize=False))
+            tree_class.append(k)
+    n_features = model.n_features_in_
+    init = model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0]
+    arrays = _stack_trees(trees)
+    arrays.update(
+        init=np.asarray(init, dtype=np.float64),
+        scale=np.full(len(trees), model.learning_rate, dtype=np.float64)[None, :],
+        tree_class=np.asarray(tree_class, dtype=np.int64),
+    )
+    meta = {
+        "ensemble": type(model).__name__,
+        "aggregation": "additive",
+        "acc_dtype": "float64",
+        "comparison": "le",
+        "x_dtype": "float32",
+        "decision": "argmax" if n_outputs > 1 else "ge0",
+    }
+    return meta, arrays, list(model.classes_)
+
+
+def _lgbm_tree(structure: dict) -> dict:
+    nodes: List[dict] = []
+
+    def visit(node: dict) -> int:
+        idx = len(nodes)
+        nodes.append({})
+        if "leaf_value" in node or "split_feature" not in node:
+            nodes[idx] = {"left": -1, "right": -1, "feature": 0, "threshold": 0.0, "default_left": False,
+                          "missing_mode": _MISSING_NONE, "value": node.get("leaf_value", 0.0)}
+            return idx
+        if node["decision_type"] != "<=":
+            raise ValueError("Splits categóricos do LightGBM não são suportados")
+        mode = {"None": _MISSING_NONE, "Zero": _MISSING_ZERO, "NaN": _MISSING_NAN}[node["missing_type"]]
+        entry = {"feature": node["split_feature"], "threshold": node["threshold"],
+                 "default_left": node["default_left"], "missing_mode": mode, "value": 0.0}
+        entry["left"] = visit(node["left_child"])
+        entry["right"] = visit(node["right_child"])
+        nodes[idx] = entry
+        return idx
+
+    visit(structure)
+    column = lambda key, dtype: np.asarray([n[key] for n in nodes], dtype=dtype)  # noqa: E731
+    return {
+        "left": column("left", np.int64),
+        "right": column("right", np.int64),
+        "feature": column("feature", np.int64),
+        "threshold": column("threshold", np.float64),
+        "default_left": column("default_left", bool),
+        "missing_mode": column("missing_mode", np.int8),
+        "value": column("value", np.float64)[:, None],
+    }
+
+
+def _compile_lightgbm(model) -> tuple:
+    dump = model.booster_.dump_model()
+    num_class = int(dump["num_class"])
+    trees = [_lgbm_tree(info["tree_structure"]) for info in dump["tree_info"]]
+    arrays = _stack_trees(trees)
+    arrays.update(
+        init=np.zeros(num_class, dtype=np.float64),
+        scale=np.ones((1, len(trees)), dtype=np.float64),
+        tree_class=np.arange(len(trees), dtype=np.int64) % num_class,
+    )
+    meta = {
+        "ensemble": type(model).__name__,
+        "aggregation": "additive",
+        "acc_dtype": "float64",
+        "comparison": "le",
+        "x_dtype": "float64",
+        "decision": "argmax" if num_class > 1 else "gt0",
+    }
+    return meta, arrays, list(model.classes_)
+
+
+def _compile_xgboost(model) -> tuple:
+    raw = json.loads(model.get_booster().save_raw("json"))
+    learner = raw["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in {"binary:logistic", "multi:softprob", "multi:softmax"}:
+        raise ValueError(f"Objetivo XGBoost não suportado: {objective}")
+    params = learner["learner_model_param"]
+    num_class = max(int(params.get("num_class", "0")), 1)
+    base_score = float(str(params["base_score"]).strip("[]"))
+    booster = learner["gradient_booster"]["model"]
+    trees = []
+    for tree in booster["trees"]:
+        if any(tree.get("split_type", [])):
+            raise ValueError("Splits categóricos do XGBoost não são suportados")
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32).astype(np.float64)
+        trees.append({
+            "left": left,
+            "right": np.asarray(tree["right_children"], dtype=np.int64),
+            "feature": np.asarray(tree["split_indices"], dtype=np.int64),
+            "threshold": cond,
+            "default_left": np.asarray(tree["default_left"], dtype=bool),
+            "value": np.where(left < 0, cond, 0.0)[:, None],
+        })
+    if objective == "binary:logistic":
+        init = np.array([np.log(base_score / (1.0 - base_score))], dtype=np.float32)
+    else:
+        init = np.full(num_class, base_score, dtype=np.float32)
+    arrays = _stack_trees(trees)
+    arrays.update(
+        init=init.astype(np.float64),
+        scale=np.ones((1, len(trees)), dtype=np.float64),
+        tree_class=np.asarray(booster["tree_info"], dtype=np.int64),
+    )
+    meta = {
+        "ensemble": type(model).__name__,
+        "aggregation": "additive",
+        "acc_dtype": "float32",
+        "comparison": "lt",
+        "x_dtype": "float32",
+        "decision": "argmax" if num_class > 1 else "gt0",
+    }
+    return meta, arrays, list(model.classes_)
+
+
+def _compile_preprocessor(preprocess) -> tuple:
+    """Read the fitted ColumnTransformer(imputer -> scaler -> selector)."""
+    name, numeric, columns = preprocess.transformers_[0]
+    columns = list(columns)
+    steps = dict(numeric.named_steps) if hasattr(numeric, "named_steps") else {}
+    arrays: Dict[str, np.ndarray] = {}
+    kept = np.arange(len(columns))
+
+    imputer = steps.get("imputer")
+    impute_values = np.full(len(columns), np.nan)
+    if imputer is not None:
+        stats = np.asarray(imputer.statistics_, dtype=np.float64)
+        if not getattr(imputer, "keep_empty_features", False):
+            kept = np.flatnonzero(~np.isnan(stats))  # colunas vazias no treino são descartadas
+        impute_values = stats[kept]
+    arrays["kept_columns"] = kept.astype(np.int64)
+    arrays["impute_values"] = np.asarray(impute_values, dtype=np.float64)
+
+    scaler = steps.get("scaler")
+    if scaler is not None:
+        if getattr(scaler, "with_mean", False):
+            arrays["scale_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+        if getattr(scaler, "with_std", False):
+            arrays["scale_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+
+    selector = steps.get("feature_selection")
+    n_after = len(kept)
+    selected = np.flatnonzero(selector.get_support()) if selector is not None else np.arange(n_after)
+    arrays["selected_columns"] = selected.astype(np.int64)
+    return columns, arrays
+
+
+def compile_pipeline(pipeline) -> CompiledModel:
+    """Compile a fitted `build_training_pipeline` pipeline into a `CompiledModel`.
+
+    Raises `ValueError` for estimators or preprocessing steps that have no
+    flat-array equivalent.
+    """
+    from sklearn.ensemble import (
+        ExtraTreesClassifier,
+        GradientBoostingClassifier,
+        RandomForestClassifier,
+    )
+
+    steps = dict(pipeline.named_steps)
+    model = steps["model"]
+    columns, arrays = _compile_preprocessor(steps["preprocess"])
+    features = steps.get("features")
+    if features is not None:
+        arrays.update(
+            feature_medians=np.asarray(features.medians_, dtype=np.float64),
+            feature_lower=np.asarray(features.lower_, dtype=np.float64),
+            feature_upper=np.asarray(features.upper_, dtype=np.float64),
+            preprocess_columns=np.asarray([FEATURE_COLUMNS.index(c) for c in columns], dtype=np.int64),
+        )
+
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        meta, tree_arrays, classes = _compile_forest(model)
+    elif isinstance(model, GradientBoostingClassifier):
+        meta, tree_arrays, classes = _compile_gradient_boosting(model)
+    elif type(model).__name__ == "LGBMClassifier":
+        meta, tree_arrays, classes = _compile_lightgbm(model)
+    elif type(model).__name__ == "XGBClassifier":
+        meta, tree_arrays, classes = _compile_xgboost(model)
+    else:
+        raise ValueError(f"Modelo não suportado para compilação: {type(model).__name__}")
+
+    arrays.update(tree_arrays)
+    meta.update(fitted_features=features is not None, input_columns=columns, classes=[c.item() if hasattr(c, "item") else c for c in classes])
+    return CompiledModel(meta, arrays)
+
+
+def export_compiled(pipeline, path: Path, X_check=None) -> CompiledModel:
+    """Compile, optionally verify against `pipeline.predict(X_check)`, and save."""
+    compiled = compile_pipeline(pipeline)
+    if X_check is not None:
+        expected = np.asarray(pipeline.predict(X_check))
+        got = compiled.predict(X_check)
+        mismatches = int((expected != got).sum())
+        if mismatches:
+            raise ValueError(f"Modelo compilado diverge do pipeline em {mismatches} amostras")
+    compiled.save(path)
+    return compiled
+
+
+def load_compiled(path: Path) -> CompiledModel:
+    return CompiledModel.load(path)
@@ -0,0 +1,119 @@
+"""Distill the selected model into a small, low-latency student pipeline.
+
+The search winner is often a 500-tree, depth-25 RandomForest: tens of MB
+on disk and slow to load and to score a single row. `distill_pipeline`
+keeps the teacher's fitted preprocessing (`features`, `preprocess`) and
+replaces only the model with a shallow boosted ensemble trained on the
+teacher's predictions, not on the original labels. The training rows are
+augmented with points interpolated between each row and one of its
+nearest neighbors (any class) in the model input space. The teacher
+labels those points too, so the student learns the teacher's decision
+boundaries where the data is dense.
+
+`serving_profile` measures what the swap buys: artifact size, load time
+and prediction latency.
+"""
+
+from __future__ import annotations
+
+import copy
+import io
+import time
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+from imblearn.pipeline import Pipeline
+from joblib import dump, load
+from sklearn.ensemble import GradientBoostingClassifier
+
+from analise_qualidade_vinhos.config.settings import RANDOM_STATE, TRAIN_N_JOBS
+from analise_qualidade_vinhos.pipeline.balancing import NeighborIndex
+
+try:
+    from lightgbm import LGBMClassifier
+    LIGHTGBM_AVAILABLE = True
+except ImportError:
+    LIGHTGBM_AVAILABLE = False
+
+
+def build_student(n_jobs: int | None = None):
+    """Shallow boosted trees: LightGBM when available, else sklearn's GradientBoosting."""
+    if LIGHTGBM_AVAILABLE:
+        return LGBMClassifier(
+            n_estimators=150,
+            num_leaves=15,
+            max_depth=5,
+            learning_rate=0.1,
+            min_child_samples=5,
+            random_state=RANDOM_STATE,
+            n_jobs=TRAIN_N_JOBS if n_jobs is None else n_jobs,
+            verbose=-1,
+        )
+    return GradientBoostingClassifier(n_estimators=150, max_depth=4, learning_rate=0.1, random_state=RANDOM_STATE)
+
+
+def model_input(pipeline: Pipeline, X: pd.DataFrame) -> np.ndarray:
+    """Rows as the final model sees them at predict time (samplers are skipped)."""
+    for _, step in pipeline.steps[:-1]:
+        if not hasattr(step, "fit_resample"):
+            X = step.transform(X)
+    return np.asarray(X)
+
+
+def augment(X: np.ndarray, n_per_row: int, n_neighbors: int = 5, random_state: int = RANDOM_STATE) -> np.ndarray:
+    """`X` plus `n_per_row` points per row on the segment to a random one of its `n_neighbors` nearest rows."""
+    if n_per_row <= 0 or len(X) < 2:
+        return X
+    _, neighbors = NeighborIndex(X, np.zeros(len(X))).query(X, n_neighbors + 1)
+    rng = np.random.default_rng(random_state)
+    rows = np.repeat(np.arange(len(X)), n_per_row)
+    cols = rng.integers(1, neighbors.shape[1], size=len(rows))  # coluna 0 é a própria linha
+    steps = rng.uniform(size=(len(rows), 1))
+    synthetic = X[rows] + steps * (X[neighbors[rows, cols]] - X[rows])
+    return np.vstack([X, synthetic.astype(X.dtype, copy=False)])
+
+
+def distill_pipeline(
+    teacher: Pipeline, X_train: pd.DataFrame, n_per_row: int = 4, student=None
+) -> Pipeline:
+    """Copy of `teacher` whose model is `student` (default `build_student()`) fitted on teacher labels."""
+    X_aug = augment(model_input(teacher, X_train), n_per_row)
+    y_aug = teacher.steps[-1][1].predict(X_aug)
+    model = build_student() if student is None else student
+    model.fit(X_aug, y_aug)
+
+    distilled = copy.deepcopy(Pipeline(teacher.steps[:-1]))
+    distilled.steps.append(("model", model))
+    return distilled
+
+
+def serving_profile(pipeline, X: pd.DataFrame, repeats: int = 20) -> Dict[str, Any]:
+    """Serialized size, load time and latency (one row; per row over `X` in one batch)."""
+    buffer = io.BytesIO()
+    dump(pipeline, buffer)
+    size = buffer.tell()
+    buffer.seek(0)
+    start = time.perf_counter()
+    load(buffer)
+    load_seconds = time.perf_counter() - start
+
+    one_row = X.iloc[:1]
+    pipeline.predict(one_row)  # aquecimento
+    start = time.perf_counter()
+    for _ in range(repeats):
+        pipeline.predict(one_row)
+    single_seconds = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    pipeline.predict(X)
+    batch_seconds = time.perf_counter() - start
+
+    model = pipeline.steps[-1][1]
+    return {
+        "model": type(model).__name__,
+        "n_estimators": getattr(model, "n_estimators", None),
+        "size_bytes": size,
+        "load_ms": round(load_seconds * 1e3, 2),
+        "predict_one_row_ms": round(single_seconds * 1e3, 3),
+        "predict_batch_us_per_row": round(batch_seconds / len(X) * 1e6, 2),
+    }
@@ -0,0 +1,177 @@
+"""Warm-start retraining of a fitted pipeline on newly labeled samples.
+
+Instead of running the whole model search again on the full history,
+`update_pipeline` keeps the fitted artifact and:
+
+1. updates the preprocessing statistics with the new rows
+   (`WineFeatureTransformer.partial_fit` and `StandardScaler.partial_fit`);
+2. rewrites the split thresholds of the existing trees for the new
+   standardization, so they keep splitting the same values (a split
+   between two values one rounding step apart may still flip);
+3. adds trees (RandomForest, `warm_start`) or boosting rounds
+   (GradientBoosting `warm_start`, LightGBM `init_model`, XGBoost
+   `xgb_model`) fitted only on the new, rebalanced rows.
+
+The number of new estimators is proportional to the share of new rows, so
+the cost grows with the new data, not with the history. Imputation
+medians and the `SelectKBest` choice stay frozen: the model's input layout
+cannot change without a full retrain.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import warnings
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from imblearn.pipeline import Pipeline
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+try:
+    import xgboost
+    from xgboost import XGBClassifier
+    XGBOOST_AVAILABLE = True
+except ImportError:
+    XGBOOST_AVAILABLE = False
+
+try:
+    import lightgbm
+    from lightgbm import LGBMClassifier
+    LIGHTGBM_AVAILABLE = True
+except ImportError:
+    LIGHTGBM_AVAILABLE = False
+
+
+def partial_fit_preprocess(pipeline: Pipeline, X_new: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Update `features` and the scaler of `preprocess` in place with `X_new`.
+
+    Returns `(scale, shift)` per model input column: a value standardized
+    with the old statistics becomes `old * scale + shift` with the new ones.
+    """
+    features = pipeline.named_steps["features"]
+    features.partial_fit(X_new)
+    # todas as colunas calculadas (não as medianas de `restrict`) para as estatísticas do scaler
+    required = features.required_features_
+    full = features.restrict(None).transform(X_new)
+    features.restrict(required)
+    _, numeric, columns = pipeline.named_steps["preprocess"].transformers_[0]
+    imputed = numeric.named_steps["imputer"].transform(full[columns])
+
+    scaler = numeric.named_steps["scaler"]
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(imputed)
+    scale = old_scale / scaler.scale_
+    shift = (old_mean - scaler.mean_) / scaler.scale_
+
+    selector = numeric.named_steps.get("feature_selection")
+    if selector is not None:
+        support = selector.get_support()
+        scale, shift = scale[support], shift[support]
+    return scale, shift
+
+
+def _remap_sklearn_trees(model, scale: np.ndarray, shift: np.ndarray) -> None:
+    for tree in np.asarray(model.estimators_, dtype=object).ravel():
+        threshold, feature = tree.tree_.threshold, tree.tree_.feature
+        split = feature >= 0  # folhas têm feature -2
+        threshold[split] = threshold[split] * scale[feature[split]] + shift[feature[split]]
+
+
+def _remap_lightgbm(model, scale: np.ndarray, shift: np.ndarray):
+    lines, feature = [], None
+    for line in model.booster_.model_to_string().splitlines():
+        if line.startswith("tree_sizes="):
+            continue  # tamanhos em bytes deixam de valer; o parser lê as árvores em sequência
+        if line.startswith("split_feature="):
+            feature = np.array(line.split("=", 1)[1].split(), dtype=int)
+        elif line.startswith("threshold=") and feature is not None:
+            threshold = np.array(line.split("=", 1)[1].split(), dtype=float) * scale[feature] + shift[feature]
+            line = "threshold=" + " ".join(repr(float(t)) for t in threshold)
+            feature = None
+        lines.append(line)
+    return lightgbm.Booster(model_str="\n".join(lines) + "\n")
+
+
+def _remap_xgboost(model, scale: np.ndarray, shift: np.ndarray):
+    raw = json.loads(model.get_booster().save_raw("json"))
+    for tree in raw["learner"]["gradient_booster"]["model"]["trees"]:
+        split = np.asarray(tree["left_children"]) != -1
+        feature = np.asarray(tree["split_indices"])[split]
+        condition = np.asarray(tree["split_conditions"], dtype=np.float64)
+        remapped = (condition[split] * scale[feature] + shift[feature]).astype(np.float32)
+        # XGBoost testa `x < limite` em float32 e os limites são valores dos dados:
+        # recua alguns ulps para que os empates continuem indo para a direita
+        condition[split] = remapped - 8 * np.spacing(np.abs(remapped))
+        tree["split_conditions"] = condition.tolist()
+    booster = xgboost.Booster()
+    booster.load_model(bytearray(json.dumps(raw).encode()))
+    return booster
+
+
+def warm_start_model(model, X, y, n_new_estimators: int, scale: np.ndarray, shift: np.ndarray):
+    """Remap `model`'s existing trees by `(scale, shift)` and add `n_new_estimators` fitted on `(X, y)`."""
+    missing = set(model.classes_) - set(np.unique(y))
+    if missing:
+        raise ValueError(f"Amostras novas sem as classes {sorted(missing)}: use o retreino completo.")
+    total = model.n_estimators + n_new_estimators
+
+    if isinstance(model, (RandomForestClassifier, GradientBoostingClassifier)):
+        _remap_sklearn_trees(model, scale, shift)
+        model.set_params(warm_start=True, n_estimators=total)
+        model.fit(X, y)
+        return model.set_params(warm_start=False)
+    if LIGHTGBM_AVAILABLE and isinstance(model, LGBMClassifier):
+        booster = _remap_lightgbm(model, scale, shift)
+        updated = clone(model).set_params(n_estimators=n_new_estimators)
+        updated.fit(X, y, init_model=booster)
+        return updated.set_params(n_estimators=total)
+    if XGBOOST_AVAILABLE and isinstance(model, XGBClassifier):
+        booster = _remap_xgboost(model, scale, shift)
+        updated = clone(model).set_params(n_estimators=n_new_estimators)
+        updated.fit(X, y, xgb_model=booster)
+        return updated.set_params(n_estimators=total)
+    raise TypeError(f"Retreino incremental não suportado para {type(model).__name__}")
+
+
+def update_pipeline(
+    pipeline: Pipeline, X_new: pd.DataFrame, y_new: pd.Series, n_new_estimators: int | None = None
+) -> Tuple[Pipeline, Dict[str, Any]]:
+    """Warm-start `pipeline` (fitted by `train_model`) on the new labeled rows, in place.
+
+    `n_new_estimators` defaults to the current number of trees/rounds times
+    the ratio between new rows and rows already seen by the scaler.
+    """
+    if len(X_new) == 0:
+        raise ValueError("Nenhuma amostra nova para o retreino incremental.")
+    _, numeric, _ = pipeline.named_steps["preprocess"].transformers_[0]
+    n_seen = int(np.max(numeric.named_steps["scaler"].n_samples_seen_))
+    model = pipeline.named_steps["model"]
+    if n_new_estimators is None:
+        n_new_estimators = max(1, math.ceil(model.n_estimators * len(X_new) / n_seen))
+
+    scale, shift = partial_fit_preprocess(pipeline, X_new)
+    X_prep = pipeline.named_steps["preprocess"].transform(pipeline.named_steps["features"].transform(X_new))
+
+    balancer = clone(pipeline.named_steps["balance"])
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            X_res, y_res = balancer.fit_resample(X_prep, y_new)
+    except ValueError as e:  # poucas amostras por classe para os vizinhos do SMOTE/ADASYN
+        print(f"⚠️ Balanceamento ignorado no lote novo: {e}")
+        X_res, y_res = X_prep, y_new
+
+    n_before = model.n_estimators
+    pipeline.steps[-1] = ("model", warm_start_model(model, X_res, y_res, n_new_estimators, scale, shift))
+    info = {
+        "n_new": len(X_new),
+        "n_seen_before": n_seen,
+        "n_resampled": len(y_res),
+        "estimators_before": n_before,
+        "estimators_added": n_new_estimators,
+    }
+    return pipeline, info
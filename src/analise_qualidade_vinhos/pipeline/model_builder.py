@@ -2,10 +2,13 @@
 
 from __future__ import annotations
 
-from typing import List, Dict, Any
+import math
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
 
-from imblearn.combine import SMOTEENN
-from imblearn.over_sampling import SMOTE, ADASYN
+import numpy as np
+from joblib import Parallel, cpu_count, delayed, parallel_config
 from imblearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
@@ -25,7 +28,28 @@ try:
 except ImportError:
     LIGHTGBM_AVAILABLE = False
 
-from analise_qualidade_vinhos.config.settings import QUALITY_LABELS, RANDOM_STATE
+from analise_qualidade_vinhos.config.settings import (
+    QUALITY_LABELS,
+    RANDOM_STATE,
+    TRAIN_N_JOBS,
+    TRAIN_SEARCH,
+    TRAIN_SEARCH_ETA,
+    TRAIN_SEARCH_MAX_SECONDS,
+)
+from analise_qualidade_vinhos.features.transformer import WineFeatureTransformer
+from analise_qualidade_vinhos.pipeline.balancing import (
+    IndexedADASYN,
+    IndexedSMOTE,
+    IndexedSMOTEENN,
+    NeighborIndex,
+)
+from analise_qualidade_vinhos.pipeline.candidate_cache import (
+    CandidateCache,
+    candidate_key,
+    data_fingerprint,
+    save_candidate,
+)
+from analise_qualidade_vinhos.utils.profiling import measure_since, profile_stage, record_stage, snapshot
 
 
 NUMERIC_FEATURES: List[str] = [
@@ -76,24 +100,33 @@ def build_preprocessor(use_feature_selection: bool = True, k_best: int = 20) ->
     )
 
 
-def build_training_pipeline(
-    algorithm: str = "xgboost",
-    use_feature_selection: bool = True,
-    k_best: int = 20,
-    balance_method: str = "smoteenn",
-) -> Pipeline:
-    """
-    Build training pipeline with multiple algorithm options.
-    
-    Args:
-        algorithm: 'random_forest', 'gradient_boosting', 'xgboost', 'lightgbm'
-        use_feature_selection: Whether to use feature selection
-        k_best: Number of features to select
-        balance_method: 'smote', 'adasyn', 'smoteenn'
+def selected_feature_names(preprocessor: ColumnTransformer) -> List[str]:
+    """Names of the columns that survive the fitted imputer and `SelectKBest`."""
+    _, numeric, columns = preprocessor.transformers_[0]
+    names = np.asarray(columns, dtype=object)
+    imputer = numeric.named_steps.get("imputer")
+    if imputer is not None and not imputer.keep_empty_features:
+        names = names[~np.isnan(imputer.statistics_)]  # colunas vazias no treino são descartadas
+    selector = numeric.named_steps.get("feature_selection")
+    if selector is not None:
+        names = names[selector.get_support()]
+    return names.tolist()
+
+
+def prune_unselected_features(pipeline: Pipeline) -> Pipeline:
+    """Make the fitted `features` step compute only what the selector keeps."""
+    if "features" in pipeline.named_steps:
+        selected = selected_feature_names(pipeline.named_steps["preprocess"])
+        pipeline.named_steps["features"].restrict(selected)
+    return pipeline
+
+
+def build_model(algorithm: str = "xgboost", n_jobs: int = -1, params: Dict[str, Any] | None = None):
+    """Unfitted estimator for `algorithm` (see `build_training_pipeline`).
+
+    `params` overrides the default hyperparameters (e.g. the best trial of
+    `tuning.tune_hyperparameters`).
     """
-    preprocessor = build_preprocessor(use_feature_selection=use_feature_selection, k_best=k_best)
-    
-    # Seleção do algoritmo
     if algorithm == "random_forest":
         model = RandomForestClassifier(
             n_estimators=500,
@@ -101,7 +134,7 @@ def build_training_pipeline(
             min_samples_split=3,
             min_samples_leaf=1,
             max_features="sqrt",
-            n_jobs=-1,
+            n_jobs=n_jobs,
             class_weight="balanced",
             random_state=RANDOM_STATE,
             bootstrap=True,
@@ -125,7 +158,7 @@ def build_training_pipeline(
             subsample=0.8,
             colsample_bytree=0.8,
             random_state=RANDOM_STATE,
-            n_jobs=-1,
+            n_jobs=n_jobs,
             eval_metric="logloss",  # logloss para binário, mlogloss para multiclasse
         )
     elif algorithm == "lightgbm" and LIGHTGBM_AVAILABLE:
@@ -137,7 +170,7 @@ def build_training_pipeline(
             subsample=0.8,
             colsample_bytree=0.8,
             random_state=RANDOM_STATE,
-            n_jobs=-1,
+            n_jobs=n_jobs,
             verbose=-1,
         )
     else:
@@ -150,124 +183,534 @@ def build_training_pipeline(
             min_samples_split=3,
             min_samples_leaf=1,
             max_features="sqrt",
-            n_jobs=-1,
+            n_jobs=n_jobs,
             class_weight="balanced",
             random_state=RANDOM_STATE,
         )
-    
-    # Seleção do método de balanceamento
+    if params:
+        model.set_params(**params)
+    return model
+
+
+def build_balancer(balance_method: str = "smoteenn"):
+    """Unfitted resampler for `balance_method` (see `build_training_pipeline`).
+
+    The samplers are the imblearn ones with neighbor searches shared
+    through `balancing.NeighborIndex` (same output).
+    """
     if balance_method == "smote":
-        balancer = SMOTE(random_state=RANDOM_STATE, k_neighbors=3)
+        balancer = IndexedSMOTE(random_state=RANDOM_STATE, k_neighbors=3)
     elif balance_method == "adasyn":
-        balancer = ADASYN(random_state=RANDOM_STATE, n_neighbors=3)
+        balancer = IndexedADASYN(random_state=RANDOM_STATE, n_neighbors=3)
     elif balance_method == "smoteenn":
-        balancer = SMOTEENN(random_state=RANDOM_STATE)
+        balancer = IndexedSMOTEENN(random_state=RANDOM_STATE)
     else:
-        balancer = SMOTE(random_state=RANDOM_STATE, k_neighbors=3)
+        balancer = IndexedSMOTE(random_state=RANDOM_STATE, k_neighbors=3)
+    return balancer
+
+
+def build_training_pipeline(
+    algorithm: str = "xgboost",
+    use_feature_selection: bool = True,
+    k_best: int = 20,
+    balance_method: str = "smoteenn",
+    n_jobs: int = -1,
+    model_params: Dict[str, Any] | None = None,
+) -> Pipeline:
+    """
+    Build training pipeline with multiple algorithm options.
     
+    Args:
+        algorithm: 'random_forest', 'gradient_boosting', 'xgboost', 'lightgbm'
+        use_feature_selection: Whether to use feature selection
+        k_best: Number of features to select
+        balance_method: 'smote', 'adasyn', 'smoteenn'
+        n_jobs: Threads for the estimators that support them (-1 = all cores)
+        model_params: Hyperparameters overriding the defaults of `build_model`
+    """
+    # Atributos derivados calculados dentro do pipeline, com medianas/limites do treino
     return Pipeline(
         steps=[
-            ("preprocess", preprocessor),
+            ("features", WineFeatureTransformer()),
+            ("preprocess", build_preprocessor(use_feature_selection=use_feature_selection, k_best=k_best)),
+            ("balance", build_balancer(balance_method)),
+            ("model", build_model(algorithm, n_jobs=n_jobs, params=model_params)),
+        ]
+    )
+
+
+def split_cpu_budget(n_tasks: int, n_jobs: int | None = None) -> Tuple[int, int]:
+    """Split `n_jobs` cores into (parallel candidates, threads per estimator).
+
+    `n_jobs` follows the joblib convention (-1 = all cores, `None` =
+    `TRAIN_N_JOBS`). Candidates run in parallel first, since most of them
+    (gradient boosting, the samplers) are single-threaded; leftover cores
+    go to the estimators' own threads, so the product never exceeds the budget.
+    """
+    n_jobs = TRAIN_N_JOBS if n_jobs is None else n_jobs
+    budget = cpu_count() if n_jobs < 0 else max(1, n_jobs)
+    outer = max(1, min(n_tasks, budget))
+    return outer, max(1, budget // outer)
+
+
+def _fit_shared_stages(X_train, y_train, X_test, balance_methods: List[str], k_best: int = 20):
+    """Fit `features` + `preprocess` once and resample once per balancing method.
+
+    These stages do not depend on the algorithm, so every candidate reuses
+    them; the samplers also share one `NeighborIndex`. Returns the fitted steps, the preprocessed test matrix and, per
+    method, `(fitted sampler, X_resampled, y_resampled)` or the exception raised.
+    """
+    with profile_stage("preprocess"):
+        features = WineFeatureTransformer()
+        preprocess = build_preprocessor(use_feature_selection=True, k_best=k_best)
+        X_prep = preprocess.fit_transform(features.fit_transform(X_train, y_train), y_train)
+        X_test_prep = preprocess.transform(features.transform(X_test))
+
+    resampled = {}
+    neighbor_index = NeighborIndex(X_prep, y_train)  # vizinhos calculados uma vez para todos os balanceamentos
+    for balance in balance_methods:
+        balancer = build_balancer(balance)
+        with profile_stage(f"balance_{balance}"):
+            try:
+                X_res, y_res = balancer.fit_resample(X_prep, y_train, neighbor_index=neighbor_index)
+                resampled[balance] = (balancer, X_res, y_res)
+            except Exception as e:
+                resampled[balance] = e
+    return features, preprocess, X_test_prep, resampled
+
+
+def _fit_candidate_model(
+    algo: str,
+    X_res,
+    y_res,
+    X_test_prep,
+    y_test,
+    n_jobs: int,
+    n_estimators: int | None = None,
+    cache_path: str | None = None,
+) -> Dict[str, Any]:
+    """Fit and score one algorithm on already preprocessed/resampled data (runs inside a worker).
+
+    `n_estimators` overrides the number of trees/boosting rounds (reduced
+    budgets of the successive-halving search); `None` keeps the full value.
+    With `cache_path` the finished fit is saved right away (resumable search).
+    The result carries the cost of the fit and of the predict (`profile`).
+    """
+    from sklearn.metrics import accuracy_score, f1_score
+
+    try:
+        model = build_model(algo, n_jobs=n_jobs)
+        if n_estimators is not None:
+            model.set_params(n_estimators=n_estimators)
+        start = snapshot()
+        model.fit(X_res, y_res)
+        fit_cost = measure_since(start)
+        start = snapshot()
+        preds = model.predict(X_test_prep)
+        predict_cost = measure_since(start)
+        result = {
+            "model": model,
+            "accuracy": float(accuracy_score(y_test, preds)),
+            "f1_weighted": float(f1_score(y_test, preds, average="weighted")),
+            "profile": {"fit": fit_cost, "predict": predict_cost},
+        }
+    except Exception as e:
+        return {"error": str(e)}
+    save_candidate(cache_path, result)
+    return result
+
+
+def _job_key(data_key: str, algo: str, balance: str, n_estimators: int | None, k_best: int = 20) -> str:
+    """Cache key of one candidate fit: data, feature code and every stage's configuration."""
+    model = build_model(algo)
+    if n_estimators is not None:
+        model.set_params(n_estimators=n_estimators)
+    return candidate_key(
+        data_key,
+        f"{algo}_{balance}_{model.get_params()['n_estimators']}",
+        features=WineFeatureTransformer(),
+        preprocess=build_preprocessor(use_feature_selection=True, k_best=k_best),
+        balance=build_balancer(balance),
+        model=model,
+    )
+
+
+def _fit_models(
+    jobs: List[Tuple[str, str, int | None]],
+    resampled,
+    X_test_prep,
+    y_test,
+    n_jobs,
+    cache: CandidateCache | None = None,
+    data_key: str = "",
+) -> List[Dict[str, Any]]:
+    """Run `_fit_candidate_model` for each `(algo, balance, n_estimators)` within the CPU budget.
+
+    Candidates already in `cache` are loaded instead of fitted.
+    """
+    cache = cache if cache is not None else CandidateCache(None)
+    outputs: List[Dict[str, Any] | None] = [None] * len(jobs)
+    paths: List[str | None] = [None] * len(jobs)
+    if cache.enabled:
+        for i, (algo, balance, n_estimators) in enumerate(jobs):
+            key = _job_key(data_key, algo, balance, n_estimators)
+            outputs[i] = cache.load(key)
+            paths[i] = str(cache.path(key))
+    pending = [i for i, output in enumerate(outputs) if output is None]
+    for i, output in enumerate(outputs):
+        if output is not None:
+            algo, balance, n_estimators = jobs[i]
+            record_stage(f"{algo}_{balance}", algorithm=algo, balance=balance, n_estimators=n_estimators, cached=True)
+    if len(pending) < len(jobs):
+        print(f"♻️ {len(jobs) - len(pending)} modelo(s) reaproveitado(s) do cache de candidatos")
+    if not pending:
+        return outputs
+
+    outer, inner = split_cpu_budget(len(pending), n_jobs)
+    print(f"⚙️ {len(pending)} modelo(s): {outer} em paralelo x {inner} thread(s) por estimador")
+    tasks = (
+        delayed(_fit_candidate_model)(
+            jobs[i][0], *resampled[jobs[i][1]][1:], X_test_prep, y_test, inner, jobs[i][2], paths[i]
+        )
+        for i in pending
+    )
+    if outer == 1:
+        fitted = [fn(*args, **kwargs) for fn, args, kwargs in tasks]
+    else:
+        with parallel_config(backend="loky", inner_max_num_threads=inner):
+            fitted = Parallel(n_jobs=outer)(tasks)
+    for i, output in zip(pending, fitted):
+        outputs[i] = output
+        algo, balance, n_estimators = jobs[i]
+        # medidos dentro do worker que ajustou o candidato
+        for step, cost in output.get("profile", {}).items():
+            record_stage(f"{algo}_{balance}/{step}", algorithm=algo, balance=balance, n_estimators=n_estimators, **cost)
+    return outputs
+
+
+def _assemble_pipeline(features, preprocess, balancer, model) -> Pipeline:
+    """Fitted pipeline from the shared fitted steps and one candidate's model."""
+    pipeline = Pipeline(
+        steps=[
+            ("features", features),
+            ("preprocess", preprocess),
             ("balance", balancer),
             ("model", model),
         ]
     )
+    return prune_unselected_features(pipeline)
+
+
+def _default_search_space(algorithms: List[str] | None, balance_methods: List[str] | None):
+    if algorithms is None:
+        algorithms = ["random_forest", "gradient_boosting"]
+        if XGBOOST_AVAILABLE:
+            algorithms.append("xgboost")
+        if LIGHTGBM_AVAILABLE:
+            algorithms.append("lightgbm")
+    if balance_methods is None:
+        balance_methods = ["smoteenn", "adasyn", "smote"]
+    return algorithms, balance_methods
 
 
 def test_multiple_algorithms(
     X_train, y_train, X_test, y_test,
     algorithms: List[str] = None,
     balance_methods: List[str] = None,
+    n_jobs: int | None = None,
+    cache_dir: Path | None = None,
 ) -> Dict[str, Dict[str, Any]]:
     """
     Testa múltiplos algoritmos e retorna resultados.
+
+    `features`, `preprocess` e cada balanceamento são ajustados uma única
+    vez (`_fit_shared_stages`) e reaproveitados por todos os algoritmos; só
+    o modelo é ajustado por combinação. O `pipeline` de cada resultado já
+    vem ajustado (as etapas comuns são os mesmos objetos em todos) e é
+    idêntico ao de `build_training_pipeline(...).fit(X_train, y_train)`.
+
+    Os modelos rodam em paralelo em processos (joblib/loky) dentro do
+    orçamento `n_jobs` de CPUs (`split_cpu_budget`); as threads de cada
+    estimador e do BLAS/OpenMP nos workers são limitadas à sua parte do
+    orçamento. Cada combinação usa `RANDOM_STATE` e não depende das outras,
+    então os resultados (e a ordem do dicionário) são os mesmos da execução
+    sequencial (`n_jobs=1`).
+
+    Com `cache_dir`, cada modelo ajustado é salvo com seus scores
+    (`CandidateCache`, chave = dados + versão do código de features +
+    configuração); candidatos já salvos não são treinados de novo.
     
     Returns:
         Dict com resultados de cada combinação algoritmo+balanceamento
     """
-    from sklearn.metrics import accuracy_score, f1_score
-    
-    if algorithms is None:
-        algorithms = ["random_forest", "gradient_boosting"]
-        if XGBOOST_AVAILABLE:
-            algorithms.append("xgboost")
-        if LIGHTGBM_AVAILABLE:
-            algorithms.append("lightgbm")
-    
-    if balance_methods is None:
-        balance_methods = ["smoteenn", "adasyn", "smote"]
-    
+    algorithms, balance_methods = _default_search_space(algorithms, balance_methods)
+    with profile_stage("shared_stages"):
+        features, preprocess, X_test_prep, resampled = _fit_shared_stages(
+            X_train, y_train, X_test, balance_methods
+        )
+    combos = [(algo, balance) for algo in algorithms for balance in balance_methods]
+    runnable = [(algo, balance) for algo, balance in combos if isinstance(resampled[balance], tuple)]
+    print(f"🔧 {len(combos)} combinações ({len(balance_methods)} balanceamentos calculados uma vez)")
+    outputs = _fit_models(
+        [(algo, balance, None) for algo, balance in runnable],
+        resampled,
+        X_test_prep,
+        y_test,
+        n_jobs,
+        cache=CandidateCache(cache_dir),
+        data_key=data_fingerprint(X_train, y_train, X_test, y_test) if cache_dir is not None else "",
+    )
+    fitted = dict(zip(runnable, outputs))
+
     results = {}
-    
-    for algo in algorithms:
-        for balance in balance_methods:
-            key = f"{algo}_{balance}"
-            print(f"🧪 Testando: {key}...")
-            
-            try:
-                pipeline = build_training_pipeline(
-                    algorithm=algo,
-                    use_feature_selection=True,
-                    k_best=20,
-                    balance_method=balance,
-                )
-                pipeline.fit(X_train, y_train)
-                preds = pipeline.predict(X_test)
-                
-                results[key] = {
-                    "algorithm": algo,
-                    "balance": balance,
-                    "accuracy": float(accuracy_score(y_test, preds)),
-                    "f1_weighted": float(f1_score(y_test, preds, average="weighted")),
-                    "pipeline": pipeline,
-                }
-                print(f"   ✅ F1: {results[key]['f1_weighted']:.4f} | Acc: {results[key]['accuracy']:.4f}")
-            except Exception as e:
-                print(f"   ❌ Erro: {e}")
-                results[key] = {"error": str(e)}
+    for algo, balance in combos:
+        key = f"{algo}_{balance}"
+        if not isinstance(resampled[balance], tuple):
+            result = {"error": str(resampled[balance])}
+        elif "error" in fitted[(algo, balance)]:
+            result = fitted[(algo, balance)]
+        else:
+            output = fitted[(algo, balance)]
+            result = {
+                "algorithm": algo,
+                "balance": balance,
+                "accuracy": output["accuracy"],
+                "f1_weighted": output["f1_weighted"],
+                "pipeline": _assemble_pipeline(features, preprocess, resampled[balance][0], output["model"]),
+            }
+        results[key] = result
+        if "error" in result:
+            print(f"🧪 {key}: ❌ Erro: {result['error']}")
+        else:
+            print(f"🧪 {key}: ✅ F1: {result['f1_weighted']:.4f} | Acc: {result['accuracy']:.4f}")
     
     return results
 
 
-def build_best_pipeline(X_train, y_train, X_test, y_test) -> Pipeline:
+def successive_halving(
+    X_train, y_train, X_test, y_test,
+    algorithms: List[str] = None,
+    balance_methods: List[str] = None,
+    eta: int | None = None,
+    max_seconds: float | None = None,
+    n_jobs: int | None = None,
+    cache_dir: Path | None = None,
+) -> Tuple[Pipeline | None, Dict[str, Any]]:
     """
-    Testa múltiplos algoritmos e retorna o melhor pipeline retreinado no conjunto completo.
+    Seleção por successive halving sobre as combinações algoritmo+balanceamento.
+
+    O recurso é o número de árvores/rodadas (`n_estimators`). Com `n`
+    candidatos válidos há `s = ceil(log_eta(n))` rodadas reduzidas: a rodada
+    `i` treina os sobreviventes com `n_estimators * eta**(i - s)` e promove
+    o melhor `1/eta` (F1 no teste, como na busca exaustiva); a última rodada
+    usa o orçamento completo e o seu vencedor é devolvido já ajustado.
+
+    `max_seconds` (padrão `TRAIN_SEARCH_MAX_SECONDS`, 0 = sem limite): antes
+    de cada rodada o custo é estimado pela anterior (segundos por árvore);
+    se estourar o limite, a busca para e devolve o melhor da última rodada
+    concluída (com o `n_estimators` reduzido dela, `completed=False`).
+
+    Retorna `(pipeline vencedor ou None, relatório)`; o relatório vai para
+    `reports/metrics.json`. `cache_dir` funciona como em
+    `test_multiple_algorithms` (cada rodada tem a sua chave).
     """
-    results = test_multiple_algorithms(X_train, y_train, X_test, y_test)
-    
-    # Encontra o melhor resultado
-    best_key = None
-    best_f1 = 0.0
-    best_config = None
-    
-    for key, result in results.items():
-        if "f1_weighted" in result and result["f1_weighted"] > best_f1:
-            best_f1 = result["f1_weighted"]
-            best_key = key
-            best_config = {
-                "algorithm": result["algorithm"],
-                "balance": result["balance"],
+    eta = TRAIN_SEARCH_ETA if eta is None else eta
+    max_seconds = TRAIN_SEARCH_MAX_SECONDS if max_seconds is None else max_seconds
+    if eta < 2:
+        raise ValueError("eta deve ser >= 2")
+    start = time.perf_counter()
+    algorithms, balance_methods = _default_search_space(algorithms, balance_methods)
+    with profile_stage("shared_stages"):
+        features, preprocess, X_test_prep, resampled = _fit_shared_stages(
+            X_train, y_train, X_test, balance_methods
+        )
+    errors = {
+        f"{algo}_{balance}": str(resampled[balance])
+        for algo in algorithms
+        for balance in balance_methods
+        if not isinstance(resampled[balance], tuple)
+    }
+    candidates = [
+        (algo, balance)
+        for algo in algorithms
+        for balance in balance_methods
+        if isinstance(resampled[balance], tuple)
+    ]
+    cache = CandidateCache(cache_dir)
+    data_key = data_fingerprint(X_train, y_train, X_test, y_test) if cache.enabled else ""
+    full_estimators = {algo: build_model(algo).get_params()["n_estimators"] for algo in algorithms}
+    n_rungs = math.ceil(math.log(len(candidates), eta)) + 1 if len(candidates) > 1 else 1
+    report: Dict[str, Any] = {
+        "strategy": "successive_halving",
+        "eta": eta,
+        "max_seconds": max_seconds,
+        "candidates": len(candidates) + len(errors),
+        "estimators_full_search": 0,
+        "estimators_trained": 0,
+        "completed": True,
+        "rungs": [],
+    }
+    print(f"🔧 Successive halving: {len(candidates)} candidatos, {n_rungs} rodada(s), eta={eta}")
+
+    best = None  # (key, output, n_estimators) da última rodada concluída
+    for rung in range(n_rungs):
+        fraction = float(eta) ** (rung - n_rungs + 1)
+        jobs = [
+            (algo, balance, max(1, math.ceil(full_estimators[algo] * fraction)))
+            for algo, balance in candidates
+        ]
+        units = sum(n for _, _, n in jobs)
+        elapsed = time.perf_counter() - start
+        if rung and max_seconds > 0:
+            previous = report["rungs"][-1]
+            projected = previous["seconds"] / max(previous["estimators"], 1) * units
+            if elapsed + projected > max_seconds:
+                print(f"⏱️ Orçamento de {max_seconds:.0f}s atingido: rodada {rung + 1} estimada em {projected:.1f}s")
+                report["completed"] = False
+                break
+
+        rung_start = time.perf_counter()
+        print(f"🧪 Rodada {rung + 1}/{n_rungs}: {len(jobs)} candidato(s) com {fraction:.3g} do orçamento")
+        with profile_stage(f"rung_{rung + 1}", budget_fraction=round(fraction, 4)):
+            outputs = _fit_models(jobs, resampled, X_test_prep, y_test, n_jobs, cache=cache, data_key=data_key)
+
+        scored = []
+        for (algo, balance, n_estimators), output in zip(jobs, outputs):
+            key = f"{algo}_{balance}"
+            if "error" in output:
+                errors[key] = output["error"]
+                print(f"   {key}: ❌ Erro: {output['error']}")
+                continue
+            scored.append(((algo, balance), output, n_estimators))
+            report["estimators_trained"] += n_estimators
+            if rung == 0:
+                # custo da busca exaustiva equivalente (candidatos que treinam sem erro)
+                report["estimators_full_search"] += full_estimators[algo]
+            print(f"   {key} ({n_estimators} est.): F1 {output['f1_weighted']:.4f}")
+        # ordenação estável: empate fica com a ordem original dos candidatos
+        scored.sort(key=lambda item: -item[1]["f1_weighted"])
+        keep = max(1, math.ceil(len(scored) / eta)) if rung < n_rungs - 1 else 1
+        candidates = [combo for combo, _, _ in scored[:keep]]
+        report["rungs"].append(
+            {
+                "budget_fraction": round(fraction, 4),
+                "estimators": sum(n for _, _, n in scored),
+                "seconds": round(time.perf_counter() - rung_start, 3),
+                "f1_weighted": {f"{a}_{b}": round(o["f1_weighted"], 4) for (a, b), o, _ in scored},
+                "promoted": [f"{a}_{b}" for a, b in candidates],
             }
-    
-    if best_key and best_config:
-        print(f"\n🏆 Melhor modelo: {best_key} com F1={best_f1:.4f}")
-        print(f"🔄 Retreinando o melhor modelo no conjunto completo de treino...")
-        
-        # Reconstrói e retreina o melhor pipeline no conjunto completo
-        best_pipeline = build_training_pipeline(
-            algorithm=best_config["algorithm"],
-            use_feature_selection=True,
-            k_best=20,
-            balance_method=best_config["balance"],
         )
-        best_pipeline.fit(X_train, y_train)
-        return best_pipeline
+        if scored:
+            best = scored[0]
+        if not candidates:
+            break
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["errors"] = errors
+    if best is None:
+        return None, report
+
+    (algo, balance), output, n_estimators = best
+    report.update(
+        winner=f"{algo}_{balance}",
+        algorithm=algo,
+        balance=balance,
+        n_estimators=n_estimators,
+        f1_weighted=round(output["f1_weighted"], 4),
+    )
+    print(
+        f"🏆 Vencedor: {report['winner']} ({n_estimators} est.) F1={output['f1_weighted']:.4f} em "
+        f"{report['seconds']:.1f}s; {report['estimators_trained']} de {report['estimators_full_search']} "
+        f"árvores/rodadas da busca completa"
+    )
+    return _assemble_pipeline(features, preprocess, resampled[balance][0], output["model"]), report
+
+
+def _restore_inference_threads(pipeline: Pipeline) -> Pipeline:
+    """Na busca o modelo usou só a sua parte do orçamento de CPUs; na inferência volta a usar todos."""
+    model = pipeline.named_steps["model"]
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=-1)
+    return pipeline
+
+
+def select_best_pipeline(
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    search: str | None = None,
+    cache_dir: Path | None = None,
+    study_path: Path | None = None,
+) -> Tuple[Pipeline, Dict[str, Any]]:
+    """
+    Seleciona o melhor pipeline (já ajustado no treino) e descreve a busca.
+
+    `search` (padrão `TRAIN_SEARCH`): `"exhaustive"` treina todas as
+    combinações com o orçamento completo (`test_multiple_algorithms`);
+    `"halving"` usa `successive_halving`. O vencedor não é retreinado. `cache_dir`
+    guarda/reaproveita os candidatos ajustados (busca retomável).
+    `"tune"` busca também os hiperparâmetros (`tuning.tune_hyperparameters`,
+    estudo salvo em `study_path`) e reajusta o melhor trial no treino.
+    """
+    search = TRAIN_SEARCH if search is None else search
+    if search == "tune":
+        # Import tardio: tuning depende deste módulo
+        from analise_qualidade_vinhos.pipeline.tuning import tune_hyperparameters
+
+        best_pipeline, report = tune_hyperparameters(X_train, y_train, X_test, y_test, study_path=study_path)
+    elif search == "halving":
+        best_pipeline, report = successive_halving(X_train, y_train, X_test, y_test, cache_dir=cache_dir)
+    elif search == "exhaustive":
+        start = time.perf_counter()
+        results = test_multiple_algorithms(X_train, y_train, X_test, y_test, cache_dir=cache_dir)
+        scored = [(key, r) for key, r in results.items() if "f1_weighted" in r]
+        # Encontra o melhor resultado (o primeiro em caso de empate)
+        best_key, best = max(scored, key=lambda item: item[1]["f1_weighted"], default=(None, None))
+        n_estimators = sum(
+            r["pipeline"].named_steps["model"].get_params()["n_estimators"] for _, r in scored
+        )
+        report = {
+            "strategy": "exhaustive",
+            "candidates": len(results),
+            "estimators_full_search": n_estimators,
+            "estimators_trained": n_estimators,
+            "completed": True,
+            "seconds": round(time.perf_counter() - start, 3),
+            "errors": {key: r["error"] for key, r in results.items() if "error" in r},
+        }
+        best_pipeline = None
+        if best is not None:
+            best_pipeline = best["pipeline"]
+            report.update(
+                winner=best_key,
+                algorithm=best["algorithm"],
+                balance=best["balance"],
+                n_estimators=best_pipeline.named_steps["model"].get_params()["n_estimators"],
+                f1_weighted=round(best["f1_weighted"], 4),
+            )
+            print(f"\n🏆 Melhor modelo: {best_key} com F1={best['f1_weighted']:.4f} (reaproveitado, sem retreino)")
     else:
+        raise ValueError("search deve ser 'halving', 'exhaustive' ou 'tune'")
+
+    if best_pipeline is None:
         # Fallback
         print("⚠️ Usando pipeline padrão (RandomForest + SMOTEENN)")
-        pipeline = build_training_pipeline(algorithm="random_forest", balance_method="smoteenn")
-        pipeline.fit(X_train, y_train)
-        return pipeline
+        best_pipeline = build_training_pipeline(algorithm="random_forest", balance_method="smoteenn")
+        with profile_stage("refit"):
+            best_pipeline.fit(X_train, y_train)
+        report["winner"] = "fallback_random_forest_smoteenn"
+        return prune_unselected_features(best_pipeline), report
+    return _restore_inference_threads(best_pipeline), report
+
+
+def build_best_pipeline(X_train, y_train, X_test, y_test) -> Pipeline:
+    """
+    Testa múltiplos algoritmos e retorna o melhor pipeline, já ajustado no treino.
+
+    Atalho para `select_best_pipeline` quando o relatório da busca não interessa.
+    """
+    return select_best_pipeline(X_train, y_train, X_test, y_test)[0]
 
 
 def get_class_labels() -> list[str]:
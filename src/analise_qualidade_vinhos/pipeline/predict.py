@@ -2,14 +2,16 @@
 
 from __future__ import annotations
 
+import time
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
 from joblib import load
 
 from analise_qualidade_vinhos.config.settings import MODEL_DIR
-from analise_qualidade_vinhos.features.engineering import build_feature_matrix
+from analise_qualidade_vinhos.features.engineering import build_feature_matrix, rename_columns
 
 
 def load_model(model_path: Path | None = None):
@@ -17,20 +19,120 @@ def load_model(model_path: Path | None = None):
         model_path = MODEL_DIR / "wine_quality_model.joblib"
     if not model_path.exists():
         raise FileNotFoundError(f"Modelo não encontrado em {model_path}. Treine antes de prever.")
+    if model_path.suffix == ".npz":
+        # Modelo compilado: avaliado só com NumPy, sem importar sklearn/xgboost/lightgbm
+        from analise_qualidade_vinhos.pipeline.compiled import CompiledModel
+
+        return CompiledModel.load(model_path)
     return load(model_path)
 
 
-def prepare_input(df: pd.DataFrame) -> pd.DataFrame:
-    """Apply the same feature engineering used at training time."""
-    featured = build_feature_matrix(df, add_quality_label=False)
+def artifact_version(model_path: Path | None = None) -> str:
+    """Cheap fingerprint (mtime + size) of the model artifact on disk."""
+    if model_path is None:
+        model_path = MODEL_DIR / "wine_quality_model.joblib"
+    stat = model_path.stat()
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def prepare_input(df: pd.DataFrame, engine: str = "numpy", drop_duplicates: bool = True) -> pd.DataFrame:
+    """Apply the same feature engineering used at training time.
+
+    `engine="numpy"` uses the vectorized feature kernel; `"pandas"` keeps the
+    column-by-column reference implementation. Pass `drop_duplicates=False`
+    to keep exactly one output row per input row.
+    """
+    featured = build_feature_matrix(
+        df, add_quality_label=False, engine=engine, drop_duplicates=drop_duplicates
+    )
     for col in ["quality_label", "quality"]:
         if col in featured.columns:
             featured = featured.drop(columns=[col])
     return featured
 
 
+def uses_fitted_features(model) -> bool:
+    """True when the model computes the derived features itself (fitted `features` step).
+
+    Such models take the raw measurements and fill/clip with training-time
+    statistics; older artifacts still need `prepare_input` beforehand.
+    """
+    steps = getattr(model, "named_steps", None)
+    if steps is not None:
+        return "features" in steps
+    return bool(getattr(model, "fitted_features", False))
+
+
+def prepare_for_model(model, df: pd.DataFrame, drop_duplicates: bool = True) -> pd.DataFrame:
+    """Input expected by `model.predict`: raw snake_case columns or the full feature matrix."""
+    if uses_fitted_features(model):
+        prepared = rename_columns(df)
+        return prepared.drop_duplicates() if drop_duplicates else prepared
+    return prepare_input(df, drop_duplicates=drop_duplicates)
+
+
+def deduplicate_rows(df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray | None]:
+    """Unique rows of `df` (first occurrence order) and the map back to every row.
+
+    Rows are grouped by a vectorized 64-bit hash of their values
+    (`pd.util.hash_pandas_object`), so no per-row Python objects are built,
+    and the grouping is then checked against the values themselves: on a
+    hash collision nothing is collapsed. `unique.iloc[inverse]` reproduces
+    `df` row for row; `inverse` is `None` when there is nothing to collapse.
+    """
+    if len(df) < 2:
+        return df, None
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    _, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    if len(first) == len(df):
+        return df, None
+    values = df.to_numpy()
+    grouped = values[first][inverse]
+    same = grouped == values
+    if not same.all():
+        same |= pd.isna(grouped) & pd.isna(values)  # NaN == NaN para fins de deduplicação
+        if not same.all():  # colisão de hash: linhas distintas no mesmo grupo
+            return df, None
+    # `np.unique` ordena pelos hashes; reordena pela primeira ocorrência
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return df.iloc[first[order]], rank[inverse]
+
+
 def predict_from_dataframe(model, df: pd.DataFrame) -> List[str]:
-    prepared = prepare_input(df)
-    predictions = model.predict(prepared)
-    return predictions.tolist()
+    """One prediction per input row, in order; repeated rows are scored once."""
+    return predict_rows(model, df)
+
+
+def predict_rows(model, df: pd.DataFrame) -> List[str]:
+    """Score every input row: one prediction per row, in order.
+
+    Identical rows are collapsed before scoring (`deduplicate_rows`) and the
+    result is broadcast back, which is exact because every row is scored
+    independently of the rest of the batch.
+    """
+    return predict_rows_timed(model, df)[0]
+
+
+def predict_rows_timed(model, df: pd.DataFrame) -> Tuple[List[str], Dict[str, float], int]:
+    """`predict_rows` plus stage timings and the number of unique rows scored.
 
+    Timings are the seconds spent in `dedup`, `prepare_input` and
+    `model.predict`. For models with a fitted `features` step the feature
+    engineering runs inside `model.predict`, so it is counted there.
+    """
+    start = time.perf_counter()
+    unique, inverse = deduplicate_rows(df)
+    deduped_at = time.perf_counter()
+    prepared = prepare_for_model(model, unique, drop_duplicates=False)
+    prepared_at = time.perf_counter()
+    preds = model.predict(prepared)
+    if inverse is not None:
+        preds = np.asarray(preds)[inverse]
+    timings = {
+        "dedup": deduped_at - start,
+        "prepare_input": prepared_at - deduped_at,
+        "predict": time.perf_counter() - prepared_at,
+    }
+    return preds.tolist(), timings, len(unique)
@@ -10,10 +10,12 @@ Keeps the flow intentionally simple:
 from __future__ import annotations
 
 import json
+import os
+import time
 from pathlib import Path
 from typing import Dict, Tuple
 
-from joblib import dump
+from joblib import dump, load
 from sklearn.metrics import accuracy_score, classification_report, f1_score
 
 from analise_qualidade_vinhos.config.settings import (
@@ -21,24 +23,64 @@ from analise_qualidade_vinhos.config.settings import (
     RAW_DATA_PATH,
     REPORTS_DIR,
     TARGET_COLUMN,
+    TRAIN_CANDIDATE_CACHE,
+    TRAIN_CPROFILE,
+    TRAIN_DISTILL,
+    TRAIN_DISTILL_AUGMENT,
+    TRAIN_DISTILL_TOLERANCE,
 )
 from analise_qualidade_vinhos.data.dataset import load_featured_data, train_test_split_featured
-from analise_qualidade_vinhos.pipeline.model_builder import (
-    build_best_pipeline,
-    build_training_pipeline,
-)
+from analise_qualidade_vinhos.pipeline.compiled import export_compiled
+from analise_qualidade_vinhos.pipeline.distill import distill_pipeline, serving_profile
+from analise_qualidade_vinhos.pipeline.incremental import update_pipeline
+from analise_qualidade_vinhos.pipeline.model_builder import select_best_pipeline
+from analise_qualidade_vinhos.utils.profiling import TrainingProfiler, profile_stage, profiling
 
 
 def train_model(
     data_path: Path = RAW_DATA_PATH,
     model_path: Path | None = None,
     metrics_path: Path | None = None,
+    compile_model: bool = True,
+    search: str | None = None,
+    candidate_cache: bool | None = None,
+    distill: bool | None = None,
+    cprofile: bool | None = None,
 ) -> Tuple[Dict, Path]:
+    """Treina, avalia e salva o melhor modelo.
+
+    O custo de cada etapa (tempo de parede, CPU e pico de RSS) vai para
+    `training_profile.json`, na pasta de `metrics_path`. Com `cprofile`
+    (padrão `TRAIN_CPROFILE`), o dump do cProfile vai para
+    `training_profile.prof`.
+    """
+    profiler = TrainingProfiler(cprofile=TRAIN_CPROFILE if cprofile is None else cprofile)
+    with profiling(profiler):
+        metrics, model_path, metrics_path = _train_model(
+            data_path, model_path, metrics_path, compile_model, search, candidate_cache, distill
+        )
+    profile_path = profiler.write(metrics_path.with_name("training_profile.json"))
+    slowest = ", ".join(f"{s['name']} {s['wall_s']:.1f}s" for s in profiler.summary()["slowest"][:3])
+    print(f"⏱️ Perfil do treino salvo em: {profile_path} (mais lentas: {slowest})")
+    return metrics, model_path
+
+
+def _train_model(
+    data_path: Path,
+    model_path: Path | None,
+    metrics_path: Path | None,
+    compile_model: bool,
+    search: str | None,
+    candidate_cache: bool | None,
+    distill: bool | None,
+) -> Tuple[Dict, Path, Path]:
     print("🔄 Carregando dados...")
-    df = load_featured_data(data_path)
+    with profile_stage("load_data"):
+        df = load_featured_data(data_path)
     print(f"✅ Dados carregados: {len(df)} amostras, {len(df.columns)} features")
     
-    X_train, X_test, y_train, y_test = train_test_split_featured(df)
+    with profile_stage("split"):
+        X_train, X_test, y_train, y_test = train_test_split_featured(df)
     print(f"📊 Treino: {len(X_train)} | Teste: {len(X_test)}")
 
     print("🔧 Testando múltiplos algoritmos para encontrar o melhor...")
@@ -47,9 +89,116 @@ def train_model(
     print("   Seleção de features: Top 20 features\n")
     
     # Testa múltiplos algoritmos e seleciona o melhor (já treinado)
-    pipeline = build_best_pipeline(X_train, y_train, X_test, y_test)
+    if candidate_cache is None:
+        candidate_cache = TRAIN_CANDIDATE_CACHE
+    model_dir = model_path.parent if model_path is not None else MODEL_DIR
+    with profile_stage("search"):
+        pipeline, selection = select_best_pipeline(
+            X_train,
+            y_train,
+            X_test,
+            y_test,
+            search=search,
+            cache_dir=model_dir / "candidates" if candidate_cache else None,
+            study_path=model_dir / "tuning_study.jsonl",
+        )
     
     print("\n🔍 Avaliando no conjunto de teste com o melhor modelo...")
+    with profile_stage("evaluate"):
+        evaluation = _evaluate(pipeline, X_test, y_test)
+    metrics = {
+        **evaluation,
+        "n_train": len(X_train),
+        "n_test": len(X_test),
+        "target": TARGET_COLUMN,
+        "model_selection": selection,
+    }
+    student = None
+    if TRAIN_DISTILL if distill is None else distill:
+        with profile_stage("distill"):
+            student, metrics["distillation"] = _distill(pipeline, metrics, X_train, X_test, y_test)
+    with profile_stage("save"):
+        model_path, metrics_path = _save_artifacts(pipeline, metrics, model_path, metrics_path, compile_model, X_test)
+        with profile_stage("student"):
+            _save_student(student, model_path, compile_model, X_test)
+
+    print(f"\n✅ Treinamento concluído!")
+    print(f"📊 Accuracy: {metrics['accuracy']:.4f}")
+    print(f"📊 F1-weighted: {metrics['f1_weighted']:.4f}")
+    print(f"💾 Modelo salvo em: {model_path}")
+
+    return metrics, model_path, metrics_path
+
+
+def update_model(
+    new_data_path: Path,
+    model_path: Path | None = None,
+    metrics_path: Path | None = None,
+    data_path: Path = RAW_DATA_PATH,
+    n_new_estimators: int | None = None,
+    compile_model: bool = True,
+) -> Tuple[Dict, Path]:
+    """Retreino incremental: aquece o artefato atual com as amostras novas.
+
+    Carrega o modelo salvo, atualiza as estatísticas de pré-processamento e
+    adiciona árvores/rodadas treinadas só em `new_data_path`
+    (`pipeline.incremental.update_pipeline`). A avaliação usa o mesmo
+    conjunto de teste do treino completo (`data_path`), e
+    `metrics["incremental"]` compara com as métricas do último retreino
+    completo (`baseline`), que se mantém entre atualizações sucessivas.
+    O aluno destilado (e `distillation`/`model_selection` nas métricas)
+    descrevia o modelo anterior e é removido; refaça o treino completo
+    para destilar de novo.
+    """
+    if model_path is None:
+        model_path = MODEL_DIR / "wine_quality_model.joblib"
+    if metrics_path is None:
+        metrics_path = REPORTS_DIR / "metrics.json"
+
+    previous = json.loads(metrics_path.read_text(encoding="utf-8")) if metrics_path.exists() else {}
+    baseline = previous.get("incremental", {}).get("baseline")
+    if baseline is None and "accuracy" in previous:
+        baseline = {"accuracy": previous["accuracy"], "f1_weighted": previous["f1_weighted"]}
+
+    print("🔄 Carregando modelo atual e amostras novas...")
+    pipeline = load(model_path)
+    new_df = load_featured_data(new_data_path, cache=False)  # lote lido uma vez só
+    X_new, y_new = new_df.drop(columns=[TARGET_COLUMN]), new_df[TARGET_COLUMN]
+    _, X_test, _, y_test = train_test_split_featured(load_featured_data(data_path))
+
+    start = time.perf_counter()
+    pipeline, info = update_pipeline(pipeline, X_new, y_new, n_new_estimators=n_new_estimators)
+    seconds = time.perf_counter() - start
+    print(f"🌱 +{info['estimators_added']} estimadores com {info['n_new']} amostras novas em {seconds:.1f}s")
+
+    # seleção e destilação descrevem o artefato do último treino completo, não o atualizado
+    kept = {k: v for k, v in previous.items() if k not in ("distillation", "model_selection")}
+    metrics = {**kept, **_evaluate(pipeline, X_test, y_test), "n_test": len(X_test), "target": TARGET_COLUMN}
+    metrics["n_train"] = previous.get("n_train", info["n_seen_before"]) + info["n_new"]
+    incremental = {
+        **info,
+        "updates": previous.get("incremental", {}).get("updates", 0) + 1,
+        "seconds": round(seconds, 3),
+        "baseline": baseline,
+    }
+    if baseline is not None:
+        incremental["accuracy_drift"] = round(metrics["accuracy"] - baseline["accuracy"], 4)
+        incremental["f1_weighted_drift"] = round(metrics["f1_weighted"] - baseline["f1_weighted"], 4)
+    metrics["incremental"] = incremental
+    model_path, metrics_path = _save_artifacts(pipeline, metrics, model_path, metrics_path, compile_model, X_test)
+    _save_student(None, model_path, compile_model, X_test)
+
+    print(f"\n✅ Retreino incremental concluído!")
+    print(f"📊 Accuracy: {metrics['accuracy']:.4f} | F1-weighted: {metrics['f1_weighted']:.4f}")
+    if baseline is not None:
+        print(
+            f"📉 Drift vs. retreino completo: accuracy {incremental['accuracy_drift']:+.4f}"
+            f" | F1 {incremental['f1_weighted_drift']:+.4f}"
+        )
+    return metrics, model_path
+
+
+def _evaluate(pipeline, X_test, y_test) -> Dict:
     preds = pipeline.predict(X_test)
     report = classification_report(y_test, preds, output_dict=True)
 
@@ -61,15 +210,82 @@ def train_model(
         except Exception:
             return obj
 
-    metrics = {
+    return {
         "accuracy": round(float(accuracy_score(y_test, preds)), 4),
         "f1_weighted": round(float(f1_score(y_test, preds, average="weighted")), 4),
         "report": _to_float(report),
-        "n_train": len(X_train),
-        "n_test": len(X_test),
-        "target": TARGET_COLUMN,
     }
 
+
+def _distill(teacher, teacher_metrics: Dict, X_train, X_test, y_test) -> Tuple[object | None, Dict]:
+    """Treina o aluno e devolve `(aluno ou None, métricas)`; o aluno só é emitido dentro da tolerância."""
+    print("\n🎓 Destilando o melhor modelo em um aluno compacto...")
+    start = time.perf_counter()
+    student = distill_pipeline(teacher, X_train, n_per_row=TRAIN_DISTILL_AUGMENT)
+    seconds = time.perf_counter() - start
+    student_metrics = _evaluate(student, X_test, y_test)
+
+    accuracy_drop = round(teacher_metrics["accuracy"] - student_metrics["accuracy"], 4)
+    f1_drop = round(teacher_metrics["f1_weighted"] - student_metrics["f1_weighted"], 4)
+    emitted = max(accuracy_drop, f1_drop) <= TRAIN_DISTILL_TOLERANCE
+    teacher_profile = serving_profile(teacher, X_test)
+    student_profile = serving_profile(student, X_test)
+    info = {
+        "emitted": emitted,
+        "tolerance": TRAIN_DISTILL_TOLERANCE,
+        "augment_per_row": TRAIN_DISTILL_AUGMENT,
+        "seconds": round(seconds, 3),
+        "accuracy_drop": accuracy_drop,
+        "f1_weighted_drop": f1_drop,
+        "agreement": round(float((student.predict(X_test) == teacher.predict(X_test)).mean()), 4),
+        "teacher": {
+            "accuracy": teacher_metrics["accuracy"],
+            "f1_weighted": teacher_metrics["f1_weighted"],
+            **teacher_profile,
+        },
+        "student": {
+            "accuracy": student_metrics["accuracy"],
+            "f1_weighted": student_metrics["f1_weighted"],
+            **student_profile,
+        },
+    }
+    print(
+        f"🎓 Aluno {student_profile['model']}: F1 {student_metrics['f1_weighted']:.4f} ({-f1_drop:+.4f}),"
+        f" {student_profile['size_bytes'] / 1e6:.1f} MB vs {teacher_profile['size_bytes'] / 1e6:.1f} MB,"
+        f" {student_profile['predict_one_row_ms']:.2f} ms vs {teacher_profile['predict_one_row_ms']:.2f} ms por linha"
+    )
+    if not emitted:
+        print(f"⚠️ Aluno não emitido: queda acima da tolerância ({TRAIN_DISTILL_TOLERANCE})")
+    return (student if emitted else None), info
+
+
+def _student_path(model_path: Path) -> Path:
+    return model_path.with_name(f"{model_path.stem}.student.joblib")
+
+
+def _save_student(student, model_path: Path, compile_model: bool, X_check) -> None:
+    student_path = _student_path(model_path)
+    if student is None:
+        # aluno de um professor anterior não representa mais o modelo salvo
+        student_path.unlink(missing_ok=True)
+        student_path.with_suffix(".npz").unlink(missing_ok=True)
+        return
+    _dump_atomic(student, student_path)
+    if compile_model:
+        _export_compiled_model(student, student_path.with_suffix(".npz"), X_check)
+    print(f"💾 Modelo aluno salvo em: {student_path}")
+
+
+def _dump_atomic(obj, path: Path) -> None:
+    # Escrita atômica: a API (hot swap) nunca enxerga um artefato pela metade
+    tmp_path = path.with_name(path.name + ".tmp")
+    dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_artifacts(
+    pipeline, metrics: Dict, model_path: Path | None, metrics_path: Path | None, compile_model: bool, X_check
+) -> Tuple[Path, Path]:
     MODEL_DIR.mkdir(parents=True, exist_ok=True)
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -78,16 +294,28 @@ def train_model(
     if metrics_path is None:
         metrics_path = REPORTS_DIR / "metrics.json"
 
-    dump(pipeline, model_path)
+    with profile_stage("dump"):
+        _dump_atomic(pipeline, model_path)
+    if compile_model:
+        with profile_stage("compile"):
+            _export_compiled_model(pipeline, model_path.with_suffix(".npz"), X_check)
     with metrics_path.open("w", encoding="utf-8") as fp:
         json.dump(metrics, fp, indent=2, ensure_ascii=False)
+    return model_path, metrics_path
 
-    print(f"\n✅ Treinamento concluído!")
-    print(f"📊 Accuracy: {metrics['accuracy']:.4f}")
-    print(f"📊 F1-weighted: {metrics['f1_weighted']:.4f}")
-    print(f"💾 Modelo salvo em: {model_path}")
 
-    return metrics, model_path
+def _export_compiled_model(pipeline, compiled_path: Path, X_check) -> Path | None:
+    """Save the flat-array version of the pipeline, verified against `X_check`."""
+    tmp_path = compiled_path.with_name(compiled_path.name + ".tmp")
+    try:
+        export_compiled(pipeline, tmp_path, X_check=X_check)
+    except ValueError as exc:
+        tmp_path.unlink(missing_ok=True)
+        print(f"⚠️ Modelo compilado não exportado: {exc}")
+        return None
+    os.replace(tmp_path, compiled_path)
+    print(f"💾 Modelo compilado salvo em: {compiled_path}")
+    return compiled_path
 
 
 def cli():
@@ -97,9 +325,68 @@ def cli():
     parser.add_argument("--data-path", type=Path, default=RAW_DATA_PATH)
     parser.add_argument("--model-path", type=Path, default=MODEL_DIR / "wine_quality_model.joblib")
     parser.add_argument("--metrics-path", type=Path, default=REPORTS_DIR / "metrics.json")
+    parser.add_argument(
+        "--no-compile", action="store_true", help="Não exporta o modelo compilado (.npz)."
+    )
+    parser.add_argument(
+        "--search",
+        choices=["exhaustive", "halving", "tune"],
+        default=None,
+        help=(
+            "Estratégia de seleção do modelo (padrão: WINE_TRAIN_SEARCH ou exhaustive);"
+            " halving = successive halving com orçamento parcial;"
+            " tune = busca de hiperparâmetros (WINE_TRAIN_TUNE_*), retomável por <pasta do modelo>/tuning_study.jsonl."
+        ),
+    )
+    parser.add_argument(
+        "--candidate-cache",
+        action="store_true",
+        help="Reaproveita/grava os candidatos ajustados em <pasta do modelo>/candidates (padrão: WINE_TRAIN_CANDIDATE_CACHE).",
+    )
+    parser.add_argument(
+        "--distill",
+        action="store_true",
+        help="Treina também o modelo aluno destilado (<modelo>.student.joblib) (padrão: WINE_TRAIN_DISTILL).",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="Grava também o dump do cProfile do treino (training_profile.prof, ao lado das métricas).",
+    )
+    parser.add_argument(
+        "--incremental",
+        type=Path,
+        metavar="NEW_DATA",
+        help="Retreino incremental: adiciona árvores/rodadas ao modelo salvo usando só as amostras novas.",
+    )
+    parser.add_argument(
+        "--new-estimators",
+        type=int,
+        default=None,
+        help="Árvores/rodadas adicionadas no modo --incremental (padrão: proporcional às amostras novas).",
+    )
     args = parser.parse_args()
 
-    metrics, path = train_model(args.data_path, args.model_path, args.metrics_path)
+    if args.incremental is not None:
+        metrics, path = update_model(
+            args.incremental,
+            args.model_path,
+            args.metrics_path,
+            data_path=args.data_path,
+            n_new_estimators=args.new_estimators,
+            compile_model=not args.no_compile,
+        )
+    else:
+        metrics, path = train_model(
+            args.data_path,
+            args.model_path,
+            args.metrics_path,
+            compile_model=not args.no_compile,
+            search=args.search,
+            candidate_cache=True if args.candidate_cache else None,
+            distill=True if args.distill else None,
+            cprofile=True if args.cprofile else None,
+        )
     print(f"Modelo salvo em: {path}")
     print(json.dumps(metrics, indent=2, ensure_ascii=False))
 
@@ -0,0 +1,570 @@
+"""Budgeted hyperparameter search with fold-by-fold pruning.
+
+`tune_hyperparameters` searches a space of model hyperparameters and
+balancing methods (`DEFAULT_SEARCH_SPACE`, or a YAML/JSON file in the same
+format, `load_search_space`). Each trial is scored by stratified k-fold
+cross-validation on the training set: the test set only scores the final
+refit, as in the other searches.
+
+- Sampler: optuna's TPE when optuna is installed (optional dependency),
+  otherwise `AdaptiveSampler`, which samples at random first and then
+  perturbs the best trials with a shrinking step.
+- Pruning: after each fold, a trial whose running mean F1 falls below the
+  median of the completed trials at the same fold stops (median rule).
+  Only the folds that ran are paid for.
+- Parallelism: trials run in batches over joblib/loky workers within the
+  CPU budget (`split_cpu_budget`). The preprocessing and the balancing of
+  each fold are fitted once, in the parent, and shared by every trial.
+- Budget: no new batch starts once the time budget would be exceeded.
+  The `n_trials` limit counts the trials already stored in the study.
+- Persistence: each finished trial is appended to a JSON-lines study file.
+  A rerun with the same data, space and folds resumes from it. Records of
+  other searches in the file are ignored.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from imblearn.pipeline import Pipeline
+from joblib import Parallel, delayed, parallel_config
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+
+from analise_qualidade_vinhos.config.settings import (
+    RANDOM_STATE,
+    TRAIN_TUNE_CV,
+    TRAIN_TUNE_MAX_SECONDS,
+    TRAIN_TUNE_SAMPLER,
+    TRAIN_TUNE_SPACE,
+    TRAIN_TUNE_TRIALS,
+)
+from analise_qualidade_vinhos.pipeline.candidate_cache import candidate_key, data_fingerprint
+from analise_qualidade_vinhos.pipeline.model_builder import (
+    _default_search_space,
+    _fit_shared_stages,
+    build_model,
+    build_training_pipeline,
+    prune_unselected_features,
+    split_cpu_budget,
+)
+from analise_qualidade_vinhos.utils.profiling import measure_since, profile_stage, record_stage, snapshot
+
+try:
+    import optuna
+    from optuna.distributions import CategoricalDistribution, FloatDistribution, IntDistribution
+    from optuna.trial import TrialState, create_trial
+    OPTUNA_AVAILABLE = True
+except ImportError:
+    OPTUNA_AVAILABLE = False
+
+
+def _int(low, high, log=False):
+    return {"type": "int", "low": low, "high": high, "log": log}
+
+
+def _float(low, high, log=False):
+    return {"type": "float", "low": low, "high": high, "log": log}
+
+
+DEFAULT_SEARCH_SPACE: Dict[str, Any] = {
+    "balance": ["smote", "smoteenn", "adasyn"],
+    "algorithms": {
+        "random_forest": {
+            "n_estimators": _int(100, 600, log=True),
+            "max_depth": _int(4, 30),
+            "min_samples_leaf": _int(1, 8),
+            "max_features": {"type": "categorical", "choices": ["sqrt", "log2", 0.5]},
+        },
+        "gradient_boosting": {
+            "n_estimators": _int(50, 300, log=True),
+            "max_depth": _int(2, 8),
+            "learning_rate": _float(0.02, 0.3, log=True),
+            "subsample": _float(0.6, 1.0),
+        },
+        "xgboost": {
+            "n_estimators": _int(100, 600, log=True),
+            "max_depth": _int(3, 10),
+            "learning_rate": _float(0.02, 0.3, log=True),
+            "min_child_weight": _int(1, 10),
+            "subsample": _float(0.6, 1.0),
+            "colsample_bytree": _float(0.5, 1.0),
+        },
+        "lightgbm": {
+            "n_estimators": _int(100, 600, log=True),
+            "num_leaves": _int(15, 127, log=True),
+            "max_depth": _int(3, 12),
+            "learning_rate": _float(0.02, 0.3, log=True),
+            "min_child_samples": _int(5, 50, log=True),
+            "colsample_bytree": _float(0.5, 1.0),
+        },
+    },
+}
+
+
+def load_search_space(path: Path | str | None = None) -> Dict[str, Any]:
+    """Search space from a YAML/JSON file (`None`/"" = `DEFAULT_SEARCH_SPACE`)."""
+    if not path:
+        return validate_search_space(DEFAULT_SEARCH_SPACE)
+    import yaml
+
+    return validate_search_space(yaml.safe_load(Path(path).read_text(encoding="utf-8")))
+
+
+def validate_search_space(space: Dict[str, Any]) -> Dict[str, Any]:
+    """Check the parameter specifications and keep only the installed algorithms."""
+    if not isinstance(space, dict) or not space.get("algorithms"):
+        raise ValueError("Espaço de busca precisa de 'algorithms': {algoritmo: {parâmetro: especificação}}")
+    available, balance_methods = _default_search_space(None, None)
+    algorithms = {}
+    for algorithm, params in space["algorithms"].items():
+        if algorithm not in available:
+            print(f"⚠️ {algorithm} fora da busca: não disponível")
+            continue
+        for name, spec in (params or {}).items():
+            kind = spec.get("type") if isinstance(spec, dict) else None
+            if kind == "categorical" and spec.get("choices"):
+                continue
+            valid = (
+                kind in ("int", "float")
+                and spec["low"] <= spec["high"]
+                and (spec["low"] > 0 or not spec.get("log"))  # escala log precisa de limites positivos
+            )
+            if not valid:
+                raise ValueError(f"Especificação inválida para {algorithm}.{name}: {spec}")
+        algorithms[algorithm] = dict(params or {})
+    if not algorithms:
+        raise ValueError("Nenhum algoritmo do espaço de busca está disponível.")
+    return {"balance": list(space.get("balance") or balance_methods), "algorithms": algorithms}
+
+
+def _to_unit(spec: Dict[str, Any], value: float) -> float:
+    low, high = spec["low"], spec["high"]
+    if high == low:
+        return 0.0
+    if spec.get("log"):
+        return (math.log(value) - math.log(low)) / (math.log(high) - math.log(low))
+    return (value - low) / (high - low)
+
+
+def _from_unit(spec: Dict[str, Any], u: float):
+    low, high = spec["low"], spec["high"]
+    u = min(max(u, 0.0), 1.0)
+    if spec.get("log"):
+        value = math.exp(math.log(low) + u * (math.log(high) - math.log(low)))
+    else:
+        value = low + u * (high - low)
+    if spec["type"] == "int":
+        return int(min(max(round(value), low), high))
+    return float(value)
+
+
+def _sample(spec: Dict[str, Any], rng):
+    if spec["type"] == "categorical":
+        return spec["choices"][rng.integers(len(spec["choices"]))]
+    return _from_unit(spec, rng.random())
+
+
+def _suggest(trial, name: str, spec: Dict[str, Any]):
+    if spec["type"] == "categorical":
+        return trial.suggest_categorical(name, spec["choices"])
+    if spec["type"] == "int":
+        return trial.suggest_int(name, spec["low"], spec["high"], log=bool(spec.get("log")))
+    return trial.suggest_float(name, spec["low"], spec["high"], log=bool(spec.get("log")))
+
+
+class AdaptiveSampler:
+    """Random search that concentrates around the best completed trials (used without optuna).
+
+    The first `n_startup` trials, and a fraction `explore` of the later
+    ones, are uniform (log-uniform for `log` ranges). The others perturb a
+    trial from the top `top_fraction` of the completed ones. The step is
+    in the unit range of each parameter and shrinks as trials complete.
+    The random state depends on the trial count, so a resumed study draws
+    the same trials.
+    """
+
+    name = "adaptive"
+
+    def __init__(self, space, history, n_startup: int = 8, explore: float = 0.25, top_fraction: float = 0.25):
+        self.space = space
+        self.history = list(history)
+        self.n_startup = n_startup
+        self.explore = explore
+        self.top_fraction = top_fraction
+
+    def _random(self, rng) -> Dict[str, Any]:
+        algorithms = list(self.space["algorithms"])
+        algorithm = algorithms[rng.integers(len(algorithms))]
+        params = {name: _sample(spec, rng) for name, spec in self.space["algorithms"][algorithm].items()}
+        balance = self.space["balance"][rng.integers(len(self.space["balance"]))]
+        return {"algorithm": algorithm, "balance": balance, "params": params}
+
+    def _perturb(self, parent: Dict[str, Any], step: float, rng) -> Dict[str, Any]:
+        params = {}
+        for name, spec in self.space["algorithms"][parent["algorithm"]].items():
+            value = parent["params"].get(name)
+            if value is None or (spec["type"] == "categorical" and rng.random() >= 0.8):
+                params[name] = _sample(spec, rng)
+            elif spec["type"] == "categorical":
+                params[name] = value
+            else:
+                params[name] = _from_unit(spec, _to_unit(spec, value) + rng.normal(0.0, step))
+        balances = self.space["balance"]
+        balance = parent["balance"] if rng.random() < 0.8 else balances[rng.integers(len(balances))]
+        return {"algorithm": parent["algorithm"], "balance": balance, "params": params}
+
+    def ask(self, n: int) -> List[Dict[str, Any]]:
+        rng = np.random.default_rng([RANDOM_STATE, len(self.history)])
+        complete = sorted(
+            (r for r in self.history if r["state"] == "complete"), key=lambda r: -r["value"]
+        )
+        top = complete[: max(1, math.ceil(len(complete) * self.top_fraction))]
+        step = max(0.05, 0.25 * math.sqrt(self.n_startup / max(len(complete), 1)))
+        configs = []
+        for _ in range(n):
+            if len(complete) < self.n_startup or rng.random() < self.explore:
+                configs.append(self._random(rng))
+            else:
+                configs.append(self._perturb(top[rng.integers(len(top))], step, rng))
+        return configs
+
+    def tell(self, config: Dict[str, Any], record: Dict[str, Any]) -> None:
+        self.history.append(record)
+
+
+class OptunaSampler:
+    """optuna TPE through ask/tell; the study lives in memory and is rebuilt from the study file."""
+
+    name = "tpe"
+
+    def __init__(self, space, history):
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        self.space = space
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # constant_liar é experimental
+            # constant_liar: trials em paralelo no mesmo lote não repetem a mesma região
+            sampler = optuna.samplers.TPESampler(seed=RANDOM_STATE, constant_liar=True)
+        self.study = optuna.create_study(direction="maximize", sampler=sampler)
+        for record in history:
+            self.study.add_trial(self._frozen(record))
+
+    def _distributions(self, algorithm: str) -> Dict[str, Any]:
+        distributions = {
+            "algorithm": CategoricalDistribution(list(self.space["algorithms"])),
+            "balance": CategoricalDistribution(self.space["balance"]),
+        }
+        for name, spec in self.space["algorithms"][algorithm].items():
+            if spec["type"] == "categorical":
+                distribution = CategoricalDistribution(spec["choices"])
+            elif spec["type"] == "int":
+                distribution = IntDistribution(spec["low"], spec["high"], log=bool(spec.get("log")))
+            else:
+                distribution = FloatDistribution(spec["low"], spec["high"], log=bool(spec.get("log")))
+            # parâmetros prefixados pelo algoritmo: o mesmo nome pode ter faixas diferentes
+            distributions[f"{algorithm}__{name}"] = distribution
+        return distributions
+
+    def _frozen(self, record: Dict[str, Any]):
+        algorithm = record["algorithm"]
+        params = {"algorithm": algorithm, "balance": record["balance"]}
+        params.update({f"{algorithm}__{name}": value for name, value in record["params"].items()})
+        state = {"complete": TrialState.COMPLETE, "pruned": TrialState.PRUNED}.get(record["state"], TrialState.FAIL)
+        return create_trial(
+            state=state,
+            value=record["value"] if state == TrialState.COMPLETE else None,
+            params=params,
+            distributions=self._distributions(algorithm),
+            intermediate_values=dict(enumerate(record["scores"])),
+        )
+
+    def ask(self, n: int) -> List[Dict[str, Any]]:
+        configs = []
+        for _ in range(n):
+            trial = self.study.ask()
+            algorithm = trial.suggest_categorical("algorithm", list(self.space["algorithms"]))
+            balance = trial.suggest_categorical("balance", self.space["balance"])
+            params = {
+                name: _suggest(trial, f"{algorithm}__{name}", spec)
+                for name, spec in self.space["algorithms"][algorithm].items()
+            }
+            configs.append({"algorithm": algorithm, "balance": balance, "params": params, "trial": trial})
+        return configs
+
+    def tell(self, config: Dict[str, Any], record: Dict[str, Any]) -> None:
+        trial = config["trial"]
+        for step, score in enumerate(record["scores"]):
+            trial.report(score, step)
+        if record["state"] == "complete":
+            self.study.tell(trial, record["value"])
+        else:
+            self.study.tell(trial, state=TrialState.PRUNED if record["state"] == "pruned" else TrialState.FAIL)
+
+
+def make_sampler(space, history, sampler: str = "auto"):
+    if sampler == "auto":
+        sampler = "tpe" if OPTUNA_AVAILABLE else "adaptive"
+    if sampler == "tpe":
+        if not OPTUNA_AVAILABLE:
+            raise ValueError("sampler='tpe' requer optuna (pip install optuna)")
+        return OptunaSampler(space, history)
+    if sampler == "adaptive":
+        return AdaptiveSampler(space, history)
+    raise ValueError("sampler deve ser 'auto', 'tpe' ou 'adaptive'")
+
+
+class StudyFile:
+    """Append-only JSON-lines store of finished trials (`None` path = in memory only)."""
+
+    def __init__(self, path: Optional[Path], key: str):
+        self.path = Path(path) if path is not None else None
+        self.key = key
+
+    def load(self) -> List[Dict[str, Any]]:
+        if self.path is None or not self.path.exists():
+            return []
+        records = []
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # última linha cortada por uma interrupção
+                continue
+            if record.get("study") == self.key:
+                records.append(record)
+        return records
+
+    def append(self, record: Dict[str, Any]) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as fp:
+            fp.write(json.dumps({"study": self.key, **record}, ensure_ascii=False) + "\n")
+
+
+def prune_thresholds(history: List[Dict[str, Any]], n_folds: int, n_startup: int = 5) -> List[float | None]:
+    """Median running-mean score of the completed trials after each fold (`None` = no pruning there)."""
+    complete = [r["scores"] for r in history if r["state"] == "complete" and len(r["scores"]) == n_folds]
+    if len(complete) < n_startup or n_folds < 2:
+        return [None] * n_folds
+    running = np.cumsum(complete, axis=1) / np.arange(1, n_folds + 1)
+    thresholds: List[float | None] = [float(t) for t in np.median(running, axis=0)]
+    thresholds[-1] = None  # o último fold completa o trial
+    return thresholds
+
+
+def _prepare_folds(X_train, y_train, balance_methods: List[str], cv: int) -> Dict[str, Any]:
+    """Per balancing method, `[(X_res, y_res, X_val_prep, y_val)]` per fold, or the exception it raised."""
+    splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=RANDOM_STATE)
+    folds: Dict[str, Any] = {balance: [] for balance in balance_methods}
+    for fold, (train_idx, val_idx) in enumerate(splitter.split(X_train, y_train)):
+        X_tr, y_tr = X_train.iloc[train_idx], y_train.iloc[train_idx]
+        X_val, y_val = X_train.iloc[val_idx], y_train.iloc[val_idx]
+        with profile_stage(f"fold_{fold}"):
+            _, _, X_val_prep, resampled = _fit_shared_stages(X_tr, y_tr, X_val, balance_methods)
+        for balance in balance_methods:
+            if isinstance(folds[balance], Exception):
+                continue
+            if isinstance(resampled[balance], Exception):
+                folds[balance] = resampled[balance]
+            else:
+                _, X_res, y_res = resampled[balance]
+                folds[balance].append((X_res, y_res, X_val_prep, np.asarray(y_val)))
+    return folds
+
+
+def _probe_algorithms(algorithms: List[str], fold) -> Dict[str, str]:
+    """Algorithms that cannot fit this data at all (e.g. XGBoost on string labels), with the error.
+
+    One fit with two trees/rounds on `fold` per algorithm: such a failure
+    does not depend on the hyperparameters, so every trial would repeat it.
+    """
+    X_res, y_res, X_val, _ = fold
+    errors = {}
+    for algorithm in algorithms:
+        try:
+            model = build_model(algorithm, n_jobs=1)
+            if "n_estimators" in model.get_params():
+                model.set_params(n_estimators=2)
+            model.fit(X_res, y_res)
+            model.predict(X_val)
+        except Exception as e:
+            errors[algorithm] = str(e)
+    return errors
+
+
+def _run_trial(algorithm: str, params: Dict[str, Any], folds, thresholds, n_jobs: int) -> Dict[str, Any]:
+    """Cross-validate one configuration fold by fold, stopping when it falls below `thresholds` (runs in a worker)."""
+    start = snapshot()
+    scores: List[float] = []
+    try:
+        for fold, (X_res, y_res, X_val, y_val) in enumerate(folds):
+            model = build_model(algorithm, n_jobs=n_jobs, params=params)
+            model.fit(X_res, y_res)
+            scores.append(float(f1_score(y_val, model.predict(X_val), average="weighted")))
+            if thresholds[fold] is not None and np.mean(scores) < thresholds[fold]:
+                return {"state": "pruned", "scores": scores, "cost": measure_since(start)}
+    except Exception as e:
+        return {"state": "fail", "scores": scores, "error": str(e), "cost": measure_since(start)}
+    return {"state": "complete", "scores": scores, "cost": measure_since(start)}
+
+
+def tune_hyperparameters(
+    X_train, y_train, X_test, y_test,
+    space: Dict[str, Any] | None = None,
+    n_trials: int | None = None,
+    max_seconds: float | None = None,
+    cv: int | None = None,
+    n_jobs: int | None = None,
+    study_path: Path | None = None,
+    sampler: str | None = None,
+) -> Tuple[Pipeline | None, Dict[str, Any]]:
+    """
+    Busca de hiperparâmetros com orçamento, poda por fold e estudo retomável.
+
+    Padrões em `config.settings` (`TRAIN_TUNE_*`); `space` = `None` lê
+    `TRAIN_TUNE_SPACE` (arquivo) ou usa `DEFAULT_SEARCH_SPACE`. O melhor
+    trial (F1 médio na validação cruzada) é reajustado no treino inteiro.
+
+    Retorna `(pipeline vencedor ou None, relatório)`; o relatório vai para
+    `reports/metrics.json`.
+    """
+    space = load_search_space(TRAIN_TUNE_SPACE) if space is None else validate_search_space(space)
+    n_trials = TRAIN_TUNE_TRIALS if n_trials is None else n_trials
+    max_seconds = TRAIN_TUNE_MAX_SECONDS if max_seconds is None else max_seconds
+    cv = TRAIN_TUNE_CV if cv is None else cv
+    start = time.perf_counter()
+
+    study = StudyFile(study_path, candidate_key(data_fingerprint(X_train, y_train), "tuning", space=space, cv=cv))
+    history = study.load()
+    with profile_stage("folds"):
+        folds = _prepare_folds(X_train, y_train, space["balance"], cv)
+    errors = {balance: str(folds[balance]) for balance in space["balance"] if isinstance(folds[balance], Exception)}
+    for balance, error in errors.items():
+        print(f"⚠️ Balanceamento {balance} fora da busca: {error}")
+    # falha do balanceamento não depende dos hiperparâmetros: não gasta trials com ele
+    balances = [balance for balance in space["balance"] if balance not in errors]
+    if not balances:
+        return None, {"strategy": "tune", "trials": len(history), "errors": errors}
+    # idem para o algoritmo: um ajuste mínimo por algoritmo antes dos trials
+    with profile_stage("probe"):
+        algorithm_errors = _probe_algorithms(list(space["algorithms"]), folds[balances[0]][0])
+    for algorithm, error in algorithm_errors.items():
+        print(f"⚠️ {algorithm} fora da busca: {error}")
+    errors.update(algorithm_errors)
+    algorithms = {a: params for a, params in space["algorithms"].items() if a not in algorithm_errors}
+    if not algorithms:
+        return None, {"strategy": "tune", "trials": len(history), "errors": errors}
+    searchable = {"balance": balances, "algorithms": algorithms}
+    # trials retomados de algoritmos/balanceamentos fora da busca não orientam o sampler
+    known = [r for r in history if r["algorithm"] in algorithms and r["balance"] in balances]
+    search = make_sampler(searchable, known, TRAIN_TUNE_SAMPLER if sampler is None else sampler)
+    print(
+        f"🎯 Busca de hiperparâmetros ({search.name}): até {n_trials} trials, {cv} folds,"
+        f" orçamento {max_seconds:.0f}s; {len(history)} trial(s) retomado(s)"
+    )
+
+    resumed, batch_seconds, completed = len(history), [], True
+    while len(history) < n_trials:
+        elapsed = time.perf_counter() - start
+        if max_seconds > 0 and batch_seconds and elapsed + max(batch_seconds) > max_seconds:
+            print(f"⏱️ Orçamento de {max_seconds:.0f}s atingido após {len(history)} trials")
+            completed = False
+            break
+        outer, inner = split_cpu_budget(n_trials - len(history), n_jobs)
+        configs = search.ask(outer)
+        thresholds = prune_thresholds(history, cv)
+
+        batch_start = time.perf_counter()
+        with profile_stage(f"batch_{len(batch_seconds) + 1}"):
+            tasks = [
+                delayed(_run_trial)(c["algorithm"], c["params"], folds[c["balance"]], thresholds, inner)
+                for c in configs
+            ]
+            if outer == 1:
+                outcomes = [fn(*args, **kwargs) for fn, args, kwargs in tasks]
+            else:
+                with parallel_config(backend="loky", inner_max_num_threads=inner):
+                    outcomes = Parallel(n_jobs=outer)(tasks)
+            for config, outcome in zip(configs, outcomes):
+                record = {
+                    "number": len(history),
+                    "algorithm": config["algorithm"],
+                    "balance": config["balance"],
+                    "params": config["params"],
+                    "state": outcome["state"],
+                    "value": float(np.mean(outcome["scores"])) if outcome["state"] == "complete" else None,
+                    "scores": outcome["scores"],
+                    "seconds": outcome.get("cost", {}).get("wall_s", 0.0),
+                }
+                if "error" in outcome:
+                    record["error"] = outcome["error"]
+                history.append(record)
+                study.append(record)
+                search.tell(config, record)
+                name = f"{record['algorithm']}_{record['balance']}"
+                record_stage(f"trial_{record['number']}", candidate=name, state=record["state"], **outcome["cost"])
+                if record["state"] == "complete":
+                    print(f"   #{record['number']} {name}: F1 cv {record['value']:.4f} ({record['seconds']:.1f}s)")
+                elif record["state"] == "pruned":
+                    print(f"   #{record['number']} {name}: ✂️ podado no fold {len(record['scores'])}/{cv}")
+                else:
+                    print(f"   #{record['number']} {name}: ❌ Erro: {record['error']}")
+        batch_seconds.append(time.perf_counter() - batch_start)
+
+    states = [r["state"] for r in history]
+    report: Dict[str, Any] = {
+        "strategy": "tune",
+        "sampler": search.name,
+        "cv": cv,
+        "max_seconds": max_seconds,
+        "n_trials": n_trials,
+        "trials": len(history),
+        "trials_resumed": resumed,
+        "complete": states.count("complete"),
+        "pruned": states.count("pruned"),
+        "failed": states.count("fail"),
+        "folds_trained": sum(len(r["scores"]) for r in history),
+        "folds_full_search": cv * (len(history) - states.count("fail")),
+        "completed": completed,
+        "study_path": str(study_path) if study_path is not None else None,
+        "errors": errors,
+    }
+    complete = [r for r in history if r["state"] == "complete"]
+    if not complete:
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        return None, report
+
+    best = max(complete, key=lambda r: r["value"])  # o primeiro em caso de empate
+    with profile_stage("refit"):
+        pipeline = build_training_pipeline(
+            best["algorithm"],
+            balance_method=best["balance"],
+            n_jobs=split_cpu_budget(1, n_jobs)[1],
+            model_params=best["params"],
+        ).fit(X_train, y_train)
+    pipeline = prune_unselected_features(pipeline)
+    preds = pipeline.predict(X_test)
+    report.update(
+        winner=f"{best['algorithm']}_{best['balance']}",
+        algorithm=best["algorithm"],
+        balance=best["balance"],
+        params=best["params"],
+        trial=best["number"],
+        n_estimators=pipeline.named_steps["model"].get_params()["n_estimators"],
+        cv_f1_weighted=round(best["value"], 4),
+        f1_weighted=round(float(f1_score(y_test, preds, average="weighted")), 4),
+        accuracy=round(float(accuracy_score(y_test, preds)), 4),
+        seconds=round(time.perf_counter() - start, 3),
+    )
+    print(
+        f"🏆 Melhor trial #{best['number']}: {report['winner']} F1 cv={best['value']:.4f}"
+        f" | teste={report['f1_weighted']:.4f}; {report['pruned']} podado(s),"
+        f" {report['folds_trained']} de {report['folds_full_search']} folds treinados em {report['seconds']:.1f}s"
+    )
+    return pipeline, report
@@ -0,0 +1,184 @@
+"""Micro-batching: coalesce concurrent /predict requests into one model call."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, List, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class _PendingRequest:
+    frame: pd.DataFrame
+    future: asyncio.Future
+
+
+class MicroBatcher:
+    """Gather concurrent requests for up to `max_wait_ms` (or `max_batch_rows`)
+    and score them with a single call to `predict_fn`.
+
+    `predict_fn` receives the concatenated DataFrame and must return one
+    prediction per row, in order; results are sliced back to each caller.
+    A plain function runs in `executor` (the loop's default one when `None`)
+    so the event loop is never blocked by the model; a coroutine function
+    (e.g. `InferenceExecutor.predict`) is awaited directly. Up to
+    `max_concurrent_batches` batches may be in flight at once (match it to
+    the executor's workers).
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[pd.DataFrame], Union[List, Awaitable[List]]],
+        max_wait_ms: float = 5.0,
+        max_batch_rows: int = 512,
+        executor=None,
+        max_concurrent_batches: int = 1,
+        history_size: int = 1000,
+    ):
+        if max_batch_rows < 1:
+            raise ValueError("max_batch_rows deve ser >= 1")
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self.executor = executor
+        self.max_concurrent_batches = max_concurrent_batches
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._collecting: List[_PendingRequest] = []
+        self._in_flight: Set[asyncio.Task] = set()
+        self._stopped = False
+        self._batch_seconds: Deque[float] = deque(maxlen=history_size)
+        self._batch_rows: Deque[int] = deque(maxlen=history_size)
+        self._requests = 0
+        self._rows = 0
+        self._batches = 0
+        self._busy_seconds = 0.0
+
+    async def start(self) -> None:
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._stopped = False
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop accepting requests: batches in flight finish and requests already
+        accepted (queued or in the batch being collected) are scored in one
+        last batch; only `submit` calls after `stop` fail with `RuntimeError`."""
+        self._stopped = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending, self._collecting = self._collecting, []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            await self._dispatch(pending)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def submit(self, frame: pd.DataFrame) -> List:
+        """Enqueue `frame` and wait for its share of the batched predictions."""
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher não iniciado; chame start() antes.")
+        if self._stopped:
+            raise RuntimeError("MicroBatcher parado; não aceita novas requisições.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(frame, future))
+        return await future
+
+    async def _collect(self) -> List[_PendingRequest]:
+        loop = asyncio.get_running_loop()
+        first = await self._queue.get()
+        # visível para stop(): um cancelamento aqui não pode perder as requisições já retiradas da fila
+        self._collecting = batch = [first]
+        rows = len(first.frame)
+        deadline = loop.time() + self.max_wait
+        while rows < self.max_batch_rows:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            rows += len(item.frame)
+        self._collecting = []
+        return batch
+
+    async def _run(self) -> None:
+        slots = asyncio.Semaphore(self.max_concurrent_batches)
+
+        def _done(task: asyncio.Task) -> None:
+            self._in_flight.discard(task)
+            slots.release()
+
+        # lotes em andamento não são cancelados: stop() espera por eles
+        while True:
+            await slots.acquire()
+            batch = await self._collect()
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(_done)
+
+    async def _dispatch(self, batch: List[_PendingRequest]) -> None:
+        loop = asyncio.get_running_loop()
+        sizes = [len(item.frame) for item in batch]
+        combined = pd.concat([item.frame for item in batch], ignore_index=True)
+
+        start = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(self.predict_fn):
+                preds = await self.predict_fn(combined)
+            else:
+                preds = await loop.run_in_executor(self.executor, self.predict_fn, combined)
+            if len(preds) != len(combined):
+                raise RuntimeError(
+                    f"predict_fn retornou {len(preds)} predições para {len(combined)} linhas"
+                )
+        except Exception as exc:  # repassa o erro para todos os chamadores
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            return
+        elapsed = time.perf_counter() - start
+
+        self._record(len(batch), len(combined), elapsed)
+        offset = 0
+        for item, size in zip(batch, sizes):
+            if not item.future.done():
+                item.future.set_result(list(preds[offset : offset + size]))
+            offset += size
+
+    def _record(self, n_requests: int, n_rows: int, seconds: float) -> None:
+        self._requests += n_requests
+        self._rows += n_rows
+        self._batches += 1
+        self._busy_seconds += seconds
+        self._batch_seconds.append(seconds)
+        self._batch_rows.append(n_rows)
+
+    def stats(self) -> dict:
+        """Throughput and per-batch latency over the recent batch history."""
+        latencies = np.asarray(self._batch_seconds, dtype=float) * 1000.0
+        rows = np.asarray(self._batch_rows, dtype=float)
+        return {
+            "batches": self._batches,
+            "requests": self._requests,
+            "rows": self._rows,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch_rows": self.max_batch_rows,
+            "mean_batch_rows": float(rows.mean()) if rows.size else 0.0,
+            "rows_per_second": self._rows / self._busy_seconds if self._busy_seconds else 0.0,
+            "batch_latency_ms_p50": float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+            "batch_latency_ms_p99": float(np.percentile(latencies, 99)) if latencies.size else 0.0,
+        }
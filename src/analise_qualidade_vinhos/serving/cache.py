@@ -0,0 +1,153 @@
+"""In-memory prediction cache for repeated wine samples."""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analise_qualidade_vinhos.features.engineering import BASE_FEATURES
+
+# Custo aproximado de uma entrada no OrderedDict (nó + tupla), além de chave e valor
+_ENTRY_OVERHEAD = 120
+
+
+class PredictionCache:
+    """LRU cache of predictions keyed on the 11 physico-chemical measurements.
+
+    - keys are a blake2b digest of the canonical float64 row (columns in
+      `BASE_FEATURES` order, optionally rounded to `decimals`);
+    - entries expire after `ttl_seconds` (when set) and the least recently
+      used ones are evicted beyond `max_entries` or `max_bytes`;
+    - `lookup` receives the current model version and drops every entry when
+      it differs from the one the cache was filled with.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        ttl_seconds: float | None = None,
+        max_bytes: int | None = 64 * 1024 * 1024,
+        decimals: int | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds or None
+        self.max_bytes = max_bytes
+        self.decimals = decimals
+        self._data: "OrderedDict[bytes, Tuple[object, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._version: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def make_keys(self, df: pd.DataFrame) -> List[bytes]:
+        values = np.empty((len(df), len(BASE_FEATURES)), dtype=np.float64)
+        for i, name in enumerate(BASE_FEATURES):
+            values[:, i] = df[name].to_numpy(dtype=np.float64)
+        if self.decimals is not None:
+            np.round(values, self.decimals, out=values)
+        values += 0.0  # normaliza -0.0 para 0.0
+        return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in values]
+
+    def lookup(self, df: pd.DataFrame, version: Hashable) -> Tuple[List[bytes], List, List[int]]:
+        """Return `(keys, predictions, missing_positions)` for `df`.
+
+        `predictions` holds `None` at every position listed in
+        `missing_positions`; score those rows and hand them to `update`.
+        """
+        keys = self.make_keys(df)
+        now = time.monotonic()
+        preds: List = [None] * len(keys)
+        missing: List[int] = []
+        with self._lock:
+            self._bind(version)
+            for pos, key in enumerate(keys):
+                entry = self._data.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self._data.move_to_end(key)
+                    preds[pos] = entry[0]
+                    continue
+                if entry is not None:
+                    self._remove(key)
+                missing.append(pos)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return keys, preds, missing
+
+    def update(
+        self,
+        keys: Sequence[bytes],
+        preds: List,
+        missing: Sequence[int],
+        fresh: Sequence,
+        version: Optional[Hashable] = None,
+    ) -> List:
+        """Fill `preds` at `missing` with `fresh` results and cache them.
+
+        When `version` is given and the cache has meanwhile been bound to a
+        different model, the results are returned but not stored.
+        """
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            for pos, value in zip(missing, fresh):
+                preds[pos] = value
+            if version is not None and version != self._version:
+                return preds
+            for pos in missing:
+                value = preds[pos]
+                key = keys[pos]
+                if key in self._data:
+                    self._remove(key)
+                size = sys.getsizeof(key) + sys.getsizeof(value) + _ENTRY_OVERHEAD
+                self._data[key] = (value, expires, size)
+                self._bytes += size
+            self._evict()
+        return preds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _bind(self, version: Hashable) -> None:
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._bytes = 0
+            self._version = version
+
+    def _remove(self, key: bytes) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "model_version": self._version,
+        }
@@ -0,0 +1,133 @@
+"""Binary columnar bodies for /predict: Arrow IPC or a raw little-endian matrix.
+
+Both formats go straight from the request bytes to a float64 DataFrame with
+the `BASE_FEATURES` columns (no per-row Python objects) and answer with the
+predictions as small integer codes plus the label dictionary.
+
+Raw matrix (`application/x-wine-matrix`)::
+
+    request:  uint32 LE header length | header JSON | row-major matrix
+              header = {"columns": [...11 names...], "dtype": "<f4" | "<f8"}
+    response: uint32 LE header length | header JSON | int8 codes (one per row)
+              header = {"labels": [...], "dtype": "|i1", "rows": n}
+
+Arrow (`application/vnd.apache.arrow.stream`, requires pyarrow): a record
+batch stream with the 11 feature columns in, and a stream with one
+dictionary-encoded `prediction` column (int8 indices) out.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import struct
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from analise_qualidade_vinhos.features.engineering import BASE_FEATURES
+
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+MATRIX_CONTENT_TYPE = "application/x-wine-matrix"
+COLUMNAR_CONTENT_TYPES = (ARROW_CONTENT_TYPE, MATRIX_CONTENT_TYPE)
+
+_HEADER = struct.Struct("<I")
+_MATRIX_DTYPES = {"<f4", "<f8"}
+
+
+def _to_frame(values: np.ndarray) -> pd.DataFrame:
+    """Validate a (rows, BASE_FEATURES) float64 matrix like `WineSample` does (finite, >= 0)."""
+    invalid = ~(np.isfinite(values) & (values >= 0)).all(axis=1)
+    if invalid.any():
+        first = int(np.flatnonzero(invalid)[0])
+        raise ValueError(
+            f"{int(invalid.sum())} linha(s) com valores negativos, nulos ou não finitos (primeira: {first})"
+        )
+    return pd.DataFrame(values, columns=BASE_FEATURES, copy=False)
+
+
+def _column_order(columns: Sequence[str]) -> list:
+    missing = [c for c in BASE_FEATURES if c not in columns]
+    if missing:
+        raise ValueError(f"Colunas ausentes: {missing}")
+    return [list(columns).index(c) for c in BASE_FEATURES]
+
+
+def decode_matrix(body: bytes) -> pd.DataFrame:
+    if len(body) < _HEADER.size:
+        raise ValueError("Corpo binário sem cabeçalho")
+    (header_len,) = _HEADER.unpack_from(body)
+    try:
+        header = json.loads(body[_HEADER.size : _HEADER.size + header_len])
+        columns, dtype = list(header["columns"]), header.get("dtype", "<f4")
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError(f"Cabeçalho inválido: {exc}") from exc
+    if dtype not in _MATRIX_DTYPES:
+        raise ValueError(f"dtype deve ser um de {sorted(_MATRIX_DTYPES)}")
+    order = _column_order(columns)
+    payload = memoryview(body)[_HEADER.size + header_len :]
+    row_bytes = np.dtype(dtype).itemsize * len(columns)
+    if len(payload) % row_bytes:
+        raise ValueError(f"Tamanho do corpo ({len(payload)} bytes) não é múltiplo de uma linha ({row_bytes} bytes)")
+    matrix = np.frombuffer(payload, dtype=dtype).reshape(-1, len(columns))
+    return _to_frame(matrix[:, order].astype(np.float64))
+
+
+def encode_matrix(codes: np.ndarray, labels: Sequence[str]) -> bytes:
+    header = json.dumps(
+        {"labels": list(labels), "dtype": "|i1", "rows": int(len(codes))}, ensure_ascii=False
+    ).encode("utf-8")
+    return _HEADER.pack(len(header)) + header + np.asarray(codes, dtype=np.int8).tobytes()
+
+
+def decode_arrow(body: bytes) -> pd.DataFrame:
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow não está instalado")
+    try:
+        table = pa_ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as exc:
+        raise ValueError(f"Stream Arrow inválido: {exc}") from exc
+    _column_order(table.column_names)
+    values = np.empty((table.num_rows, len(BASE_FEATURES)), dtype=np.float64)
+    for i, name in enumerate(BASE_FEATURES):
+        column = table.column(name)
+        if not pa.types.is_integer(column.type) and not pa.types.is_floating(column.type):
+            raise ValueError(f"Coluna {name} deve ser numérica, recebido {column.type}")
+        # nulos viram NaN e são rejeitados pela validação
+        values[:, i] = column.to_numpy(zero_copy_only=False)
+    return _to_frame(values)
+
+
+def encode_arrow(codes: np.ndarray, labels: Sequence[str]) -> bytes:
+    predictions = pa.DictionaryArray.from_arrays(
+        pa.array(np.asarray(codes, dtype=np.int8)), pa.array(list(labels), pa.string())
+    )
+    table = pa.table({"prediction": predictions})
+    sink = io.BytesIO()
+    with pa_ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def label_codes(predictions: Sequence[str], labels: Sequence[str]) -> np.ndarray:
+    """Map predicted labels to their position in `labels` (int8)."""
+    codes = pd.Categorical(predictions, categories=list(labels)).codes
+    if (codes < 0).any():
+        raise ValueError("Modelo retornou rótulo fora do dicionário de rótulos")
+    return codes.astype(np.int8, copy=False)
+
+
+def decode(body: bytes, content_type: str) -> pd.DataFrame:
+    return decode_arrow(body) if content_type == ARROW_CONTENT_TYPE else decode_matrix(body)
+
+
+def encode(codes: np.ndarray, labels: Sequence[str], content_type: str) -> bytes:
+    return encode_arrow(codes, labels) if content_type == ARROW_CONTENT_TYPE else encode_matrix(codes, labels)
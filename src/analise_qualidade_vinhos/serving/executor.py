@@ -0,0 +1,161 @@
+"""Dedicated, bounded executor that keeps CPU-bound inference off the event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from analise_qualidade_vinhos.pipeline.predict import artifact_version, load_model, predict_rows_timed
+from analise_qualidade_vinhos.serving.metrics import observe_scoring
+
+# (versão, modelo) carregado uma única vez por processo worker (modo "process")
+_WORKER_MODEL = None
+
+
+def _live_artifact(model_path: Path) -> Tuple[str, Path]:
+    return artifact_version(model_path), model_path
+
+
+def _load_version(model_path: str, version: str) -> Tuple[str, object]:
+    """Load `model_path`, checking after the load that it still is `version`."""
+    path = Path(model_path)
+    model = load_model(path)
+    if artifact_version(path) != version:
+        raise RuntimeError(f"{path.name} não corresponde à versão {version}")
+    return version, model
+
+
+def _init_worker(model_path: str, version: str) -> None:
+    global _WORKER_MODEL
+    try:
+        _WORKER_MODEL = _load_version(model_path, version)
+    except (OSError, RuntimeError):
+        _WORKER_MODEL = None  # carrega na primeira tarefa
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _score_with_loader(model_loader: Callable, df: pd.DataFrame) -> Tuple[List[str], Dict[str, float], int]:
+    """Thread mode: resolve the model in the worker, so a first (or fallback) load never blocks the loop."""
+    return predict_rows_timed(model_loader(), df)
+
+
+def _score_in_worker(df: pd.DataFrame, model_path: str, version: str) -> Tuple[List[str], Dict[str, float], int]:
+    """Score with the worker's model, reloading it when a new version is published.
+
+    `model_path` is the validated snapshot of `version`. If it cannot be
+    loaded as that version (missing, or the fingerprint changed during the
+    load), the worker keeps scoring with the model it already holds.
+
+    Stage timings and the unique row count travel back with the predictions
+    so the server process records them in its own metrics.
+    """
+    global _WORKER_MODEL
+    if _WORKER_MODEL is None or _WORKER_MODEL[0] != version:
+        try:
+            _WORKER_MODEL = _load_version(model_path, version)
+        except (OSError, RuntimeError):
+            if _WORKER_MODEL is None:
+                raise
+    return predict_rows_timed(_WORKER_MODEL[1], df)
+
+
+class InferenceExecutor:
+    """Run `predict_rows_timed` on a fixed-size thread or process pool.
+
+    - `kind="thread"`: workers share the model returned by `model_loader`,
+      which is called inside the worker thread. Cheap to start, but
+      pandas/sklearn code that holds the GIL still competes with the event loop.
+    - `kind="process"`: every worker process loads the model once in its
+      initializer, so scoring never touches the server process' GIL. Each
+      task carries the `(version, path)` returned by `snapshot_provider`,
+      which runs on the event loop and must not touch the filesystem (e.g.
+      the `ModelStore`'s published snapshot, resolved when it was published).
+      Without one, `model_path` is fingerprinted once, in `start()`; a
+      worker reloads only when the version changes (hot swap).
+
+    At most `max_pending` batches are queued or running at once; further
+    callers wait (asynchronously) for a free slot instead of piling up work.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 2,
+        model_path: Path | None = None,
+        model_loader: Optional[Callable] = None,
+        snapshot_provider: Optional[Callable[[], Tuple[str, Path]]] = None,
+        max_pending: int | None = None,
+        preload: bool = True,
+    ):
+        if kind not in {"thread", "process"}:
+            raise ValueError("kind deve ser 'thread' ou 'process'")
+        if kind == "process" and model_path is None and snapshot_provider is None:
+            raise ValueError("modo 'process' requer model_path ou snapshot_provider")
+        if kind == "thread" and model_loader is None:
+            model_loader = lru_cache(maxsize=1)(partial(load_model, model_path))
+        if kind == "process" and snapshot_provider is None:
+            snapshot_provider = lru_cache(maxsize=1)(partial(_live_artifact, model_path))
+        self.kind = kind
+        self.max_workers = max_workers
+        self.model_path = model_path
+        self.model_loader = model_loader
+        self.snapshot_provider = snapshot_provider
+        self.max_pending = max_pending or 2 * max_workers
+        self.preload = preload
+        self.pool: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def start(self) -> None:
+        """Create the pool and (with `preload`) load the model in every worker."""
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_pending)
+        if self.kind == "thread":
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            if self.preload:
+                await loop.run_in_executor(self.pool, self.model_loader)
+        else:
+            # resolvido fora do event loop (o padrão fica em cache para as requisições)
+            version, path = await asyncio.to_thread(self.snapshot_provider)
+            initargs = (str(path), version) if self.preload else ()
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker if self.preload else None,
+                initargs=initargs,
+            )
+            # Força a criação de todos os workers (e o carregamento do modelo) já no startup
+            await asyncio.gather(
+                *(loop.run_in_executor(self.pool, _worker_ready) for _ in range(self.max_workers))
+            )
+
+    async def predict(self, df: pd.DataFrame) -> List[str]:
+        if self.pool is None:
+            raise RuntimeError("InferenceExecutor não iniciado; chame start() antes.")
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            if self.kind == "process":
+                version, path = self.snapshot_provider()
+                preds, timings, unique_rows = await loop.run_in_executor(
+                    self.pool, _score_in_worker, df, str(path), version
+                )
+            else:
+                preds, timings, unique_rows = await loop.run_in_executor(
+                    self.pool, _score_with_loader, self.model_loader, df
+                )
+        observe_scoring(len(df), timings, unique_rows)
+        return preds
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,223 @@
+"""Lightweight Prometheus metrics (text exposition format 0.0.4) for the API.
+
+Only counters, gauges and fixed-bucket histograms are needed, so they are
+implemented here instead of pulling in `prometheus_client`. Observing a value
+is a `bisect` plus a few additions under a lock (about a microsecond), cheap
+enough to keep always on.
+"""
+
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latências de 100 µs a 10 s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Linhas por chamada ao modelo
+BATCH_ROWS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Mapping[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        """`(sample name, labels, value)` for every exposed series."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(_Metric):
+    """Gauge whose samples are read from `callback` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+    ):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def samples(self):
+        for labels, value in self.callback():
+            yield self.name, labels, value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # por combinação de rótulos: [contagem por bucket (não cumulativa) + overflow, soma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def sum(self, **labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return series[1] if series else 0.0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add `metric`, replacing any previously registered one with the same name."""
+        self._metrics = [m for m in self._metrics if m.name != metric.name] + [metric]
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "wine_api_stage_seconds",
+        "Time spent per /predict stage (parse, dedup, prepare_input, predict, serialize).",
+        labelnames=("stage",),
+    )
+)
+BATCH_ROWS = REGISTRY.register(
+    Histogram(
+        "wine_api_batch_rows",
+        "Rows per model call (after micro-batching, cache hits and de-duplication).",
+        buckets=BATCH_ROWS_BUCKETS,
+    )
+)
+ROWS_SCORED = REGISTRY.register(Counter("wine_api_rows_scored_total", "Rows answered by the model."))
+ROWS_UNIQUE = REGISTRY.register(
+    Counter("wine_api_rows_unique_total", "Distinct rows actually sent to the model (after de-duplication).")
+)
+
+
+def _rows_per_second():
+    busy = sum(STAGE_SECONDS.sum(stage=stage) for stage in ("dedup", "prepare_input", "predict"))
+    yield {}, ROWS_SCORED.value() / busy if busy else 0.0
+
+
+def _dedup_ratio():
+    rows = ROWS_SCORED.value()
+    yield {}, 1.0 - ROWS_UNIQUE.value() / rows if rows else 0.0
+
+
+REGISTRY.register(
+    Gauge(
+        "wine_api_rows_per_second",
+        "Scoring throughput: rows / time spent in dedup + prepare_input + predict.",
+        _rows_per_second,
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "wine_api_dedup_ratio",
+        "Share of scored rows answered by broadcasting a duplicate row's prediction.",
+        _dedup_ratio,
+    )
+)
+
+
+def observe_scoring(n_rows: int, timings: Mapping[str, float], unique_rows: int | None = None) -> None:
+    """Record one model call: rows answered, distinct rows scored and the stage times."""
+    unique_rows = n_rows if unique_rows is None else unique_rows
+    BATCH_ROWS.observe(unique_rows)
+    ROWS_SCORED.inc(n_rows)
+    ROWS_UNIQUE.inc(unique_rows)
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
@@ -0,0 +1,247 @@
+"""Background model loading, readiness and zero-downtime hot swap."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+from analise_qualidade_vinhos.config.settings import QUALITY_LABELS
+from analise_qualidade_vinhos.pipeline.predict import artifact_version, load_model, predict_rows
+
+# Amostra típica usada para aquecer e validar um artefato antes de publicá-lo
+PROBE_SAMPLES = pd.DataFrame(
+    {
+        "fixed_acidity": [7.4, 8.1],
+        "volatile_acidity": [0.7, 0.38],
+        "citric_acid": [0.0, 0.28],
+        "residual_sugar": [1.9, 2.1],
+        "chlorides": [0.076, 0.066],
+        "free_sulfur_dioxide": [11.0, 13.0],
+        "total_sulfur_dioxide": [34.0, 30.0],
+        "density": [0.9978, 0.9968],
+        "ph": [3.51, 3.23],
+        "sulphates": [0.56, 0.73],
+        "alcohol": [9.4, 9.7],
+    }
+)
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """Immutable snapshot of a published model; requests keep their snapshot.
+
+    `path` is the store's private copy of the validated artifact
+    (`<stem>.<version><suffix>`), not the live path training rewrites.
+    """
+
+    model: object
+    version: str
+    path: Path
+    loaded_at: float
+    load_seconds: float
+
+
+def validate_model(model) -> None:
+    """Warm the model up on `PROBE_SAMPLES` and check its output is sane."""
+    preds = predict_rows(model, PROBE_SAMPLES)
+    if len(preds) != len(PROBE_SAMPLES):
+        raise ValueError("modelo retornou número de predições diferente do número de amostras")
+    unknown = set(preds) - set(QUALITY_LABELS)
+    if unknown:
+        raise ValueError(f"modelo retornou rótulos desconhecidos: {sorted(unknown)}")
+
+
+class ModelStore:
+    """Hold the currently published model and swap in new artifacts safely.
+
+    - `load()` trains (only if the artifact is missing), loads, validates and
+      publishes the artifact; it is what `start()` runs in the background.
+    - `check_for_update()` reloads when the artifact fingerprint changes; a
+      candidate that fails to load or validate is ignored and the current
+      model keeps serving.
+    - Publishing is a single reference assignment, so in-flight requests
+      finish on the snapshot they already hold.
+    - Every candidate is loaded from a private copy named by its version;
+      process workers load that same copy (`LoadedModel.path`), so they run
+      exactly the bytes that were validated. Only the current and previous
+      copies are kept on disk.
+    """
+
+    def __init__(
+        self,
+        model_path: Path,
+        loader: Callable = load_model,
+        validator: Callable = validate_model,
+        trainer: Optional[Callable] = None,
+        poll_seconds: float = 5.0,
+    ):
+        self.model_path = model_path
+        self.loader = loader
+        self.validator = validator
+        self.trainer = trainer
+        self.poll_seconds = poll_seconds
+        self.last_error: Optional[str] = None
+        self.swaps = 0
+        self._current: Optional[LoadedModel] = None
+        self._failed_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._tasks: list = []
+
+    @property
+    def current(self) -> Optional[LoadedModel]:
+        return self._current
+
+    @property
+    def ready(self) -> bool:
+        return self._current is not None
+
+    def get(self) -> LoadedModel:
+        """Return the published snapshot, loading synchronously on first use."""
+        current = self._current
+        if current is None:
+            current = self.load()
+        return current
+
+    def load(self) -> LoadedModel:
+        with self._lock:
+            if self._current is not None:
+                return self._current
+            if not self.model_path.exists():
+                if self.trainer is None:
+                    raise FileNotFoundError(f"Modelo não encontrado em {self.model_path}.")
+                self.trainer(model_path=self.model_path)
+            loaded = self._load_candidate(artifact_version(self.model_path))
+            self._publish(loaded)
+            return loaded
+
+    def check_for_update(self) -> bool:
+        """Reload the artifact if it changed on disk; return True on swap."""
+        current = self._current
+        if current is None or not self.model_path.exists():
+            return False
+        version = artifact_version(self.model_path)
+        if version in (current.version, self._failed_version):
+            return False
+        with self._lock:
+            try:
+                loaded = self._load_candidate(version)
+            except Exception as exc:  # artefato incompleto ou inválido: mantém o atual
+                self._failed_version = version
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                print(f"⚠️ Novo modelo rejeitado ({version}): {self.last_error}")
+                return False
+            self._publish(loaded)
+        print(f"🔄 Modelo atualizado: {current.version} -> {loaded.version}")
+        return True
+
+    def snapshot_path(self, version: str) -> Path:
+        return self.model_path.with_name(f"{self.model_path.stem}.{version}{self.model_path.suffix}")
+
+    def _snapshot(self, version: str) -> Path:
+        """Copy the live artifact to `snapshot_path(version)`, failing if it changed meanwhile."""
+        snapshot = self.snapshot_path(version)
+        if snapshot.exists():
+            return snapshot
+        tmp = snapshot.with_name(snapshot.name + ".tmp")
+        shutil.copy2(self.model_path, tmp)  # preserva o mtime: a cópia tem a mesma versão do original
+        if artifact_version(tmp) != version:
+            tmp.unlink()
+            raise RuntimeError(f"{self.model_path.name} mudou durante a cópia; nova tentativa na próxima verificação")
+        os.replace(tmp, snapshot)
+        return snapshot
+
+    def _load_candidate(self, version: str) -> LoadedModel:
+        start = time.perf_counter()
+        snapshot = self._snapshot(version)
+        try:
+            model = self.loader(snapshot)
+            self.validator(model)
+        except Exception:
+            snapshot.unlink(missing_ok=True)
+            raise
+        return LoadedModel(
+            model=model,
+            version=version,
+            path=snapshot,
+            loaded_at=time.time(),
+            load_seconds=time.perf_counter() - start,
+        )
+
+    def _publish(self, loaded: LoadedModel) -> None:
+        previous = self._current
+        if previous is not None:
+            self.swaps += 1
+        self._current = loaded
+        self._failed_version = None
+        self.last_error = None
+        # o anterior fica em disco: workers que ainda não trocaram de versão continuam com ele
+        self._prune_snapshots(keep={loaded.path, previous.path if previous else None})
+
+    def _prune_snapshots(self, keep: set) -> None:
+        stem, suffix = self.model_path.stem, self.model_path.suffix
+        pattern = re.compile(re.escape(stem) + r"\.\d+-\d+" + re.escape(suffix))
+        for path in self.model_path.parent.glob(f"{stem}.*{suffix}"):
+            if path not in keep and pattern.fullmatch(path.name):
+                path.unlink(missing_ok=True)
+
+    async def wait_ready(self) -> LoadedModel:
+        """Wait for the background load (retrying synchronously if it failed)."""
+        if self._current is not None:
+            return self._current
+        initial = self._tasks[0] if self._tasks else None
+        if initial is not None and not initial.done():
+            await asyncio.shield(initial)
+        if self._current is None:
+            return await asyncio.to_thread(self.load)
+        return self._current
+
+    async def start(self) -> None:
+        """Load in the background and, if `poll_seconds > 0`, watch the artifact."""
+        self._tasks = [asyncio.create_task(self._initial_load())]
+        if self.poll_seconds > 0:
+            self._tasks.append(asyncio.create_task(self._watch()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+
+    async def _initial_load(self) -> None:
+        try:
+            await asyncio.to_thread(self.load)
+        except Exception as exc:
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            print(f"❌ Falha ao carregar o modelo: {self.last_error}")
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await asyncio.to_thread(self.check_for_update)
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+
+    def status(self) -> dict:
+        current = self._current
+        return {
+            "ready": current is not None,
+            "model_version": current.version if current else None,
+            "loaded_at": current.loaded_at if current else None,
+            "load_seconds": current.load_seconds if current else None,
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,140 @@
+"""Per-stage cost of a training run: wall time, CPU time and peak RSS.
+
+`train_model` activates a `TrainingProfiler` (`profiling(profiler)`). The
+code it calls marks its stages with `profile_stage("name")`, which is a
+no-op when no profiler is active, so library calls outside training pay
+nothing. Nested stages are named by path (`search/rung_1/...`).
+
+Candidates fitted in joblib worker processes measure themselves
+(`measure_since`) and return the numbers with their result. The caller
+then adds them with `record_stage`. A stage's `cpu_s` covers only the
+current process, all threads included. Peak RSS is the process
+high-water mark (`getrusage`): `peak_rss_mb` is its value at the end of the
+stage, and `rss_growth_mb` is how much the stage raised it.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+_ACTIVE: ContextVar[Optional["TrainingProfiler"]] = ContextVar("training_profiler", default=None)
+
+
+def peak_rss_mb() -> float | None:
+    """High-water resident set size of this process, in MB."""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def snapshot() -> Dict[str, Any]:
+    return {"wall": time.perf_counter(), "cpu": time.process_time(), "peak_rss_mb": peak_rss_mb()}
+
+
+def measure_since(start: Dict[str, Any]) -> Dict[str, Any]:
+    """Wall/CPU seconds and peak RSS between `start` (a `snapshot()`) and now."""
+    end = snapshot()
+    growth = None
+    if end["peak_rss_mb"] is not None:
+        growth = round(end["peak_rss_mb"] - start["peak_rss_mb"], 1)
+    return {
+        "wall_s": round(end["wall"] - start["wall"], 4),
+        "cpu_s": round(end["cpu"] - start["cpu"], 4),
+        "peak_rss_mb": end["peak_rss_mb"],
+        "rss_growth_mb": growth,
+    }
+
+
+class TrainingProfiler:
+    """Collects the stages of one run; `cprofile=True` also runs `cProfile` over it."""
+
+    def __init__(self, cprofile: bool = False):
+        self.stages: List[Dict[str, Any]] = []
+        self._path: List[str] = []
+        self._start = snapshot()
+        self._cprofile = cProfile.Profile() if cprofile else None
+
+    @contextmanager
+    def stage(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        self._path.append(name)
+        # registrado na entrada: a lista fica na ordem de início das etapas
+        entry: Dict[str, Any] = {"name": "/".join(self._path), **attrs}
+        self.stages.append(entry)
+        start = snapshot()
+        try:
+            yield entry
+        finally:
+            entry.update(measure_since(start))
+            self._path.pop()
+
+    def record(self, name: str, **fields) -> None:
+        """Add a stage measured elsewhere (e.g. in a worker process) under the current stage."""
+        self.stages.append({"name": "/".join([*self._path, name]), **fields})
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        names = [s["name"] for s in self.stages]
+        leaves = [
+            s for s in self.stages
+            if "wall_s" in s and not any(other.startswith(s["name"] + "/") for other in names)
+        ]
+        slowest = sorted(leaves, key=lambda s: -s["wall_s"])[:top]
+        return {
+            "total": measure_since(self._start),
+            "stages": self.stages,
+            "slowest": [{"name": s["name"], "wall_s": s["wall_s"]} for s in slowest],
+        }
+
+    def write(self, path: Path) -> Path:
+        """`path` (JSON summary) and, with `cprofile`, the `pstats` dump next to it (`.prof`)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as fp:
+            json.dump(self.summary(), fp, indent=2, ensure_ascii=False)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(str(path.with_suffix(".prof")))
+        return path
+
+
+@contextmanager
+def profiling(profiler: TrainingProfiler) -> Iterator[TrainingProfiler]:
+    """Make `profiler` the target of `profile_stage`/`record_stage` in this context."""
+    token = _ACTIVE.set(profiler)
+    if profiler._cprofile is not None:
+        profiler._cprofile.enable()
+    try:
+        yield profiler
+    finally:
+        if profiler._cprofile is not None:
+            profiler._cprofile.disable()
+        _ACTIVE.reset(token)
+
+
+@contextmanager
+def profile_stage(name: str, **attrs) -> Iterator[Dict[str, Any] | None]:
+    """Stage of the active profiler; yields its entry (or `None` when profiling is off)."""
+    profiler = _ACTIVE.get()
+    if profiler is None:
+        yield None
+        return
+    with profiler.stage(name, **attrs) as entry:
+        yield entry
+
+
+def record_stage(name: str, **fields) -> None:
+    profiler = _ACTIVE.get()
+    if profiler is not None:
+        profiler.record(name, **fields)
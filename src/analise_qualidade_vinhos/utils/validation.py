@@ -1,14 +1,26 @@
 # Libs
 import warnings
-from sklearn.model_selection import cross_val_score, StratifiedKFold, KFold
+from sklearn.model_selection import cross_validate, StratifiedKFold, KFold
 from sklearn.preprocessing import StandardScaler
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 
+SCORING_METHODS = ["accuracy", "f1_weighted", "recall_weighted", "precision_weighted"]
+
+
 # Função de Validação Cruzada
-def cross_validate_model(X, y, model, cv=5, stratified=True):
+def cross_validate_model(X, y, model, cv=5, stratified=True, scoring=None, n_jobs=-1, cache_dir=None):
+    """Validação cruzada com todas as métricas calculadas a partir de um único ajuste por fold.
 
+    Cada fold é ajustado uma vez e as métricas de `scoring` (padrão
+    `SCORING_METHODS`) saem das mesmas predições; os folds rodam em paralelo
+    (`n_jobs`, -1 = todos os núcleos). Com `cache_dir`, o pré-processador
+    ajustado de cada fold fica em disco (`Pipeline(memory=...)`): comparar
+    outro modelo nos mesmos dados e splits reaproveita esses ajustes.
+
+    Retorna `{métrica: array com o score de cada fold}`.
+    """
     if stratified:
         kf = StratifiedKFold(n_splits=cv, shuffle=True, random_state=42)
     else:
@@ -36,18 +48,19 @@ def cross_validate_model(X, y, model, cv=5, stratified=True):
     pipe = Pipeline(steps=[
         ("preprocessor", preprocessor),
         ("model", model)
-    ])
+    ], memory=str(cache_dir) if cache_dir is not None else None)
 
-    scoring_methods = ["accuracy", "f1_weighted", "recall_weighted", "precision_weighted"]
-
-    results = {}
+    scoring_methods = list(scoring) if scoring is not None else SCORING_METHODS
 
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
 
-        for metric in scoring_methods:
-            score = cross_val_score(pipe, X, y, cv=kf, scoring=metric)
-            results[metric] = score
-            print(f"{metric}: {score.mean():.4f} ± {score.std():.4f}")
+        # Um ajuste por fold; os scorers compartilham as predições de cada fold
+        scores = cross_validate(pipe, X, y, cv=kf, scoring=scoring_methods, n_jobs=n_jobs)
+
+    results = {}
+    for metric in scoring_methods:
+        results[metric] = scores[f"test_{metric}"]
+        print(f"{metric}: {results[metric].mean():.4f} ± {results[metric].std():.4f}")
 
     return results
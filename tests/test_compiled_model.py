@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from analise_qualidade_vinhos.data.dataset import load_featured_data, train_test_split_featured
+from analise_qualidade_vinhos.pipeline.compiled import CompiledModel, compile_pipeline
+from analise_qualidade_vinhos.pipeline.model_builder import build_training_pipeline
+
+
+@pytest.mark.parametrize("algorithm", ["random_forest", "gradient_boosting", "lightgbm", "xgboost"])
+def test_compiled_model_matches_pipeline_predictions(tmp_path: Path, algorithm: str):
+    X_train, X_test, y_train, _ = train_test_split_featured(load_featured_data())
+    if algorithm == "xgboost":
+        # O XGBClassifier só aceita rótulos 0..n-1; o compilador preserva as classes do modelo
+        from sklearn.preprocessing import LabelEncoder
+
+        y_train = LabelEncoder().fit_transform(y_train)
+    pipeline = build_training_pipeline(algorithm, balance_method="smote")
+    pipeline.set_params(model__n_estimators=20)
+    pipeline.fit(X_train, y_train)
+
+    path = compile_pipeline(pipeline).save(tmp_path / "model.npz")
+    compiled = CompiledModel.load(path)
+
+    X_missing = X_test.copy()
+    X_missing.iloc[::3, 0] = np.nan
+    for X in (X_test, X_missing):
+        assert compiled.predict(X).tolist() == pipeline.predict(X).tolist()
+    if algorithm == "random_forest":
+        np.testing.assert_allclose(compiled.decision(X_test), pipeline.predict_proba(X_test))
+
+    # Carregar e pontuar o modelo compilado não importa sklearn
+    script = (
+        "import sys; from pathlib import Path\n"
+        "from analise_qualidade_vinhos.pipeline.predict import load_model, predict_rows\n"
+        "from analise_qualidade_vinhos.serving.model_store import PROBE_SAMPLES\n"
+        f"predict_rows(load_model(Path({str(path)!r})), PROBE_SAMPLES)\n"
+        "assert 'sklearn' not in sys.modules\n"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    subprocess.run([sys.executable, "-c", script], check=True, env=env)
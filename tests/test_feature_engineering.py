@@ -1,9 +1,15 @@
+import numpy as np
 import pandas as pd
+import pytest
 
 from analise_qualidade_vinhos.features.engineering import (
+    FEATURE_COLUMNS,
     TARGET_LABELS,
+    build_feature_array,
     build_feature_matrix,
     bucket_quality,
+    create_interaction_features,
+    rename_columns,
 )
 
 
@@ -43,3 +49,187 @@ def test_build_feature_matrix_creates_target_and_features():
     assert featured.loc[0, "quality_label"] == TARGET_LABELS["low"]
 
 
+
+
+def test_numpy_feature_kernel_matches_pandas_engine():
+    from analise_qualidade_vinhos.data.dataset import load_raw_data
+
+    raw = load_raw_data()
+    raw.loc[1, "free sulfur dioxide"] = np.nan
+    raw.loc[2, ["fixed acidity", "citric acid"]] = 0.0
+
+    expected = build_feature_matrix(raw, engine="pandas")
+    featured = build_feature_matrix(raw, engine="numpy")
+
+    pd.testing.assert_frame_equal(featured, expected, check_exact=True)
+
+
+def test_build_feature_array_returns_columns_and_supports_float32():
+    sample = rename_columns(
+        pd.DataFrame(
+            {
+                "fixed acidity": [7.4, 7.8],
+                "volatile acidity": [0.7, 0.88],
+                "citric acid": [0.0, 0.0],
+                "residual sugar": [1.9, 2.6],
+                "chlorides": [0.076, 0.098],
+                "free sulfur dioxide": [11.0, 25.0],
+                "total sulfur dioxide": [34.0, 67.0],
+                "density": [0.9978, 0.9968],
+                "pH": [3.51, 3.2],
+                "sulphates": [0.56, 0.68],
+                "alcohol": [9.4, 9.8],
+            }
+        )
+    )
+
+    arr64, columns = build_feature_array(sample)
+    out = np.empty((2, len(FEATURE_COLUMNS)), dtype=np.float32)
+    arr32, _ = build_feature_array(sample, out=out)
+
+    assert columns == FEATURE_COLUMNS
+    assert arr32 is out and arr32.flags.c_contiguous
+    expected = create_interaction_features(sample)[FEATURE_COLUMNS].to_numpy()
+    np.testing.assert_array_equal(arr64, expected)
+    np.testing.assert_allclose(arr32, expected, rtol=1e-6)
+
+
+def test_fitted_feature_transformer_uses_training_statistics():
+    from analise_qualidade_vinhos.features.engineering import BASE_FEATURES
+    from analise_qualidade_vinhos.features.transformer import WineFeatureTransformer
+
+    rng = np.random.default_rng(0)
+    train = pd.DataFrame(rng.uniform(0.5, 2.0, size=(50, len(BASE_FEATURES))), columns=BASE_FEATURES)
+    transformer = WineFeatureTransformer().fit(train)
+
+    batch = train.iloc[:3].copy()
+    batch.iloc[0, 0] = np.nan  # fixed_acidity ausente
+    batch.iloc[1, 10] = 1e6  # alcohol fora da faixa de treino
+    out = transformer.transform(batch)
+
+    assert list(out.columns) == FEATURE_COLUMNS
+    assert out.iloc[0]["fixed_acidity"] == np.median(train["fixed_acidity"])
+    assert out.iloc[1]["alcohol"] == train["alcohol"].max()
+    # Cada linha independe do lote em que chega
+    for i in range(len(batch)):
+        pd.testing.assert_frame_equal(transformer.transform(batch.iloc[[i]]), out.iloc[[i]])
+
+
+def test_restricted_feature_graph_computes_only_requested_features_and_prerequisites():
+    from analise_qualidade_vinhos.features.engineering import BASE_FEATURES, resolve_features
+
+    assert resolve_features(["ph_acidity_interaction", "alcohol"]) == [
+        "total_acidity",
+        "acidity_index",
+        "ph_acidity_interaction",
+    ]
+
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(rng.uniform(0.5, 2.0, size=(20, len(BASE_FEATURES))), columns=BASE_FEATURES)
+    full, columns = build_feature_array(df)
+    partial, _ = build_feature_array(df, features=["ph_acidity_interaction", "sulphates_squared"])
+    for name in ["ph_acidity_interaction", "acidity_index", "sulphates_squared"] + BASE_FEATURES:
+        j = columns.index(name)
+        np.testing.assert_array_equal(partial[:, j], full[:, j])
+
+
+def test_feature_cache_reuses_matrix_until_raw_data_changes(tmp_path):
+    pytest.importorskip("pyarrow")
+    from analise_qualidade_vinhos.config.settings import RAW_DATA_PATH
+    from analise_qualidade_vinhos.data.dataset import load_raw_data
+    from analise_qualidade_vinhos.data.feature_cache import load_or_build
+
+    raw_path = tmp_path / "wine.csv"
+    raw_path.write_bytes(RAW_DATA_PATH.read_bytes())
+    cache_dir = tmp_path / "processed"
+    calls = []
+
+    def build():
+        calls.append(1)
+        return build_feature_matrix(load_raw_data(raw_path))
+
+    first = load_or_build(raw_path, build, "numpy", cache_dir)
+    second = load_or_build(raw_path, build, "numpy", cache_dir)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(second, first)
+
+    # outro conteúdo → nova entrada, a antiga é removida
+    raw_path.write_text(RAW_DATA_PATH.read_text().rsplit("\n", 2)[0] + "\n")
+    third = load_or_build(raw_path, build, "numpy", cache_dir)
+    assert len(calls) == 2
+    assert len(third) <= len(first)
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # mesmo nome de arquivo em outra pasta: entrada própria, não apaga a do outro
+    other_raw = tmp_path / "other" / "wine.csv"
+    other_raw.parent.mkdir()
+    other_raw.write_bytes(RAW_DATA_PATH.read_bytes())
+    load_or_build(other_raw, build, "numpy", cache_dir)
+    load_or_build(raw_path, build, "numpy", cache_dir)
+    assert len(calls) == 3
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_featured_data_cache_is_opt_in(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    from analise_qualidade_vinhos.config.settings import RAW_DATA_PATH
+    from analise_qualidade_vinhos.data import dataset
+
+    raw_path = tmp_path / "wine.csv"
+    raw_path.write_bytes(RAW_DATA_PATH.read_bytes())
+    cache_dir = tmp_path / "processed"
+
+    dataset.load_featured_data(raw_path, cache_dir=cache_dir)
+    assert not cache_dir.exists()
+
+    monkeypatch.setattr(dataset, "FEATURE_CACHE", True)
+    dataset.load_featured_data(raw_path, cache_dir=cache_dir)
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+def test_chunked_feature_build_matches_in_memory_matrix(tmp_path):
+    pytest.importorskip("pyarrow")
+    from analise_qualidade_vinhos.config.settings import RAW_DATA_PATH
+    from analise_qualidade_vinhos.data.dataset import load_featured_data
+    from analise_qualidade_vinhos.data.streaming import write_featured_dataset
+
+    output = tmp_path / "featured.parquet"
+    # blocos pequenos: duplicatas atravessam a fronteira entre blocos
+    stats = write_featured_dataset(RAW_DATA_PATH, output, chunksize=100)
+
+    expected = load_featured_data(cache=False)
+    assert stats.chunks > 1
+    assert stats.rows_written == len(expected)
+    assert stats.duplicates == stats.rows_read - len(expected)
+    pd.testing.assert_frame_equal(load_featured_data(output), expected, check_index_type=False)
+
+
+def test_row_hash_set_keeps_rows_whose_first_hash_collides():
+    from analise_qualidade_vinhos.data.streaming import ROW_KEY_DTYPE, RowHashSet
+
+    seen = RowHashSet()
+    first = np.array([(7, 1), (8, 1)], dtype=ROW_KEY_DTYPE)
+    assert seen.add_new(first).tolist() == [True, True]
+    # mesmo `hi` de uma linha já vista, `lo` diferente: é outra linha
+    second = np.array([(7, 2), (7, 1), (7, 2)], dtype=ROW_KEY_DTYPE)
+    assert seen.add_new(second).tolist() == [True, False, False]
+    assert len(seen) == 3 and seen.nbytes == 3 * ROW_KEY_DTYPE.itemsize
+
+
+def test_column_store_maps_raw_data_without_copying(tmp_path):
+    from analise_qualidade_vinhos.config.settings import RAW_DATA_PATH
+    from analise_qualidade_vinhos.data.column_store import convert_csv, load_columns
+    from analise_qualidade_vinhos.data.dataset import load_raw_data
+
+    store = convert_csv(RAW_DATA_PATH, tmp_path / "wine.columns")
+
+    df = load_raw_data(store)
+    pd.testing.assert_frame_equal(df, load_raw_data())
+    for block in df._mgr.blocks:
+        base = block.values
+        while not isinstance(base, np.memmap):
+            base = base.base
+        assert not base.flags.writeable
+    columns = load_columns(store)
+    assert list(columns) == list(df.columns)
+    assert isinstance(columns["alcohol"].base, np.memmap)
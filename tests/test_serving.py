@@ -0,0 +1,537 @@
+import asyncio
+
+import pandas as pd
+
+from analise_qualidade_vinhos.serving.batching import MicroBatcher
+
+
+def test_micro_batcher_coalesces_requests_and_fans_out_results():
+    calls = []
+
+    def predict_fn(df: pd.DataFrame):
+        calls.append(len(df))
+        return [f"row-{v}" for v in df["value"]]
+
+    async def scenario():
+        batcher = MicroBatcher(predict_fn, max_wait_ms=50, max_batch_rows=100)
+        await batcher.start()
+        frames = [pd.DataFrame({"value": [i * 10 + j for j in range(i + 1)]}) for i in range(3)]
+        results = await asyncio.gather(*(batcher.submit(f) for f in frames))
+        await batcher.stop()
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(scenario())
+
+    assert calls == [6]
+    assert results == [["row-0"], ["row-10", "row-11"], ["row-20", "row-21", "row-22"]]
+    assert stats["batches"] == 1 and stats["requests"] == 3 and stats["rows"] == 6
+    assert stats["batch_latency_ms_p99"] >= 0
+
+
+def test_inference_executor_scores_off_the_event_loop():
+    import threading
+
+    import numpy as np
+
+    from analise_qualidade_vinhos.serving.executor import InferenceExecutor
+
+    class ConstantModel:
+        def predict(self, X):
+            return np.array(["Alta qualidade"] * len(X))
+
+    sample = pd.DataFrame(
+        {
+            "fixed_acidity": [7.4, 7.4],
+            "volatile_acidity": [0.7, 0.7],
+            "citric_acid": [0.0, 0.0],
+            "residual_sugar": [1.9, 1.9],
+            "chlorides": [0.076, 0.076],
+            "free_sulfur_dioxide": [11.0, 11.0],
+            "total_sulfur_dioxide": [34.0, 34.0],
+            "density": [0.9978, 0.9978],
+            "ph": [3.51, 3.51],
+            "sulphates": [0.56, 0.56],
+            "alcohol": [9.4, 9.4],
+        }
+    )
+
+    loader_threads = []
+
+    def loader():
+        loader_threads.append(threading.current_thread())
+        return ConstantModel()
+
+    async def scenario():
+        # sem preload: o primeiro carregamento acontece na primeira requisição, no worker
+        executor = InferenceExecutor(kind="thread", max_workers=1, model_loader=loader, preload=False)
+        await executor.start()
+        try:
+            return await executor.predict(sample)
+        finally:
+            await asyncio.to_thread(executor.shutdown)
+
+    assert asyncio.run(scenario()) == ["Alta qualidade", "Alta qualidade"]
+    assert loader_threads and threading.main_thread() not in loader_threads
+
+
+def test_inference_executor_process_mode_scores_in_worker_processes(tmp_path, monkeypatch):
+    import os
+
+    import numpy as np
+    from joblib import dump
+    from sklearn.dummy import DummyClassifier
+
+    from analise_qualidade_vinhos.serving import executor as executor_module
+    from analise_qualidade_vinhos.serving.executor import InferenceExecutor, _worker_ready
+
+    fingerprints = []
+    artifact_version = executor_module.artifact_version
+    monkeypatch.setattr(
+        executor_module, "artifact_version", lambda path: fingerprints.append(path) or artifact_version(path)
+    )
+    frame = pd.DataFrame({"alcohol": [9.4, 10.0, 9.4]})
+    model = DummyClassifier(strategy="constant", constant="Média qualidade").fit(frame, ["Média qualidade"] * 3)
+    model.fitted_features = True
+    model_path = tmp_path / "model.joblib"
+    dump(model, model_path)
+
+    async def scenario():
+        executor = InferenceExecutor(kind="process", max_workers=1, model_path=model_path)
+        await executor.start()
+        try:
+            preds = await executor.predict(frame)
+            await executor.predict(frame)
+            worker_pid = await asyncio.get_running_loop().run_in_executor(executor.pool, _worker_ready)
+            return preds, worker_pid
+        finally:
+            await asyncio.to_thread(executor.shutdown)
+
+    preds, worker_pid = asyncio.run(scenario())
+    assert preds == ["Média qualidade"] * 3
+    assert worker_pid != os.getpid()
+    assert len(fingerprints) == 1  # resolvido no start(), não a cada requisição
+
+
+def test_health_responds_while_scoring_is_saturated(monkeypatch):
+    import time
+
+    import httpx
+    import numpy as np
+
+    from analise_qualidade_vinhos import api
+    from analise_qualidade_vinhos.serving.executor import InferenceExecutor
+
+    class SlowModel:
+        fitted_features = True
+
+        def predict(self, X):
+            time.sleep(0.3)
+            return np.array(["Alta qualidade"] * len(X))
+
+    async def published():
+        return None
+
+    monkeypatch.setattr(api.model_store, "wait_ready", published)
+    sample = {name: 1.0 for name in api.WineSample.model_fields}
+
+    async def scenario():
+        executor = InferenceExecutor(kind="thread", max_workers=1, model_loader=SlowModel, max_pending=1)
+        await executor.start()
+        monkeypatch.setattr(api.app.state, "executor", executor, raising=False)
+        transport = httpx.ASGITransport(app=api.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                scoring = [asyncio.create_task(client.post("/predict", json=[sample])) for _ in range(4)]
+                await asyncio.sleep(0.05)  # o worker está ocupado e há requisições na fila
+                start = time.perf_counter()
+                health = await client.get("/health")
+                health_seconds = time.perf_counter() - start
+                pending = sum(not task.done() for task in scoring)
+                responses = await asyncio.gather(*scoring)
+        finally:
+            await asyncio.to_thread(executor.shutdown)
+        return health, health_seconds, pending, responses
+
+    health, health_seconds, pending, responses = asyncio.run(scenario())
+    assert health.status_code == 200 and health_seconds < 0.25
+    assert pending >= 3  # /health respondeu com a pontuação ainda saturada
+    assert all(r.json() == {"predictions": ["Alta qualidade"]} for r in responses)
+
+
+def test_process_worker_keeps_previous_model_when_snapshot_is_not_the_requested_version(tmp_path, monkeypatch):
+    import numpy as np
+    import pytest
+    from joblib import dump
+    from sklearn.dummy import DummyClassifier
+
+    from analise_qualidade_vinhos.pipeline.predict import artifact_version
+    from analise_qualidade_vinhos.serving import executor
+
+    class ConstantModel:
+        fitted_features = True
+
+        def predict(self, X):
+            return np.array(["Baixa qualidade"] * len(X))
+
+    frame = pd.DataFrame({"alcohol": [9.4]})
+    monkeypatch.setattr(executor, "_WORKER_MODEL", None)
+    with pytest.raises(FileNotFoundError):
+        executor._score_in_worker(frame, str(tmp_path / "missing.joblib"), "v1")
+
+    monkeypatch.setattr(executor, "_WORKER_MODEL", ("v1", ConstantModel()))
+    path = tmp_path / "model.v2.joblib"
+    published = DummyClassifier(strategy="constant", constant="Alta qualidade").fit(frame, ["Alta qualidade"])
+    published.fitted_features = True
+    dump(published, path)
+    preds, _, _ = executor._score_in_worker(frame, str(path), "v2")  # fingerprint difere de "v2"
+    assert preds == ["Baixa qualidade"] and executor._WORKER_MODEL[0] == "v1"
+
+    version = artifact_version(path)
+    preds, _, _ = executor._score_in_worker(frame, str(path), version)
+    assert preds == ["Alta qualidade"] and executor._WORKER_MODEL[0] == version
+
+
+def test_prediction_cache_scores_only_misses_and_invalidates_on_new_model():
+    from analise_qualidade_vinhos.features.engineering import BASE_FEATURES
+    from analise_qualidade_vinhos.serving.cache import PredictionCache
+
+    cache = PredictionCache(max_entries=2, decimals=2)
+    frame = pd.DataFrame([[float(i)] * len(BASE_FEATURES) for i in range(3)], columns=BASE_FEATURES)
+
+    keys, preds, missing = cache.lookup(frame.iloc[:2], version="v1")
+    assert missing == [0, 1]
+    cache.update(keys, preds, missing, ["a", "b"])
+
+    jittered = frame.iloc[[1, 2]].reset_index(drop=True) + 0.001  # abaixo da precisão (2 casas)
+    keys, preds, missing = cache.lookup(jittered, version="v1")
+    assert preds == ["b", None] and missing == [1]
+    cache.update(keys, preds, missing, ["c"])
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1  # "a" saiu pelo LRU
+
+    _, _, missing = cache.lookup(frame.iloc[[1]], version="v2")
+    assert missing == [0] and cache.invalidations == 1
+
+
+def test_model_store_hot_swaps_valid_artifacts_only(tmp_path):
+    import os
+
+    from joblib import dump, load
+
+    from analise_qualidade_vinhos.serving.model_store import ModelStore
+
+    path = tmp_path / "model.joblib"
+    dump({"name": "v1"}, path)
+
+    def validator(model):
+        if "name" not in model:
+            raise ValueError("modelo inválido")
+
+    store = ModelStore(path, loader=load, validator=validator, poll_seconds=0)
+    first = store.get()
+    assert first.model == {"name": "v1"}
+
+    dump({"broken": True}, path)
+    os.utime(path, ns=(1, 1))
+    assert store.check_for_update() is False
+    assert store.get() is first and store.last_error
+
+    dump({"name": "v2"}, path)
+    assert store.check_for_update() is True
+    second = store.get()
+    assert second.model == {"name": "v2"} and store.swaps == 1
+    assert first.model == {"name": "v1"}  # requisições em andamento mantêm o snapshot antigo
+
+    # workers carregam a cópia validada, que não muda quando o artefato é regravado
+    assert second.path == store.snapshot_path(second.version) != path
+    dump({"broken": True}, path)
+    assert load(second.path) == {"name": "v2"}
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(["model.joblib", first.path.name, second.path.name])
+
+    dump({"name": "v3"}, path)
+    os.utime(path, ns=(2, 2))
+    assert store.check_for_update() is True
+    assert not first.path.exists() and second.path.exists()  # mantém só a atual e a anterior
+
+
+def test_metrics_registry_renders_prometheus_histograms():
+    from analise_qualidade_vinhos.serving.metrics import Counter, Histogram, Registry
+
+    registry = Registry()
+    latency = registry.register(Histogram("stage_seconds", "Stage latency.", ("stage",), buckets=(0.01, 0.1)))
+    rows = registry.register(Counter("rows_total", "Rows."))
+    for value in (0.005, 0.05, 0.5):
+        latency.observe(value, stage="predict")
+    rows.inc(3)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE stage_seconds histogram" in lines
+    assert 'stage_seconds_bucket{stage="predict",le="0.01"} 1' in lines
+    assert 'stage_seconds_bucket{stage="predict",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="predict",le="+Inf"} 3' in lines
+    assert 'stage_seconds_count{stage="predict"} 3' in lines
+    assert "rows_total 3.0" in lines
+
+
+def test_columnar_matrix_codec_round_trip():
+    import json
+    import struct
+
+    import numpy as np
+    import pytest
+
+    from analise_qualidade_vinhos.features.engineering import BASE_FEATURES
+    from analise_qualidade_vinhos.serving import columnar
+
+    columns = list(reversed(BASE_FEATURES))
+    matrix = np.arange(2 * len(columns), dtype="<f4").reshape(2, -1)
+    header = json.dumps({"columns": columns, "dtype": "<f4"}).encode()
+    body = struct.pack("<I", len(header)) + header + matrix.tobytes()
+
+    df = columnar.decode_matrix(body)
+
+    assert list(df.columns) == BASE_FEATURES
+    assert df["fixed_acidity"].tolist() == matrix[:, columns.index("fixed_acidity")].tolist()
+    with pytest.raises(ValueError):
+        columnar.decode_matrix(body[:-4])
+
+    labels = ["Baixa qualidade", "Alta qualidade"]
+    encoded = columnar.encode_matrix(columnar.label_codes(["Alta qualidade", "Baixa qualidade"], labels), labels)
+    (header_len,) = struct.unpack_from("<I", encoded)
+    assert json.loads(encoded[4 : 4 + header_len])["labels"] == labels
+    assert np.frombuffer(encoded[4 + header_len :], dtype=np.int8).tolist() == [1, 0]
+
+
+def test_predict_rows_scores_duplicates_once_and_broadcasts_in_order():
+    import numpy as np
+
+    from analise_qualidade_vinhos.pipeline.predict import predict_from_dataframe, predict_rows_timed
+
+    class RecordingModel:
+        fitted_features = True  # recebe as colunas brutas
+
+        def __init__(self):
+            self.rows = []
+
+        def predict(self, X):
+            self.rows.append(len(X))
+            return np.array([f"alcohol={a}" for a in X["alcohol"]])
+
+    batch = pd.DataFrame({"alcohol": [9.4, 10.0, 9.4, 11.0, 10.0, 9.4], "ph": [3.5] * 6})
+    model = RecordingModel()
+
+    preds, timings, unique_rows = predict_rows_timed(model, batch)
+
+    assert preds == [f"alcohol={a}" for a in batch["alcohol"]]
+    assert unique_rows == 3 and model.rows == [3]
+    assert set(timings) == {"dedup", "prepare_input", "predict"}
+    assert predict_from_dataframe(model, batch) == preds
+
+
+
+def test_deduplicate_rows_never_merges_distinct_rows_on_hash_collision(monkeypatch):
+    import numpy as np
+
+    from analise_qualidade_vinhos.pipeline.predict import deduplicate_rows
+
+    batch = pd.DataFrame({"alcohol": [9.4, 10.0, 9.4, np.nan, np.nan], "ph": [3.5] * 5})
+    unique, inverse = deduplicate_rows(batch)
+    assert len(unique) == 3 and unique.iloc[inverse].reset_index(drop=True).equals(batch)
+
+    # todas as linhas com o mesmo hash: o agrupamento não confere com os valores
+    monkeypatch.setattr(
+        pd.util, "hash_pandas_object", lambda df, index=False: pd.Series(np.zeros(len(df), dtype=np.uint64))
+    )
+    unique, inverse = deduplicate_rows(batch)
+    assert inverse is None and len(unique) == len(batch)
+
+
+def _stream_client(monkeypatch, chunk_rows=1024, max_line_bytes=65536):
+    """TestClient for /predict/stream scoring with a fake model (no lifespan, no training)."""
+    from fastapi.testclient import TestClient
+
+    from analise_qualidade_vinhos import api
+
+    batches = []
+
+    async def fake_score(df):
+        batches.append(len(df))
+        return [f"alcohol={a}" for a in df["alcohol"]]
+
+    monkeypatch.setattr(api, "_score_cached", fake_score)
+    monkeypatch.setattr(api, "API_STREAM_CHUNK_ROWS", chunk_rows)
+    monkeypatch.setattr(api, "API_STREAM_MAX_LINE_BYTES", max_line_bytes)
+    return TestClient(api.app), batches
+
+
+def _ndjson_sample(alcohol):
+    import json
+
+    sample = dict.fromkeys(
+        [
+            "fixed_acidity", "volatile_acidity", "citric_acid", "residual_sugar", "chlorides",
+            "free_sulfur_dioxide", "total_sulfur_dioxide", "density", "ph", "sulphates",
+        ],
+        1.0,
+    )
+    return json.dumps({**sample, "alcohol": alcohol})
+
+
+def _columnar_client(monkeypatch):
+    """TestClient whose fake model labels each row by its alcohol (valid `QUALITY_LABELS`)."""
+    from fastapi.testclient import TestClient
+
+    from analise_qualidade_vinhos import api
+
+    async def fake_score(df):
+        return [
+            "Alta qualidade" if a >= 12 else "Média qualidade" if a >= 10 else "Baixa qualidade"
+            for a in df["alcohol"]
+        ]
+
+    monkeypatch.setattr(api, "_score_cached", fake_score)
+    return TestClient(api.app)
+
+
+def test_predict_columnar_bodies_match_json_predictions(monkeypatch):
+    import json
+    import struct
+
+    import numpy as np
+    import pandas as pd
+
+    from analise_qualidade_vinhos.features.engineering import BASE_FEATURES
+    from analise_qualidade_vinhos.serving import columnar
+
+    client = _columnar_client(monkeypatch)
+    samples = [json.loads(_ndjson_sample(a)) for a in (9.0, 13.5, 11.0, 9.5)]
+    expected = client.post("/predict", content=json.dumps(samples)).json()["predictions"]
+
+    columns = list(reversed(BASE_FEATURES))
+    matrix = np.asarray([[s[c] for c in columns] for s in samples], dtype="<f4")
+    header = json.dumps({"columns": columns, "dtype": "<f4"}).encode()
+    body = struct.pack("<I", len(header)) + header + matrix.tobytes()
+    response = client.post("/predict", content=body, headers={"Content-Type": columnar.MATRIX_CONTENT_TYPE})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == columnar.MATRIX_CONTENT_TYPE
+    (header_len,) = struct.unpack_from("<I", response.content)
+    labels = json.loads(response.content[4 : 4 + header_len])["labels"]
+    codes = np.frombuffer(response.content[4 + header_len :], dtype=np.int8)
+    assert codes.dtype == np.int8
+    assert [labels[c] for c in codes] == expected
+
+    if columnar.PYARROW_AVAILABLE:
+        import pyarrow as pa
+        import pyarrow.ipc as pa_ipc
+
+        table = pa.Table.from_pandas(pd.DataFrame(samples), preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa_ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        response = client.post(
+            "/predict", content=sink.getvalue().to_pybytes(), headers={"Content-Type": columnar.ARROW_CONTENT_TYPE}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == columnar.ARROW_CONTENT_TYPE
+        predictions = pa_ipc.open_stream(response.content).read_all().column("prediction").combine_chunks()
+        assert predictions.indices.type == pa.int8()
+        assert predictions.to_pylist() == expected
+
+
+def test_predict_columnar_rejects_malformed_bodies_with_422(monkeypatch):
+    import json
+    import struct
+
+    from analise_qualidade_vinhos.features.engineering import BASE_FEATURES
+    from analise_qualidade_vinhos.serving import columnar
+
+    client = _columnar_client(monkeypatch)
+    header = json.dumps({"columns": BASE_FEATURES, "dtype": "<f4"}).encode()
+    matrix_headers = {"Content-Type": columnar.MATRIX_CONTENT_TYPE}
+    bodies = [
+        b"\x01\x00",  # prefixo de tamanho truncado
+        struct.pack("<I", len(header)) + header[:-5],  # cabeçalho truncado
+        struct.pack("<I", 9) + b"not json!",
+        struct.pack("<I", len(header)) + header + b"\x00" * 6,  # linha incompleta
+    ]
+    for body in bodies:
+        assert client.post("/predict", content=body, headers=matrix_headers).status_code == 422
+
+    if columnar.PYARROW_AVAILABLE:
+        response = client.post("/predict", content=b"not arrow", headers={"Content-Type": columnar.ARROW_CONTENT_TYPE})
+        assert response.status_code == 422
+
+
+def test_predict_stream_numbers_lines_and_reports_invalid_ones(monkeypatch):
+    import json
+
+    client, _ = _stream_client(monkeypatch)
+    body = "\n".join([_ndjson_sample(9.5), "{not json", "", _ndjson_sample(-1.0), _ndjson_sample(11.0)])
+
+    response = client.post("/predict/stream", content=body.encode())  # última linha sem "\n"
+
+    out = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == 200
+    assert [o["line"] for o in out] == [1, 2, 4, 5]  # linha 3 em branco é ignorada
+    assert out[0]["prediction"] == "alcohol=9.5" and out[3]["prediction"] == "alcohol=11.0"
+    assert "error" in out[1] and "error" in out[2]
+
+
+def test_predict_stream_flushes_every_chunk_rows_across_body_chunks(monkeypatch):
+    import json
+
+    client, batches = _stream_client(monkeypatch, chunk_rows=2)
+    body = ("\n".join(_ndjson_sample(9.0 + i) for i in range(5)) + "\n").encode()
+
+    def chunks(size=7):  # corta as linhas no meio, entre mensagens do corpo
+        for i in range(0, len(body), size):
+            yield body[i : i + size]
+
+    response = client.post("/predict/stream", content=chunks())
+
+    out = [json.loads(line) for line in response.text.splitlines()]
+    assert batches == [2, 2, 1]
+    assert [o["prediction"] for o in out] == [f"alcohol={9.0 + i}" for i in range(5)]
+
+
+def test_predict_stream_rejects_oversized_lines_and_resumes_after_them(monkeypatch):
+    import json
+
+    client, batches = _stream_client(monkeypatch, max_line_bytes=300)
+    huge = "x" * 1000
+    body = "\n".join([_ndjson_sample(9.0), huge, _ndjson_sample(10.0), huge]).encode()
+
+    response = client.post("/predict/stream", content=(body[i : i + 64] for i in range(0, len(body), 64)))
+
+    out = [json.loads(line) for line in response.text.splitlines()]
+    assert [o["line"] for o in out] == [1, 2, 3, 4]
+    assert [o.get("prediction") for o in out] == ["alcohol=9.0", None, "alcohol=10.0", None]
+    assert "300 bytes" in out[1]["error"] and "300 bytes" in out[3]["error"]
+    assert batches == [2]
+
+
+def test_micro_batcher_stop_scores_accepted_requests_and_rejects_new_ones():
+    import pytest
+
+    batches = []
+
+    def predict_fn(df: pd.DataFrame):
+        batches.append(len(df))
+        return [f"ok-{v}" for v in df["value"]]
+
+    async def scenario():
+        batcher = MicroBatcher(predict_fn, max_wait_ms=10_000, max_batch_rows=100)
+        await batcher.start()
+        first = asyncio.ensure_future(batcher.submit(pd.DataFrame({"value": [1, 2]})))
+        second = asyncio.ensure_future(batcher.submit(pd.DataFrame({"value": [3]})))
+        await asyncio.sleep(0.05)  # já retiradas da fila, à espera de mais linhas para o lote
+        await batcher.stop()
+        assert await asyncio.wait_for(first, timeout=1) == ["ok-1", "ok-2"]
+        assert await asyncio.wait_for(second, timeout=1) == ["ok-3"]
+        assert batches == [3]
+        with pytest.raises(RuntimeError, match="parado"):
+            await batcher.submit(pd.DataFrame({"value": [4]}))
+
+    asyncio.run(scenario())
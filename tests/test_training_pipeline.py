@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 
 from analise_qualidade_vinhos.config import settings
@@ -14,5 +15,352 @@ def test_training_produces_model(tmp_path: Path):
     assert model_path.exists()
     assert metrics["accuracy"] > 0
     assert metrics["f1_weighted"] > 0
+    assert metrics["model_selection"]["winner"]
 
 
+def _quick_selection(monkeypatch):
+    """Substitui a busca por uma floresta pequena: os testes abaixo cobrem o que vem depois dela."""
+    from analise_qualidade_vinhos.pipeline import train
+    from analise_qualidade_vinhos.pipeline.model_builder import build_training_pipeline, prune_unselected_features
+
+    def select(X_train, y_train, X_test, y_test, **kwargs):
+        pipeline = build_training_pipeline(
+            "random_forest", balance_method="smote", n_jobs=1, model_params={"n_estimators": 30}
+        )
+        return prune_unselected_features(pipeline.fit(X_train, y_train)), {"winner": "random_forest_smote"}
+
+    monkeypatch.setattr(train, "select_best_pipeline", select)
+    return train
+
+
+def test_distilled_student_is_saved_only_within_tolerance(tmp_path: Path, monkeypatch):
+    train = _quick_selection(monkeypatch)
+    paths = dict(model_path=tmp_path / "model.joblib", metrics_path=tmp_path / "metrics.json")
+    student_path = tmp_path / "model.student.joblib"
+
+    monkeypatch.setattr(train, "TRAIN_DISTILL_TOLERANCE", 1.0)
+    metrics, _ = train.train_model(**paths, distill=True)
+    distillation = metrics["distillation"]
+    assert distillation["emitted"] and student_path.exists() and student_path.with_suffix(".npz").exists()
+    assert distillation["student"]["size_bytes"] < distillation["teacher"]["size_bytes"]
+
+    # fora da tolerância: o aluno do treino anterior não representa o novo professor
+    monkeypatch.setattr(train, "TRAIN_DISTILL_TOLERANCE", -1.0)
+    metrics, _ = train.train_model(**paths, distill=True)
+    assert metrics["distillation"]["emitted"] is False
+    assert not student_path.exists() and not student_path.with_suffix(".npz").exists()
+
+
+def test_training_profile_attributes_stages_and_cprofile_is_opt_in(tmp_path: Path, monkeypatch):
+    from analise_qualidade_vinhos.data.dataset import load_featured_data, train_test_split_featured
+    from analise_qualidade_vinhos.pipeline.model_builder import _fit_models, _fit_shared_stages
+    from analise_qualidade_vinhos.utils.profiling import TrainingProfiler, profile_stage, profiling
+
+    train = _quick_selection(monkeypatch)
+    train.train_model(
+        model_path=tmp_path / "model.joblib",
+        metrics_path=tmp_path / "metrics.json",
+        compile_model=False,
+        distill=False,
+        cprofile=False,
+    )
+    profile = json.loads((tmp_path / "training_profile.json").read_text())
+    stages = {stage["name"] for stage in profile["stages"]}
+    assert {"load_data", "split", "search", "evaluate", "save", "save/dump"} <= stages
+    assert profile["slowest"][0]["wall_s"] <= profile["total"]["wall_s"]
+    assert not (tmp_path / "training_profile.prof").exists()
+
+    profiler = TrainingProfiler(cprofile=True)
+    with profiling(profiler):
+        with profile_stage("work"):
+            sum(range(1000))
+    profiler.write(tmp_path / "cprofiled.json")
+    assert (tmp_path / "cprofiled.prof").exists()
+
+    # candidatos ajustados em paralelo (workers loky): cada custo volta para a etapa do seu candidato
+    X_train, X_test, y_train, y_test = train_test_split_featured(load_featured_data())
+    _, _, X_test_prep, resampled = _fit_shared_stages(X_train, y_train, X_test, ["smote"])
+    jobs = [("random_forest", "smote", 20), ("gradient_boosting", "smote", 20)]
+    profiler = TrainingProfiler()
+    with profiling(profiler):
+        with profile_stage("search"):
+            _fit_models(jobs, resampled, X_test_prep, y_test, n_jobs=2)
+    recorded = {stage["name"]: stage for stage in profiler.stages}
+    for algo, balance, n_estimators in jobs:
+        for step in ("fit", "predict"):
+            stage = recorded[f"search/{algo}_{balance}/{step}"]
+            assert stage["algorithm"] == algo and stage["n_estimators"] == n_estimators
+            assert stage["wall_s"] >= 0 and stage["cpu_s"] >= 0
+
+
+def test_parallel_model_search_matches_sequential_run():
+    import numpy as np
+
+    from analise_qualidade_vinhos.data.dataset import load_featured_data, train_test_split_featured
+    from analise_qualidade_vinhos.pipeline.model_builder import (
+        build_training_pipeline,
+        prune_unselected_features,
+        split_cpu_budget,
+        test_multiple_algorithms,
+    )
+
+    assert split_cpu_budget(12, 1) == (1, 1)
+    assert split_cpu_budget(12, 8) == (8, 1)
+    assert split_cpu_budget(2, 8) == (2, 4)
+
+    X_train, X_test, y_train, y_test = train_test_split_featured(load_featured_data())
+    search = dict(algorithms=["random_forest"], balance_methods=["smote", "smoteenn"])
+    sequential = test_multiple_algorithms(X_train, y_train, X_test, y_test, n_jobs=1, **search)
+    parallel = test_multiple_algorithms(X_train, y_train, X_test, y_test, n_jobs=2, **search)
+
+    assert list(parallel) == list(sequential)
+    for key, expected in sequential.items():
+        assert parallel[key]["f1_weighted"] == expected["f1_weighted"]
+        np.testing.assert_array_equal(
+            parallel[key]["pipeline"].predict_proba(X_test), expected["pipeline"].predict_proba(X_test)
+        )
+
+    # etapas compartilhadas entre candidatos: mesmo resultado de um pipeline ajustado sozinho
+    standalone = build_training_pipeline("random_forest", balance_method="smote", n_jobs=1)
+    prune_unselected_features(standalone.fit(X_train, y_train))
+    np.testing.assert_array_equal(
+        sequential["random_forest_smote"]["pipeline"].predict_proba(X_test), standalone.predict_proba(X_test)
+    )
+
+
+def test_successive_halving_promotes_top_candidates_to_full_budget():
+    from analise_qualidade_vinhos.data.dataset import load_featured_data, train_test_split_featured
+    from analise_qualidade_vinhos.pipeline.model_builder import successive_halving
+
+    X_train, X_test, y_train, y_test = train_test_split_featured(load_featured_data())
+    pipeline, report = successive_halving(
+        X_train, y_train, X_test, y_test,
+        algorithms=["random_forest", "lightgbm"], balance_methods=["smote"], eta=3, n_jobs=1,
+    )
+
+    first, last = report["rungs"][0], report["rungs"][-1]
+    assert report["completed"] and len(report["rungs"]) == 2
+    assert first["budget_fraction"] < 1 and len(first["f1_weighted"]) == 2 and len(first["promoted"]) == 1
+    assert last["budget_fraction"] == 1.0 and list(last["f1_weighted"]) == first["promoted"]
+    assert report["winner"] == first["promoted"][0]
+    assert report["estimators_trained"] < report["estimators_full_search"] + report["n_estimators"]
+    assert pipeline.named_steps["model"].n_estimators == report["n_estimators"]
+    assert len(pipeline.predict(X_test)) == len(X_test)
+
+
+def test_cross_validation_fits_each_fold_once_for_all_metrics(tmp_path: Path):
+    import numpy as np
+    from sklearn.linear_model import LogisticRegression
+
+    from analise_qualidade_vinhos.data.dataset import load_featured_data
+    from analise_qualidade_vinhos.utils.validation import SCORING_METHODS, cross_validate_model
+
+    class CountingModel(LogisticRegression):
+        fits = 0
+
+        def fit(self, X, y):
+            type(self).fits += 1
+            return super().fit(X, y)
+
+    df = load_featured_data()
+    X, y = df.drop(columns=[settings.TARGET_COLUMN]), df[settings.TARGET_COLUMN]
+
+    results = cross_validate_model(X, y, CountingModel(max_iter=500), cv=3, n_jobs=1, cache_dir=tmp_path)
+    cached = cross_validate_model(X, y, CountingModel(max_iter=500), cv=3, n_jobs=1, cache_dir=tmp_path)
+
+    assert CountingModel.fits == 6  # 3 folds x 2 chamadas, não 3 x 4 métricas
+    assert list(results) == SCORING_METHODS
+    for metric in SCORING_METHODS:
+        np.testing.assert_array_equal(cached[metric], results[metric])
+
+
+def test_candidate_cache_skips_fitted_candidates_and_resumes(tmp_path: Path, monkeypatch):
+    import numpy as np
+
+    from analise_qualidade_vinhos.data.dataset import load_featured_data, train_test_split_featured
+    from analise_qualidade_vinhos.pipeline import candidate_cache, model_builder
+
+    X_train, X_test, y_train, y_test = train_test_split_featured(load_featured_data())
+
+    def search(X, y, balance_methods=("smote", "smoteenn")):
+        return model_builder.test_multiple_algorithms(
+            X, y, X_test, y_test, ["random_forest"], list(balance_methods), n_jobs=1, cache_dir=tmp_path
+        )
+
+    # busca "interrompida": só o primeiro candidato chegou a ser salvo
+    first = search(X_train, y_train, balance_methods=["smote"])
+    assert len(list(tmp_path.glob("*.joblib"))) == 1
+
+    fitted = []
+    original = model_builder._fit_candidate_model
+    monkeypatch.setattr(
+        model_builder, "_fit_candidate_model", lambda algo, *args: fitted.append(algo) or original(algo, *args)
+    )
+    resumed = search(X_train, y_train)
+    assert len(fitted) == 1 and len(list(tmp_path.glob("*.joblib"))) == 2
+    np.testing.assert_array_equal(
+        resumed["random_forest_smote"]["pipeline"].predict_proba(X_test),
+        first["random_forest_smote"]["pipeline"].predict_proba(X_test),
+    )
+
+    rerun = search(X_train, y_train)
+    assert len(fitted) == 1
+    assert {k: v["f1_weighted"] for k, v in rerun.items()} == {k: v["f1_weighted"] for k, v in resumed.items()}
+
+    # dados diferentes -> chaves diferentes, treina de novo
+    search(X_train.iloc[1:], y_train.iloc[1:])
+    assert len(fitted) == 3
+
+    # código dos balanceadores alterado -> os candidatos salvos não valem mais
+    monkeypatch.setattr(candidate_cache, "balancing_code_version", lambda: "outra-versao")
+    search(X_train, y_train, balance_methods=["smote"])
+    assert len(fitted) == 4
+
+
+def test_incremental_update_adds_estimators_and_reports_drift(tmp_path: Path):
+    import numpy as np
+    from joblib import dump, load
+
+    from analise_qualidade_vinhos.data.dataset import load_featured_data, load_raw_data, train_test_split_featured
+    from analise_qualidade_vinhos.pipeline.incremental import update_pipeline
+    from analise_qualidade_vinhos.pipeline.model_builder import build_training_pipeline, prune_unselected_features
+    from analise_qualidade_vinhos.pipeline.train import update_model
+
+    X_train, X_test, y_train, y_test = train_test_split_featured(load_featured_data())
+    history, new = slice(0, 900), slice(900, None)
+
+    # árvores antigas remapeadas para a nova padronização: as primeiras rodadas preveem como antes
+    lgbm = prune_unselected_features(
+        build_training_pipeline("lightgbm", balance_method="smote", n_jobs=1).fit(X_train[history], y_train[history])
+    )
+    before = lgbm.predict_proba(X_test)
+    lgbm, info = update_pipeline(lgbm, X_train[new], y_train[new])
+    X_prep = lgbm[:-2].transform(X_test)
+    first_rounds = lgbm.named_steps["model"].predict_proba(X_prep, num_iteration=300)
+    np.testing.assert_allclose(first_rounds, before, atol=1e-3)
+    assert info["estimators_added"] == int(np.ceil(300 * len(X_train[new]) / 900))
+    assert lgbm.named_steps["preprocess"].transformers_[0][1].named_steps["scaler"].n_samples_seen_ == len(X_train)
+
+    forest = build_training_pipeline("random_forest", balance_method="smote", n_jobs=1)
+    model_path, metrics_path = tmp_path / "model.joblib", tmp_path / "metrics.json"
+    dump(prune_unselected_features(forest.fit(X_train, y_train)), model_path)
+    metrics_path.write_text(
+        json.dumps(
+            {
+                "accuracy": 0.6,
+                "f1_weighted": 0.6,
+                "n_train": len(X_train),
+                "model_selection": {"search": "halving"},
+                "distillation": {"emitted": True},
+            }
+        )
+    )
+    stale_student = tmp_path / "model.student.joblib"
+    dump(forest, stale_student)
+    new_data = tmp_path / "novos.csv"
+    load_raw_data().sample(300, random_state=0).to_csv(new_data, sep=";", index=False)
+
+    update_model(new_data, model_path, metrics_path, n_new_estimators=10, compile_model=False)
+    metrics, _ = update_model(new_data, model_path, metrics_path, n_new_estimators=10, compile_model=False)
+
+    incremental = metrics["incremental"]
+    assert load(model_path).named_steps["model"].n_estimators == 520
+    assert incremental["updates"] == 2 and incremental["baseline"] == {"accuracy": 0.6, "f1_weighted": 0.6}
+    assert incremental["accuracy_drift"] == round(metrics["accuracy"] - 0.6, 4)
+    assert metrics["n_train"] == len(X_train) + 2 * incremental["n_new"]
+    # o aluno e a seleção eram do modelo anterior à atualização
+    assert not stale_student.exists()
+    assert "distillation" not in metrics and "model_selection" not in metrics
+
+
+def test_indexed_samplers_match_imblearn_and_share_one_index():
+    import numpy as np
+    from imblearn.combine import SMOTEENN
+    from imblearn.over_sampling import ADASYN, SMOTE
+    from sklearn.datasets import make_classification
+
+    from analise_qualidade_vinhos.pipeline.balancing import (
+        IndexedADASYN,
+        IndexedSMOTE,
+        IndexedSMOTEENN,
+        NeighborIndex,
+    )
+
+    X_dense = np.random.default_rng(0).normal(size=(600, 20))  # 20 features: índice por força bruta
+    y_dense = np.repeat(["a", "b", "c"], [330, 200, 70])
+    X_low, y_low = make_classification(600, 6, n_informative=4, n_classes=3, weights=[0.6, 0.3], random_state=0)
+
+    for X, y in [(X_dense, y_dense), (X_low, y_low)]:  # força bruta e KD-tree
+        index = NeighborIndex(X, y)
+        for reference, indexed in [
+            (SMOTEENN(random_state=42), IndexedSMOTEENN(random_state=42)),
+            (ADASYN(random_state=42, n_neighbors=3), IndexedADASYN(random_state=42, n_neighbors=3)),
+            (SMOTE(random_state=42, k_neighbors=3), IndexedSMOTE(random_state=42, k_neighbors=3)),
+        ]:
+            X_ref, y_ref = reference.fit_resample(X, y)
+            for X_res, y_res in (indexed.fit_resample(X, y), indexed.fit_resample(X, y, neighbor_index=index)):
+                np.testing.assert_array_equal(y_res, y_ref)
+                np.testing.assert_array_equal(X_res, X_ref)
+
+
+def test_neighbor_index_is_not_reused_for_other_data_of_the_same_shape():
+    import numpy as np
+    from imblearn.over_sampling import SMOTE
+
+    from analise_qualidade_vinhos.pipeline.balancing import IndexedSMOTE, NeighborIndex
+
+    rng = np.random.default_rng(0)
+    y = np.repeat(["a", "b"], [150, 50])
+    X_index, X_other = rng.normal(size=(200, 6)), rng.normal(size=(200, 6))
+    index = NeighborIndex(X_index, y)
+
+    X_res, _ = IndexedSMOTE(random_state=42).fit_resample(X_other, y, neighbor_index=index)
+    X_ref, _ = SMOTE(random_state=42).fit_resample(X_other, y)
+    np.testing.assert_array_equal(X_res, X_ref)
+    assert not index._indexes  # índice de outra matriz: nem chegou a ser consultado
+
+    IndexedSMOTE(random_state=42).fit_resample(X_index, y, neighbor_index=index)
+    assert index._indexes  # mesmos dados (cópia validada pelo imblearn): reaproveitado
+
+
+def test_hyperparameter_tuning_prunes_and_resumes_from_study_file(tmp_path: Path):
+    from analise_qualidade_vinhos.data.dataset import load_featured_data, train_test_split_featured
+    from analise_qualidade_vinhos.pipeline.model_builder import XGBOOST_AVAILABLE
+    from analise_qualidade_vinhos.pipeline.tuning import prune_thresholds, tune_hyperparameters
+
+    # poda pela mediana da média parcial dos trials completos; o último fold nunca poda
+    history = [{"state": "complete", "scores": [s, s]} for s in (0.5, 0.6, 0.7, 0.8, 0.9)]
+    assert prune_thresholds(history, n_folds=2) == [0.7, None]
+    assert prune_thresholds(history[:4], n_folds=2) == [None, None]
+
+    X_train, X_test, y_train, y_test = train_test_split_featured(load_featured_data())
+    space = {
+        "balance": ["smote", "adasyn"],  # ADASYN falha nestes dados: fica fora da busca
+        "algorithms": {
+            "random_forest": {"n_estimators": {"type": "int", "low": 5, "high": 30, "log": True}},
+            "lightgbm": {
+                "n_estimators": {"type": "int", "low": 10, "high": 40},
+                "num_leaves": {"type": "categorical", "choices": [7, 15]},
+            },
+            # XGBoost não aceita os rótulos em texto: descartado antes dos trials, não a cada trial
+            "xgboost": {"n_estimators": {"type": "int", "low": 5, "high": 20}},
+        },
+    }
+    study_path = tmp_path / "study.jsonl"
+    kwargs = dict(space=space, cv=3, max_seconds=0, n_jobs=2, study_path=study_path, sampler="adaptive")
+
+    pipeline, report = tune_hyperparameters(X_train, y_train, X_test, y_test, n_trials=10, **kwargs)
+    assert report["trials"] == 10 and report["trials_resumed"] == 0 and "adasyn" in report["errors"]
+    records = [json.loads(line) for line in study_path.read_text().splitlines()]
+    assert len(records) == 10 and {r["balance"] for r in records} == {"smote"}
+    if XGBOOST_AVAILABLE:
+        assert "xgboost" in report["errors"] and report["failed"] == 0
+        assert {r["algorithm"] for r in records} <= {"random_forest", "lightgbm"}
+    assert all(len(r["scores"]) < 3 for r in records if r["state"] == "pruned")
+    best = max((r for r in records if r["state"] == "complete"), key=lambda r: r["value"])
+    assert report["params"] == best["params"]
+    assert pipeline.named_steps["model"].get_params()["n_estimators"] == best["params"]["n_estimators"]
+
+    _, resumed = tune_hyperparameters(X_train, y_train, X_test, y_test, n_trials=12, **kwargs)
+    assert resumed["trials_resumed"] == 10 and resumed["trials"] == 12
+    assert len(study_path.read_text().splitlines()) == 12